@@ -0,0 +1,134 @@
+"""
+REBELS: who voted against their own party
+
+In NB02 and `src/sql/vote_record.sql`, an MP "voted against their party" in a house division when
+more of their fellow party members voted the other way than voted like them. Those queries find out
+by joining `votes` with itself, pairing every MP with every other member of their party, and are
+run once per MP.
+
+Here the same rule is applied to the `party_lines` table (see `discordia.storage`), which already
+holds how many MPs of each party voted aye and no in each division: for an MP who voted aye,
+
+    fellow MPs voting aye = num_aye - 1
+    fellow MPs voting no  = num_no
+
+so the flags of every MP in every division come from a single query and a few vectorised columns.
+
+"""
+
+import pandas as pd
+
+DEFAULT_TERM_START = 2017
+
+_VOTES_WITH_PARTY_LINES = """
+SELECT
+    votes.debate_id,
+    votes.house_division_id,
+    votes.mp_id,
+    mp.party,
+    votes.is_vote_aye,
+    votes.is_teller,
+    party_lines.num_aye,
+    party_lines.num_no
+FROM
+    votes
+INNER JOIN
+    mp USING(mp_id)
+INNER JOIN
+    party_lines USING(debate_id, house_division_id, term_start, party)
+WHERE
+    mp.term_start = ?
+"""
+
+_UTTERANCES_PER_DEBATE = """
+SELECT
+    speaker_id AS mp_id,
+    debate_id,
+    COUNT(*) AS num_utterances
+FROM
+    speeches
+GROUP BY
+    speaker_id, debate_id
+"""
+
+
+def rebel_flags(conn, term_start=DEFAULT_TERM_START, mp_ids=None):
+    """Flags, for every MP and every house division, whether the MP voted against their party.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the DISCORDIA database (see `storage.connect`).
+        term_start (int): Which rows of the `mp` table to use, as in NB02.
+        mp_ids (list): If given, only these MPs are returned (the party lines still use all MPs).
+
+    Returns:
+        pd.DataFrame: One row per MP per house division, with the columns:
+            - debate_id, house_division_id, mp_id, party, is_vote_aye, is_teller
+            - num_fellow_aye (int): How many other MPs of the same party voted aye
+            - num_fellow_no (int): How many other MPs of the same party voted no
+            - voted_against_party (bool): True if more fellow MPs voted the other way than the same way
+
+    """
+
+    query = _VOTES_WITH_PARTY_LINES
+    params = [term_start]
+    if mp_ids is not None:
+        mp_ids = [str(mp_id) for mp_id in mp_ids]
+        query += f" AND votes.mp_id IN ({', '.join('?' for _ in mp_ids)})"
+        params += mp_ids
+
+    df = pd.read_sql(query, conn, params=params)
+    df["is_vote_aye"] = df["is_vote_aye"].astype(bool)
+    df["is_teller"] = df["is_teller"].astype(bool)
+
+    # Take the MP out of their own party's counts
+    df["num_fellow_aye"] = df["num_aye"] - df["is_vote_aye"]
+    df["num_fellow_no"] = df["num_no"] - ~df["is_vote_aye"]
+
+    num_same = df["num_fellow_aye"].where(df["is_vote_aye"], df["num_fellow_no"])
+    num_other = df["num_fellow_no"].where(df["is_vote_aye"], df["num_fellow_aye"])
+    df["voted_against_party"] = num_other > num_same
+
+    return df.drop(columns=["num_aye", "num_no"])
+
+def vote_records(conn, term_start=DEFAULT_TERM_START, mp_ids=None):
+    """The voting record of every MP, as `src/sql/vote_record.sql` computes it for one MP at a time.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the DISCORDIA database (see `storage.connect`).
+        term_start (int): Which rows of the `mp` table to use, as in NB02.
+        mp_ids (list): If given, only the records of these MPs are returned.
+
+    Returns:
+        pd.DataFrame: The columns of `rebel_flags`, plus num_utterances, the number of
+            speeches the MP made in the debate of the house division.
+
+    """
+
+    df = rebel_flags(conn, term_start=term_start, mp_ids=mp_ids)
+    df_utterances = pd.read_sql(_UTTERANCES_PER_DEBATE, conn)
+    df_utterances["mp_id"] = df_utterances["mp_id"].astype(str)
+
+    df = df.merge(df_utterances, how="left", on=["mp_id", "debate_id"])
+    df["num_utterances"] = df["num_utterances"].fillna(0).astype(int)
+    return df.sort_values(["mp_id", "debate_id", "house_division_id"], ignore_index=True)
+
+def rebels_per_house_division(conn, term_start=DEFAULT_TERM_START):
+    """Counts how many MPs of each party voted against their party in each house division (Part 3 of NB02).
+
+    Args:
+        conn (sqlite3.Connection): Connection to the DISCORDIA database (see `storage.connect`).
+        term_start (int): Which rows of the `mp` table to use, as in NB02.
+
+    Returns:
+        pd.DataFrame: One row per party per house division, with the columns
+            party, debate_id, house_division_id and num_MP_votes_against_majority.
+
+    """
+
+    df = rebel_flags(conn, term_start=term_start)
+    return (
+        df.groupby(["party", "debate_id", "house_division_id"])["voted_against_party"]
+          .sum()
+          .rename("num_MP_votes_against_majority")
+          .reset_index()
+    )
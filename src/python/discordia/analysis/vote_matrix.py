@@ -0,0 +1,259 @@
+"""
+VOTE MATRIX: every vote of a parliament as one small MP x house division matrix
+
+The `votes` table has one row per MP per house division, with string IDs. Reshaped into a matrix
+(one row per MP, one column per division) it fits in one byte per cell:
+
+     0  absent
+     1  aye          2  teller for the ayes
+    -1  no          -2  teller for the noes
+
+i.e. the sign is the side and the magnitude says whether the MP was a teller. The matrix is saved
+as a plain `.npy` file so it can be memory-mapped instead of loaded, and questions such as party
+cohesion or how often two MPs vote together become a handful of NumPy operations over it.
+
+Example:
+
+    matrix = VoteMatrix.from_database(storage.connect('../data/discordia.db'))
+    matrix.save('../data/vote_matrix')
+
+    matrix = VoteMatrix.load('../data/vote_matrix')
+    matrix.rice_index()
+    matrix.agreement()
+
+"""
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from .rebels import DEFAULT_TERM_START
+
+ABSENT = 0
+AYE = 1
+NO = -1
+TELLER_AYE = 2
+TELLER_NO = -2
+
+_VOTES_WITH_PARTY = """
+SELECT
+    votes.debate_id,
+    votes.house_division_id,
+    votes.mp_id,
+    mp.party,
+    votes.is_vote_aye,
+    votes.is_teller
+FROM
+    votes
+INNER JOIN
+    mp USING(mp_id)
+WHERE
+    mp.term_start = ?
+"""
+
+
+class VoteMatrix:
+    """An MP x house division matrix of votes.
+
+    Args:
+        values (np.ndarray): int8 array of shape (number of MPs, number of divisions), with the codes above.
+        mp_ids (list): The MP ID of each row.
+        parties (list): The party of each row.
+        debate_ids (list): The debate ID of each column.
+        house_division_ids (list): The house division ID of each column.
+
+    """
+
+    def __init__(self, values, mp_ids, parties, debate_ids, house_division_ids):
+        if values.shape != (len(mp_ids), len(debate_ids)):
+            raise ValueError(f"Expected a matrix of shape {(len(mp_ids), len(debate_ids))} but got {values.shape}")
+
+        self.values = values
+        self.mp_ids = np.asarray(mp_ids, dtype=str)
+        self.parties = np.asarray(parties, dtype=str)
+        self.debate_ids = np.asarray(debate_ids, dtype=str)
+        self.house_division_ids = np.asarray(house_division_ids, dtype=str)
+
+    #### BUILDING, SAVING AND LOADING ####
+
+    @classmethod
+    def from_votes(cls, df_votes):
+        """Builds the matrix from votes that already have a party column.
+
+        Args:
+            df_votes (pd.DataFrame): With the columns debate_id, house_division_id, mp_id,
+                party, is_vote_aye and is_teller.
+
+        Returns:
+            VoteMatrix: MPs sorted by party then ID, divisions sorted by debate then division ID.
+
+        """
+
+        df_mps = df_votes[["mp_id", "party"]].drop_duplicates("mp_id").sort_values(["party", "mp_id"])
+        df_divisions = df_votes[["debate_id", "house_division_id"]].drop_duplicates().sort_values(["debate_id", "house_division_id"])
+
+        rows = pd.Index(df_mps["mp_id"]).get_indexer(df_votes["mp_id"])
+        columns = pd.MultiIndex.from_frame(df_divisions).get_indexer(pd.MultiIndex.from_frame(df_votes[["debate_id", "house_division_id"]]))
+
+        is_vote_aye = df_votes["is_vote_aye"].astype(bool).to_numpy()
+        is_teller = df_votes["is_teller"].astype(bool).to_numpy()
+        codes = np.where(is_vote_aye, AYE, NO) * np.where(is_teller, 2, 1)
+
+        values = np.zeros((len(df_mps), len(df_divisions)), dtype=np.int8)
+        values[rows, columns] = codes
+
+        return cls(values, df_mps["mp_id"], df_mps["party"], df_divisions["debate_id"], df_divisions["house_division_id"])
+
+    @classmethod
+    def from_database(cls, conn, term_start=DEFAULT_TERM_START):
+        """Builds the matrix from the `votes` and `mp` tables.
+
+        Args:
+            conn (sqlite3.Connection): Connection to the DISCORDIA database (see `storage.connect`).
+            term_start (int): Which rows of the `mp` table to use, as in NB02.
+
+        Returns:
+            VoteMatrix: See `from_votes`.
+
+        """
+
+        return cls.from_votes(pd.read_sql(_VOTES_WITH_PARTY, conn, params=[term_start]))
+
+    def save(self, directory):
+        """Saves the matrix to `directory/values.npy` and its labels to `directory/labels.json`."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "values.npy"), self.values)
+        labels = {
+            "mp_ids": self.mp_ids.tolist(),
+            "parties": self.parties.tolist(),
+            "debate_ids": self.debate_ids.tolist(),
+            "house_division_ids": self.house_division_ids.tolist(),
+        }
+        with open(os.path.join(directory, "labels.json"), "w") as f:
+            json.dump(labels, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        """Loads a matrix saved with `save`.
+
+        Args:
+            directory (str): Where the matrix was saved.
+            mmap_mode (str): Passed to `np.load`. With 'r' (the default) the values are memory-mapped,
+                read-only, rather than read into memory. None reads them into memory.
+
+        Returns:
+            VoteMatrix: The matrix.
+
+        """
+
+        values = np.load(os.path.join(directory, "values.npy"), mmap_mode=mmap_mode)
+        with open(os.path.join(directory, "labels.json"), "r") as f:
+            labels = json.load(f)
+        return cls(values, **labels)
+
+    def to_sparse(self):
+        """Returns the values as a `scipy.sparse.csr_matrix` (absences are not stored)."""
+        from scipy import sparse
+        return sparse.csr_matrix(self.values)
+
+    #### METRICS ####
+
+    def sides(self, include_tellers=True):
+        """Returns an int8 matrix with 1 for aye, -1 for no and 0 otherwise.
+
+        Args:
+            include_tellers (bool): If True, tellers count towards the side they are telling for.
+        """
+        sides = np.sign(self.values).astype(np.int8)
+        if not include_tellers:
+            sides[np.abs(self.values) == 2] = 0
+        return sides
+
+    def __party_indicator(self):
+        parties, party_of_mp = np.unique(self.parties, return_inverse=True)
+        indicator = np.zeros((len(parties), len(self.mp_ids)), dtype=np.float32)
+        indicator[party_of_mp, np.arange(len(self.mp_ids))] = 1
+        return parties, indicator
+
+    def party_counts(self, include_tellers=True):
+        """Counts the ayes and noes of each party in each division.
+
+        Returns:
+            tuple: (parties, num_aye, num_no), where num_aye and num_no have shape (number of parties, number of divisions).
+        """
+        sides = self.sides(include_tellers=include_tellers)
+        parties, indicator = self.__party_indicator()
+        num_aye = indicator @ (sides == 1).astype(np.float32)
+        num_no = indicator @ (sides == -1).astype(np.float32)
+        return parties, num_aye.astype(np.int64), num_no.astype(np.int64)
+
+    def __division_frame(self, parties, values, name):
+        # One row per party and division. Not `DataFrame.stack`: before pandas 2.1 it drops the NaN of `rice_index`
+        num_parties, num_divisions = values.shape
+        return pd.DataFrame({
+            "party": np.repeat(np.asarray(parties), num_divisions),
+            "debate_id": np.tile(self.debate_ids, num_parties),
+            "house_division_id": np.tile(self.house_division_ids, num_parties),
+            name: np.asarray(values).ravel(),
+        })
+
+    def rice_index(self, include_tellers=True):
+        """The Rice index of cohesion of each party in each division: |ayes - noes| / (ayes + noes).
+
+        1 means the party voted as a block, 0 that it was split down the middle.
+
+        Returns:
+            pd.DataFrame: One row per party per division, with the columns party, debate_id, house_division_id
+                and rice_index (NaN when no MP of the party voted).
+        """
+        parties, num_aye, num_no = self.party_counts(include_tellers=include_tellers)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rice = np.abs(num_aye - num_no) / (num_aye + num_no)
+        return self.__division_frame(parties, rice, "rice_index")
+
+    def rebel_counts(self, include_tellers=True):
+        """Counts how many MPs of each party voted against their party in each division.
+
+        The rule is the one in `analysis.rebels`: an MP voted against their party when more of their
+        fellow party members voted the other way than the same way. So when a party is split exactly
+        in half, every one of its MPs counts as a rebel.
+
+        Returns:
+            pd.DataFrame: One row per party per division, with the columns party, debate_id, house_division_id
+                and num_MP_votes_against_majority.
+        """
+        parties, num_aye, num_no = self.party_counts(include_tellers=include_tellers)
+        # An aye voter has num_aye - 1 fellow ayes and num_no fellow noes, hence rebels iff num_no >= num_aye
+        rebels = np.where(num_no >= num_aye, num_aye, 0) + np.where(num_aye >= num_no, num_no, 0)
+        return self.__division_frame(parties, rebels, "num_MP_votes_against_majority")
+
+    def agreement(self, mp_ids=None, include_tellers=True):
+        """How often each pair of MPs voted the same way, out of the divisions in which both voted.
+
+        Args:
+            mp_ids (list): If given, only these MPs are compared.
+            include_tellers (bool): If True, tellers count towards the side they are telling for.
+
+        Returns:
+            pd.DataFrame: A square matrix indexed by mp_id on both axes, with values between 0 and 1
+                (NaN for pairs of MPs who never voted in the same division).
+        """
+        sides = self.sides(include_tellers=include_tellers)
+        labels = self.mp_ids
+        if mp_ids is not None:
+            rows = pd.Index(self.mp_ids).get_indexer([str(mp_id) for mp_id in mp_ids])
+            if (rows < 0).any():
+                raise ValueError("Some of the MP IDs are not in the matrix")
+            sides, labels = sides[rows], self.mp_ids[rows]
+
+        sides = sides.astype(np.float32)
+        present = np.abs(sides)
+        # For each pair: (same - opposite) and (same + opposite), in two matrix products
+        same_minus_opposite = sides @ sides.T
+        both_voted = present @ present.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            agreement = (both_voted + same_minus_opposite) / 2 / both_voted
+
+        return pd.DataFrame(agreement, index=pd.Index(labels, name="mp_id"), columns=pd.Index(labels, name="mp_id"))
@@ -0,0 +1,103 @@
+"""
+BENCHMARK: HTML parser backends for debate pages
+
+Checks that every parser backend in `twfy.PARSER_BACKENDS` (with and without targeted parsing of
+the speech blocks) produces exactly the same speeches, house divisions and votes as the default,
+and times how long each one takes on the same pages.
+
+Usage (with debate pages saved to disk, e.g. from the response cache):
+
+    python -m discordia.benchmarks.parsers page1.html page2.html ...
+
+"""
+
+import os
+import sys
+import time
+import itertools
+
+import pandas as pd
+
+from ..webscraping.twfy import (DEFAULT_PARSER, PARSER_BACKENDS,
+                                 parse_speech_blocks, scrape_one_debate)
+
+TABLES = ["df_speeches", "df_house_division", "df_votes"]
+
+
+def parse_page(debate_id, content, parser=DEFAULT_PARSER, only_speech_blocks=False):
+    """Parses one debate page all the way to (df_speeches, df_house_division, df_votes)."""
+    speech_blocks = parse_speech_blocks(content, parser=parser, only_speech_blocks=only_speech_blocks)
+    return scrape_one_debate(debate_id, speech_blocks)
+
+def backend_configurations(parsers=PARSER_BACKENDS):
+    """Returns every (parser, only_speech_blocks) combination to compare."""
+    return list(itertools.product(parsers, [False, True]))
+
+def check_parser_parity(pages, parsers=PARSER_BACKENDS):
+    """Checks that all parser backends produce identical output.
+
+    Args:
+        pages (dict): Raw HTML of debate pages, keyed by debate ID.
+        parsers (list): The parser backends to compare against `DEFAULT_PARSER`.
+
+    Raises:
+        AssertionError: If any backend produces a different output than the default parser 
+            on any page. The message says which page, backend and table differ.
+
+    """
+
+    for debate_id, content in pages.items():
+        expected = parse_page(debate_id, content)
+        for parser, only_speech_blocks in backend_configurations(parsers):
+            actual = parse_page(debate_id, content, parser=parser, only_speech_blocks=only_speech_blocks)
+            for table, df_expected, df_actual in zip(TABLES, expected, actual):
+                try:
+                    pd.testing.assert_frame_equal(df_expected, df_actual)
+                except AssertionError as e:
+                    raise AssertionError(f"{table} of {debate_id} differs with parser={parser}, "
+                                         f"only_speech_blocks={only_speech_blocks}:\n{e}") from e
+
+def benchmark_parsers(pages, parsers=PARSER_BACKENDS, repeat=3):
+    """Times every parser backend on the same pages.
+
+    Args:
+        pages (dict): Raw HTML of debate pages, keyed by debate ID.
+        parsers (list): The parser backends to time.
+        repeat (int): How many times each backend parses all pages. The fastest run is reported.
+
+    Returns:
+        pd.DataFrame: One row per backend configuration, with the columns 
+            parser, only_speech_blocks, seconds, pages_per_second and MB_per_second.
+
+    """
+
+    total_bytes = sum(len(content) for content in pages.values())
+
+    results = []
+    for parser, only_speech_blocks in backend_configurations(parsers):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for debate_id, content in pages.items():
+                parse_page(debate_id, content, parser=parser, only_speech_blocks=only_speech_blocks)
+            timings.append(time.perf_counter() - start)
+        seconds = min(timings)
+        results.append({
+            "parser": parser,
+            "only_speech_blocks": only_speech_blocks,
+            "seconds": seconds,
+            "pages_per_second": len(pages) / seconds,
+            "MB_per_second": total_bytes / 1024 ** 2 / seconds
+        })
+    return pd.DataFrame(results).sort_values("seconds", ignore_index=True)
+
+
+if __name__ == "__main__":
+    pages = {}
+    for path in sys.argv[1:]:
+        with open(path, "rb") as f:
+            pages[os.path.splitext(os.path.basename(path))[0]] = f.read()
+
+    check_parser_parity(pages)
+    print("All parser backends produce identical output.")
+    print(benchmark_parsers(pages).to_string(index=False))
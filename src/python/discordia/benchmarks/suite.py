@@ -0,0 +1,255 @@
+"""
+BENCHMARK SUITE: the scrapers, end to end, without the network
+
+Times the main steps of `twfy` on the pages in `benchmarks/fixtures/` (a day listing, a debate with
+many speeches and a debate with several divisions, saved from theyworkforyou.com) and on synthetic
+pages of increasing size (see `benchmarks/synthetic.py`):
+
+- get_debate_section                 on every section of a day listing
+- get_all_speech_blocks              download (from memory) and parse of a debate page
+- scrape_one_speech                  on every speech block of a debate
+- scrape_one_house_division          on every division block of a debate
+- get_speeches_divisions_and_votes   everything above, for a list of debate URLs
+
+Pages are served from memory by `FixtureFetcher`, so the numbers only measure parsing and
+extraction. Each benchmark reports its throughput and its peak memory (measured with tracemalloc,
+in a separate run so that tracing does not slow down the timings).
+
+Usage:
+
+    python -m discordia.benchmarks.suite
+    python -m discordia.benchmarks.suite --scale 1 10 100 --repeat 5 --json results.json
+
+"""
+
+import os
+import time
+import argparse
+import warnings
+import tracemalloc
+
+import pandas as pd
+
+from bs4 import BeautifulSoup
+
+from ..webscraping.twfy import (DEFAULT_PARSER, get_debate_section, get_all_speech_blocks, scrape_one_speech,
+                                 scrape_one_house_division, get_speeches_divisions_and_votes)
+from .synthetic import synthetic_day_listing, synthetic_debate_page
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+FIXTURE_URL = "https://www.theyworkforyou.com/debates/?id={debate_id}"
+
+# debate ID of each checked-in debate page
+FIXTURE_DEBATES = {
+    "speech_heavy_debate": "2023-11-15b.633.6",
+    "multi_division_debate": "2023-11-15b.659.1",
+}
+
+DEFAULT_SCALES = [1, 10]
+
+
+class FixtureFetcher:
+    """Serves pages from memory, with the same interface as `fetching.Fetcher`.
+
+    Args:
+        pages (dict): Raw HTML (bytes or str) keyed by URL. Other URLs return None, like a 404.
+
+    """
+
+    def __init__(self, pages):
+        self.pages = {url: content.encode("utf-8") if isinstance(content, str) else content
+                      for url, content in pages.items()}
+        self.missing = set()
+
+    def get(self, url, max_age=None):
+        if url not in self.pages:
+            self.missing.add(url)
+        return self.pages.get(url)
+
+    def failed_urls(self):
+        return set(self.missing)
+
+    def close(self):
+        pass
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """Reads the checked-in pages.
+
+    Returns:
+        dict: Raw HTML (bytes), keyed by file name without the extension, e.g. 'day_listing'.
+    """
+    pages = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".html"):
+            with open(os.path.join(directory, filename), "rb") as f:
+                pages[os.path.splitext(filename)[0]] = f.read()
+    return pages
+
+def measure(function, repeat=3):
+    """Runs a function `repeat` times, then once more under tracemalloc.
+
+    Returns:
+        tuple: (fastest time in seconds, peak memory allocated during the traced run in bytes, output of the last run)
+    """
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = function()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return min(timings), peak, output
+
+def __result(benchmark, workload, num_items, num_bytes, seconds, peak):
+    return {
+        "benchmark": benchmark,
+        "workload": workload,
+        "items": num_items,
+        "seconds": seconds,
+        "items_per_second": num_items / seconds if seconds > 0 else float("inf"),
+        "MB_per_second": num_bytes / 1024 ** 2 / seconds if seconds > 0 else float("inf"),
+        "peak_MB": peak / 1024 ** 2,
+    }
+
+def __split_blocks(speech_blocks):
+    """Separates the speech blocks of a debate into speeches and (house_division_id, division block) pairs."""
+    division_ids = set()
+    if speech_blocks and speech_blocks[0].find("ul", attrs={"class": "debate-speech__division__details"}):
+        division_ids = {a.get("href")[1:] for a in speech_blocks[0].find_all("a")}
+    speeches = [block for block in speech_blocks if block.get("id") is not None and block.get("id") not in division_ids]
+    divisions = [(block.get("id"), block) for block in speech_blocks if block.get("id") in division_ids]
+    return speeches, divisions
+
+def benchmark_day_listing(name, content, repeat=3):
+    """Times `get_debate_section` on every section of a day listing."""
+    sections = BeautifulSoup(content, DEFAULT_PARSER).select("ul.business-list > li")
+
+    def run():
+        # The listings have sections without debates: the warnings are expected here
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return [item for section in sections for item in get_debate_section(section)]
+
+    seconds, peak, items = measure(run, repeat=repeat)
+    return [__result("get_debate_section", name, len(items), len(content), seconds, peak)]
+
+def benchmark_debate_page(name, content, repeat=3, parser=DEFAULT_PARSER):
+    """Times `get_all_speech_blocks`, `scrape_one_speech` and `scrape_one_house_division` on one debate page."""
+    url = FIXTURE_URL.format(debate_id=name)
+    fetcher = FixtureFetcher({url: content})
+
+    seconds, peak, speech_blocks = measure(lambda: get_all_speech_blocks(url, fetcher=fetcher, parser=parser), repeat=repeat)
+    results = [__result("get_all_speech_blocks", name, len(speech_blocks), len(content), seconds, peak)]
+
+    speeches, divisions = __split_blocks(speech_blocks)
+    if speeches:
+        seconds, peak, _ = measure(lambda: [scrape_one_speech(block) for block in speeches], repeat=repeat)
+        results.append(__result("scrape_one_speech", name, len(speeches), 0, seconds, peak))
+    if divisions:
+        seconds, peak, dfs = measure(lambda: [scrape_one_house_division(division_id, block)
+                                              for division_id, block in divisions], repeat=repeat)
+        # Throughput in votes rather than divisions, which vary a lot in size
+        results.append(__result("scrape_one_house_division", name, sum(len(df) for df in dfs), 0, seconds, peak))
+    return results
+
+def benchmark_end_to_end(name, pages, repeat=3, max_workers=1, parser=DEFAULT_PARSER, processes=None):
+    """Times `get_speeches_divisions_and_votes` on a set of debate pages.
+
+    Args:
+        name (str): Name of the workload in the results.
+        pages (dict): Raw HTML of debate pages, keyed by debate ID.
+        processes (int): Passed to `get_speeches_divisions_and_votes`. The time includes starting the processes.
+
+    """
+    fetcher = FixtureFetcher({FIXTURE_URL.format(debate_id=debate_id): content for debate_id, content in pages.items()})
+    urls = list(fetcher.pages)
+
+    seconds, peak, (df_speeches, _, df_votes) = measure(
+        lambda: get_speeches_divisions_and_votes(urls, max_workers=max_workers, fetcher=fetcher, parser=parser,
+                                                 processes=processes),
+        repeat=repeat
+    )
+    num_bytes = sum(len(content) for content in fetcher.pages.values())
+    return [__result("get_speeches_divisions_and_votes", name, len(df_speeches) + len(df_votes), num_bytes, seconds, peak)]
+
+def synthetic_workloads(scale):
+    """The synthetic pages of one scale: a day listing and three debate pages, growing linearly with `scale`.
+
+    Returns:
+        tuple: (day listing HTML, dict of debate page HTML keyed by debate ID)
+    """
+    listing = synthetic_day_listing(num_debates=50 * scale, seed=scale)
+    debates = {
+        f"2023-11-15b.{scale}.0": synthetic_debate_page(num_speeches=200 * scale, seed=scale),
+        f"2023-11-15b.{scale}.1": synthetic_debate_page(num_speeches=10 * scale, num_divisions=2 * scale, seed=scale),
+        f"2023-11-15b.{scale}.2": synthetic_debate_page(num_speeches=100 * scale, num_divisions=scale, seed=scale),
+    }
+    return listing, debates
+
+def run_suite(scales=DEFAULT_SCALES, repeat=3, max_workers=1, parser=DEFAULT_PARSER, include_fixtures=True,
+              processes=None):
+    """Runs every benchmark on the fixtures and on synthetic pages of each scale.
+
+    Args:
+        scales (list): Sizes of the synthetic workloads (see `synthetic_workloads`). Scale 1 is
+            a listing of 50 debates and pages with up to 200 speeches or 2 divisions of 600 MPs.
+        repeat (int): How many times each benchmark is run. The fastest run is reported.
+        max_workers (int): Passed to `get_speeches_divisions_and_votes`.
+        parser (str): The parser backend to benchmark, one of `twfy.PARSER_BACKENDS`.
+        include_fixtures (bool): If False, only the synthetic pages are used.
+        processes (int): Passed to `get_speeches_divisions_and_votes` in the end-to-end benchmarks.
+
+    Returns:
+        pd.DataFrame: One row per benchmark per workload, with the columns benchmark, workload, items,
+            seconds, items_per_second, MB_per_second (0 when the input is already parsed) and peak_MB.
+
+    """
+
+    results = []
+    if include_fixtures:
+        fixtures = load_fixtures()
+        results += benchmark_day_listing("fixture:day_listing", fixtures["day_listing"], repeat=repeat)
+        debates = {}
+        for name, debate_id in FIXTURE_DEBATES.items():
+            results += benchmark_debate_page(f"fixture:{name}", fixtures[name], repeat=repeat, parser=parser)
+            debates[debate_id] = fixtures[name]
+        results += benchmark_end_to_end("fixture:all_debates", debates, repeat=repeat, max_workers=max_workers,
+                                        parser=parser, processes=processes)
+
+    for scale in scales:
+        listing, debates = synthetic_workloads(scale)
+        results += benchmark_day_listing(f"synthetic:x{scale}", listing.encode("utf-8"), repeat=repeat)
+        for debate_id, content in debates.items():
+            results += benchmark_debate_page(f"synthetic:x{scale}:{debate_id}", content.encode("utf-8"),
+                                             repeat=repeat, parser=parser)
+        results += benchmark_end_to_end(f"synthetic:x{scale}", debates, repeat=repeat, max_workers=max_workers,
+                                        parser=parser, processes=processes)
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmarks the TheyWorkForYou scrapers offline.")
+    arg_parser.add_argument("--scale", type=int, nargs="+", default=DEFAULT_SCALES, help="sizes of the synthetic workloads")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark (the fastest is reported)")
+    arg_parser.add_argument("--max-workers", type=int, default=1, help="threads for get_speeches_divisions_and_votes")
+    arg_parser.add_argument("--parser", default=DEFAULT_PARSER, help="BeautifulSoup parser backend")
+    arg_parser.add_argument("--processes", type=int, help="parse in this many processes in the end-to-end benchmarks")
+    arg_parser.add_argument("--json", help="also write the results to this JSON file")
+    args = arg_parser.parse_args()
+
+    df = run_suite(scales=args.scale, repeat=args.repeat, max_workers=args.max_workers, parser=args.parser,
+                   processes=args.processes)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(df.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    if args.json:
+        df.to_json(args.json, orient="records", indent=2)
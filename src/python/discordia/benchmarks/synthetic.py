@@ -0,0 +1,233 @@
+"""
+SYNTHETIC PAGES: They Work For You pages of any size
+
+Generates day listings and debate pages with the same markup as the ones on theyworkforyou.com
+(see the docstrings of `twfy.get_debate_section`, `twfy.get_all_speech_blocks` and the fixtures in
+`benchmarks/fixtures/`), so the scrapers can be benchmarked on pages far larger than any real one:
+thousands of speeches, dozens of divisions, hundreds of MPs per division.
+
+The pages include the odd cases the scrapers have to deal with: speech blocks without a speaker
+("Several hon. Members rose—"), proxy votes, tellers and list items without a link to an MP.
+The same arguments (and seed) always produce the same page.
+
+"""
+
+import random
+
+from html import escape
+
+_WORDS = (
+    "government minister department people country constituency policy support services funding "
+    "public local communities investment health schools housing energy transport rural broadband "
+    "connectivity security economy families businesses workers costs living crisis children safety "
+    "digital technology industry climate hospital police justice welfare pensions trade agreement "
+    "amendment clause bill house member honourable friend right question answer debate vote"
+).split()
+
+_PARTIES = ["Conservative", "Labour", "Scottish National Party", "Liberal Democrat", "Plaid Cymru", "Green Party"]
+
+_POSITIONS = [
+    "The Parliamentary Under-Secretary of State for Science, Innovation and Technology",
+    "Shadow Minister (Levelling Up)",
+    "The Minister of State, Department for Transport",
+    "Leader of the House",
+]
+
+
+def __sentence(rng, num_words):
+    words = [rng.choice(_WORDS) for _ in range(num_words)]
+    return " ".join(words).capitalize() + "."
+
+def __constituency(rng):
+    return f"{rng.choice(_WORDS).capitalize()} {rng.choice(['North', 'South', 'East', 'West', 'Central'])}"
+
+def __speech_block(rng, speech_id, mp_id, num_paragraphs):
+    position = rng.choice(_POSITIONS) if rng.random() < 0.3 else f"{__constituency(rng)} ({rng.choice(_PARTIES)})"
+    paragraphs = []
+    for p in range(num_paragraphs):
+        text = " ".join(__sentence(rng, rng.randint(8, 30)) for _ in range(rng.randint(1, 4)))
+        if rng.random() < 0.2:
+            # Some paragraphs embed links, like the Wikipedia links on the real pages
+            word = rng.choice(_WORDS)
+            text += f' See <a href="https://en.wikipedia.org/wiki/{word}" rel="nofollow">{word}</a>.'
+        paragraphs.append(f'<p pid="{speech_id[1:]}/{p + 1}">{text}</p>')
+
+    return f"""<div class="debate-speech" id="{speech_id}">
+<div class="full-page__row">
+<div class="full-page__unit">
+<a name="{speech_id}"></a>
+<div class="debate-speech__speaker-and-content">
+<h2 class="debate-speech__speaker">
+<a href="/mp/?p={mp_id}">
+<img alt="Photo of MP {mp_id}" src="/people-images/mps/{mp_id}.jpg"/>
+<strong class="debate-speech__speaker__name">MP {mp_id}</strong>
+<small class="debate-speech__speaker__position">{escape(position)}</small>
+</a>
+</h2>
+<div class="debate-speech__content">
+{chr(10).join(paragraphs)}
+</div>
+</div>
+</div>
+</div>
+</div>"""
+
+def __members_rose_block(speech_id):
+    return f"""<div class="debate-speech" id="{speech_id}">
+<div class="full-page__row">
+<div class="full-page__unit">
+<div class="debate-speech__speaker-and-content">
+<div class="debate-speech__content">
+<p class="italic">Several hon. Members rose—</p>
+</div>
+</div>
+</div>
+</div>
+</div>"""
+
+def __mp_item(rng, mp_id):
+    party = rng.choice(_PARTIES)
+    if rng.random() < 0.05:
+        party += f" (proxy vote cast by MP {rng.randint(10000, 30000)})"
+    return f'<li><a href="/mp/?p={mp_id}">MP {mp_id}</a> <span>{escape(party)}</span></li>'
+
+def __vote_side(rng, side, mp_ids, teller_ids):
+    voters = "\n".join(__mp_item(rng, mp_id) for mp_id in mp_ids)
+    if rng.random() < 0.5:
+        # The scrapers must skip items without a link to an MP
+        voters += "\n<li>Vacant seat</li>"
+    tellers = "\n".join(__mp_item(rng, mp_id) for mp_id in teller_ids)
+    return f"""<div class="division-section__vote division-section__vote__names">
+<h3>{side}: {len(mp_ids)} MPs</h3>
+<ul class="division-names js-accordion">
+{voters}
+</ul>
+<h4>Tellers</h4>
+<ul class="division-names">
+{tellers}
+</ul>
+</div>"""
+
+def __division_block(rng, division_id, number, mp_ids):
+    mp_ids = list(mp_ids)
+    rng.shuffle(mp_ids)
+    split = rng.randint(len(mp_ids) // 3, 2 * len(mp_ids) // 3)
+    ayes, noes = mp_ids[:split], mp_ids[split:]
+    title = __sentence(rng, rng.randint(3, 8))[:-1]
+    return f"""<div class="debate-speech" id="{division_id}">
+<h2 class="division-title"><strong>Division number {number}</strong> {escape(title)}</h2>
+{__vote_side(rng, "Aye", ayes[2:], ayes[:2])}
+{__vote_side(rng, "No", noes[2:], noes[:2])}
+</div>"""
+
+def synthetic_debate_page(num_speeches=100, num_divisions=0, mps_per_division=600,
+                          paragraphs_per_speech=(1, 6), seed=0):
+    """Generates the HTML of a debate page.
+
+    Args:
+        num_speeches (int): Number of speeches. About one in fifty is a speaker-less "Several hon. Members rose—".
+        num_divisions (int): Number of house divisions, placed after the speeches.
+        mps_per_division (int): Number of MPs voting in each division (including two tellers per side).
+        paragraphs_per_speech (tuple): Minimum and maximum number of paragraphs in a speech.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        str: The HTML of the page.
+
+    """
+
+    rng = random.Random(seed)
+    mp_ids = list(range(10000, 10000 + max(mps_per_division, 50)))
+
+    blocks = []
+    division_ids = [f"g{1000 + i}.0" for i in range(num_divisions)]
+    if division_ids:
+        links = "\n".join(f'<li><a href="#{division_id}">Division number {i + 1}</a></li>'
+                          for i, division_id in enumerate(division_ids))
+        blocks.append(f"""<div class="debate-speech" id="g100.0">
+<ul class="debate-speech__division__details">
+{links}
+</ul>
+</div>""")
+
+    for i in range(num_speeches):
+        speech_id = f"g{200 + i // 10}.{i % 10}"
+        if i % 50 == 49:
+            blocks.append(__members_rose_block(speech_id))
+        else:
+            blocks.append(__speech_block(rng, speech_id, rng.choice(mp_ids), rng.randint(*paragraphs_per_speech)))
+
+    for i, division_id in enumerate(division_ids):
+        blocks.append(__division_block(rng, division_id, i + 1, mp_ids[:mps_per_division]))
+
+    return f"""<!DOCTYPE html>
+<html lang="en-gb">
+<head><meta charset="utf-8"><title>Synthetic debate - TheyWorkForYou</title></head>
+<body>
+<div class="full-page">
+<div class="full-page__row"><h1>Synthetic debate</h1></div>
+{chr(10).join(blocks)}
+</div>
+</body>
+</html>"""
+
+def synthetic_day_listing(num_debates=50, debates_per_section=5, date="2023-11-15", house="b", seed=0):
+    """Generates the HTML of the list of debates of one day.
+
+    Args:
+        num_debates (int): Number of debates listed.
+        debates_per_section (int): Debates are grouped in sections of this size, alternating with standalone debates.
+        date (str): The day, used in the debate IDs.
+        house (str): The letter after the date in the debate IDs.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        str: The HTML of the page.
+
+    """
+
+    rng = random.Random(seed)
+    column = 600
+
+    def debate_item(section):
+        nonlocal column
+        column += 1
+        debate_id = f"{date}{house}.{column}.{rng.randint(0, 9)}"
+        item = (f'<a class="business-list__title" href="/debates/?id={debate_id}">\n'
+                f'<h3>{escape(__sentence(rng, 3)[:-1])}</h3>\n'
+                f'<span class="business-list__meta">{rng.randint(1, 40)} speeches</span>\n</a>')
+        if not section or rng.random() < 0.5:
+            item += f'\n<p class="business-list__excerpt">{escape(__sentence(rng, 12))}</p>'
+        return item
+
+    items, num_listed = [], 0
+    while num_listed < num_debates:
+        if len(items) % 2 == 0:
+            items.append(f"<li>\n{debate_item(section=False)}\n</li>")
+            num_listed += 1
+            continue
+        size = min(debates_per_section, num_debates - num_listed)
+        debates = "\n".join(f"<li>\n{debate_item(section=True)}\n</li>" for _ in range(size))
+        column += 1
+        items.append(f"""<li>
+<div class="business-list__section">
+<h3><a href="/debates/?id={date}{house}.{column}.0">{escape(__sentence(rng, 4)[:-1])}</a></h3>
+<p>{escape(__sentence(rng, 6))}</p>
+</div>
+<ul>
+{debates}
+</ul>
+</li>""")
+        num_listed += size
+
+    return f"""<!DOCTYPE html>
+<html lang="en-gb">
+<head><meta charset="utf-8"><title>Commons debates for {date} - TheyWorkForYou</title></head>
+<body>
+<div class="full-page">
+<ul class="business-list">
+{chr(10).join(items)}
+</ul>
+</div>
+</body>
+</html>"""
@@ -0,0 +1,315 @@
+"""
+COMMAND LINE: the DISCORDIA pipeline from a terminal or a cron job
+
+    discordia crawl index     --start 2023-11-01 --end 2023-11-30 --csv debates.csv
+    discordia crawl debates   --db data/discordia.db --start 2023-11-01 --end 2023-11-30 --workers 8
+    discordia ingest          --db data/discordia.db --from-csv debates.csv --processes 4
+    discordia export          --db data/discordia.db --out data/parquet
+    discordia analyze rebels  --db data/discordia.db --out rebels.csv
+
+(or `python -m discordia ...`). Run any command with --help for its options.
+
+Only the standard library is imported up front. Each command imports what it needs when it runs,
+so pandas, BeautifulSoup, requests, pyarrow, scipy or spaCy are only loaded by the commands that use
+them, and Selenium and IPython never are.
+
+"""
+
+import sys
+import argparse
+import contextlib
+
+DEFAULT_WORKERS = 8
+# Seconds after which a cached day listing is checked again: it may have been empty before its Hansard was published
+DEFAULT_LISTING_MAX_AGE = 60 * 60
+
+
+#### HELPERS ####
+
+def __date(value):
+    from datetime import datetime
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a date as YYYY-MM-DD but got {value}")
+
+def __fetcher(args):
+    from .webscraping.cache import ResponseCache
+    from .webscraping.fetching import Fetcher
+    from .webscraping.scheduler import FetchScheduler
+
+    # A refresh looks for revisions, which stale cached pages would hide
+    revalidate = args.revalidate or getattr(args, "refresh", False)
+    cache = ResponseCache(args.cache, revalidate=revalidate) if args.cache else None
+    scheduler = FetchScheduler(rate=args.rate, max_concurrency=args.workers)
+    return Fetcher(pool_size=args.workers, cache=cache, scheduler=scheduler)
+
+def __connect(path):
+    """Opens the database, closing it when the command is done, even if it fails."""
+    from . import storage
+    return contextlib.closing(storage.connect(path))
+
+def __base_url(house):
+    from .webscraping.sitting_days import HOUSE_URLS
+    return HOUSE_URLS[house]
+
+def __sitting_days(args):
+    if not args.sitting_days:
+        return None
+    from .webscraping.sitting_days import SittingDayIndex
+    return SittingDayIndex(args.sitting_days, house=args.house)
+
+def __metrics(args):
+    if not args.metrics:
+        return None
+    from .webscraping.instrumentation import Metrics
+    return Metrics()
+
+def __report(args, fetcher, metrics):
+    """Writes the metrics and lists the pages that could not be downloaded, on stderr."""
+    if metrics is not None:
+        metrics.to_json(args.metrics)
+        print(metrics.report(), file=sys.stderr)
+
+    df_failures = fetcher.failure_report()
+    if len(df_failures) > 0:
+        print(f"{len(df_failures)} page(s) could not be downloaded:", file=sys.stderr)
+        print(df_failures.to_string(index=False), file=sys.stderr)
+    if args.failures:
+        df_failures.to_csv(args.failures, index=False)
+    return 1 if len(df_failures) > 0 else 0
+
+def __write_table(df, path):
+    if path is None:
+        df.to_csv(sys.stdout, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+def __add_fetch_arguments(parser):
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="pages downloaded concurrently")
+    parser.add_argument("--rate", type=float, default=5.0, help="maximum requests per second to the website")
+    parser.add_argument("--cache", help="directory of an on-disk cache of the downloaded pages")
+    parser.add_argument("--revalidate", action="store_true",
+                        help="check with the website that cached pages are up to date before using them")
+    parser.add_argument("--metrics", help="write timings and counters of the crawl to this JSON file")
+    parser.add_argument("--failures", help="write the pages that could not be downloaded to this CSV file")
+
+def __add_date_arguments(parser):
+    parser.add_argument("--start", type=__date, required=True, help="first day, as YYYY-MM-DD")
+    parser.add_argument("--end", type=__date, required=True, help="last day (inclusive), as YYYY-MM-DD")
+    parser.add_argument("--house", default="commons", choices=["commons", "westminster_hall", "lords"])
+    parser.add_argument("--sitting-days", help="JSON sitting-day index, so that only sitting days are visited")
+    parser.add_argument("--listing-max-age", type=float, default=DEFAULT_LISTING_MAX_AGE,
+                        help="seconds after which a cached day listing is checked again with the website")
+
+
+#### COMMANDS ####
+
+def crawl_index(args):
+    """Lists the debates of each day of the range."""
+    import pandas as pd
+
+    from . import storage
+    from .webscraping import twfy
+
+    fetcher, metrics = __fetcher(args), __metrics(args)
+    with fetcher:
+        sitting_days = __sitting_days(args)
+        dates = (sitting_days.sitting_days(args.start, args.end, fetcher=fetcher) if sitting_days is not None
+                 else pd.date_range(args.start, args.end))
+        df_debates = twfy.scrape_debate_days(dates, max_workers=args.workers, fetcher=fetcher,
+                                             base_url=__base_url(args.house), metrics=metrics,
+                                             max_age=args.listing_max_age)
+
+        if args.db:
+            with __connect(args.db) as conn:
+                storage.write_debates(conn, df_debates)
+        else:
+            __write_table(df_debates, args.csv)
+        print(f"{len(df_debates)} debates on {len(dates)} day(s)", file=sys.stderr)
+        return __report(args, fetcher, metrics)
+
+def crawl_debates(args):
+    """Crawls every debate of the range into the database, resuming from the checkpoint."""
+    from .webscraping.jobs import CrawlJob
+
+    fetcher, metrics = __fetcher(args), __metrics(args)
+    with fetcher, __connect(args.db) as conn:
+        job = CrawlJob(conn, args.checkpoint or args.db + ".checkpoint.json",
+                       base_url=__base_url(args.house), max_workers=args.workers, fetcher=fetcher,
+                       metrics=metrics, processes=args.processes, sitting_days=__sitting_days(args),
+                       listing_max_age=args.listing_max_age)
+        num_debates = job.run(args.start, args.end, force=args.force, refresh=args.refresh)
+        print(f"{num_debates} debates crawled", file=sys.stderr)
+        return __report(args, fetcher, metrics)
+
+def ingest(args):
+    """Scrapes a list of debate pages into a database or CSV files."""
+    import pandas as pd
+
+    from .webscraping import twfy
+    from .webscraping.sinks import CSVSink, write_stream
+
+    urls = list(args.urls)
+    if args.from_csv:
+        urls += list(pd.read_csv(args.from_csv)["url"])
+    if not urls:
+        print("Nothing to ingest: give debate URLs or --from-csv", file=sys.stderr)
+        return 2
+
+    fetcher, metrics = __fetcher(args), __metrics(args)
+    with fetcher, contextlib.ExitStack() as stack:
+        if args.db:
+            from . import storage
+            sink = storage.SQLiteSink(stack.enter_context(__connect(args.db)))
+        else:
+            sink = CSVSink(args.csv)
+
+        stream = twfy.iter_speeches_divisions_and_votes(urls, batch_size=args.batch_size, max_workers=args.workers,
+                                                        fetcher=fetcher, parser=args.parser,
+                                                        metrics=metrics, processes=args.processes)
+        write_stream(stream, sink, metrics=metrics)
+        return __report(args, fetcher, metrics)
+
+def export(args):
+    """Exports the database to partitioned Parquet files."""
+    from .export import export_parquet
+
+    with __connect(args.db) as conn:
+        counts = export_parquet(conn, args.out, tables=args.tables, batch_size=args.batch_size)
+    for table, num_rows in counts.items():
+        print(f"{table}: {num_rows} rows", file=sys.stderr)
+    return 0
+
+def analyze_rebels(args):
+    """How many MPs of each party voted against their party in each division."""
+    from .analysis.rebels import rebels_per_house_division
+
+    with __connect(args.db) as conn:
+        __write_table(rebels_per_house_division(conn, term_start=args.term_start), args.out)
+    return 0
+
+def analyze_vote_matrix(args):
+    """Builds the MP x division vote matrix and saves it."""
+    from .analysis.vote_matrix import VoteMatrix
+
+    with __connect(args.db) as conn:
+        matrix = VoteMatrix.from_database(conn, term_start=args.term_start)
+    matrix.save(args.out)
+    print(f"{matrix.values.shape[0]} MPs x {matrix.values.shape[1]} divisions", file=sys.stderr)
+    return 0
+
+def analyze_search(args):
+    """Full-text search of the speeches."""
+    from .search import search_speeches
+
+    with __connect(args.db) as conn:
+        df = search_speeches(conn, args.query, speaker_ids=args.speaker,
+                             start_date=args.start, end_date=args.end, limit=args.limit)
+    __write_table(df, args.out)
+    return 0
+
+def analyze_text(args):
+    """Lemmatises new speeches and updates the document-term matrix."""
+    from .textmining import DEFAULT_MODEL, load_nlp, lemmatize_speeches, build_document_term_matrix
+
+    with __connect(args.db) as conn:
+        num_speeches = lemmatize_speeches(conn, nlp=load_nlp(args.model or DEFAULT_MODEL), n_process=args.processes)
+        dtm = build_document_term_matrix(conn, args.out)
+    print(f"{num_speeches} speeches lemmatised, {dtm.counts.shape[0]} x {dtm.counts.shape[1]} matrix", file=sys.stderr)
+    return 0
+
+
+#### ARGUMENTS ####
+
+def build_parser():
+    """Returns the `argparse.ArgumentParser` of the `discordia` command."""
+
+    parser = argparse.ArgumentParser(prog="discordia", description="Scrape and analyse UK parliamentary debates.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # crawl index | crawl debates
+    crawl = commands.add_parser("crawl", help="crawl theyworkforyou.com").add_subparsers(dest="target", required=True)
+
+    index = crawl.add_parser("index", help="list the debates of a range of days")
+    __add_date_arguments(index)
+    __add_fetch_arguments(index)
+    output = index.add_mutually_exclusive_group()
+    output.add_argument("--db", help="upsert the debates into this SQLite database")
+    output.add_argument("--csv", help="write the debates to this CSV file (default: standard output)")
+    index.set_defaults(function=crawl_index)
+
+    debates = crawl.add_parser("debates", help="crawl every debate of a range of days into the database")
+    __add_date_arguments(debates)
+    __add_fetch_arguments(debates)
+    debates.add_argument("--db", required=True, help="SQLite database")
+    debates.add_argument("--checkpoint", help="JSON checkpoint file (default: next to the database)")
+    debates.add_argument("--processes", type=int, help="parse the pages in this many processes")
+    debates.add_argument("--force", action="store_true", help="visit again the days already marked as done")
+    debates.add_argument("--refresh", action="store_true",
+                         help="crawl again the debates already in the database and write what changed "
+                              "(implies --revalidate)")
+    debates.set_defaults(function=crawl_debates)
+
+    # ingest
+    ingest_parser = commands.add_parser("ingest", help="scrape a list of debate pages")
+    ingest_parser.add_argument("urls", nargs="*", help="URLs of debate pages")
+    ingest_parser.add_argument("--from-csv", help="CSV file with a url column, e.g. written by `crawl index`")
+    __add_fetch_arguments(ingest_parser)
+    ingest_parser.add_argument("--processes", type=int, help="parse the pages in this many processes")
+    ingest_parser.add_argument("--batch-size", type=int, default=50, help="debates written per batch")
+    ingest_parser.add_argument("--parser", default="html.parser", choices=["html.parser", "lxml"])
+    sink = ingest_parser.add_mutually_exclusive_group(required=True)
+    sink.add_argument("--db", help="upsert into this SQLite database")
+    sink.add_argument("--csv", help="append to CSV files in this directory")
+    ingest_parser.set_defaults(function=ingest)
+
+    # export
+    export_parser = commands.add_parser("export", help="export the database to partitioned Parquet files")
+    export_parser.add_argument("--db", required=True, help="SQLite database")
+    export_parser.add_argument("--out", required=True, help="output directory")
+    export_parser.add_argument("--tables", nargs="+", help="tables to export (default: all)")
+    export_parser.add_argument("--batch-size", type=int, default=50_000, help="rows read at a time")
+    export_parser.set_defaults(function=export)
+
+    # analyze rebels | vote-matrix | search | text
+    analyze = commands.add_parser("analyze", help="analyses of the database").add_subparsers(dest="analysis", required=True)
+
+    rebels = analyze.add_parser("rebels", help="MPs voting against their party, per division")
+    rebels.add_argument("--term-start", type=int, default=2017)
+    rebels.set_defaults(function=analyze_rebels)
+
+    vote_matrix = analyze.add_parser("vote-matrix", help="save the MP x division vote matrix")
+    vote_matrix.add_argument("--term-start", type=int, default=2017)
+    vote_matrix.set_defaults(function=analyze_vote_matrix)
+
+    search = analyze.add_parser("search", help="full-text search of the speeches")
+    search.add_argument("query")
+    search.add_argument("--speaker", nargs="+", help="only these speaker IDs")
+    search.add_argument("--start", type=__date, help="first day, as YYYY-MM-DD")
+    search.add_argument("--end", type=__date, help="last day (inclusive), as YYYY-MM-DD")
+    search.add_argument("--limit", type=int, default=20)
+    search.set_defaults(function=analyze_search)
+
+    text = analyze.add_parser("text", help="lemmatise new speeches and update the document-term matrix")
+    text.add_argument("--model", help="spaCy model (default: en_core_web_sm)")
+    text.add_argument("--processes", type=int, default=1, help="spaCy processes")
+    text.set_defaults(function=analyze_text)
+
+    for analysis_parser in [rebels, vote_matrix, search, text]:
+        analysis_parser.add_argument("--db", required=True, help="SQLite database")
+    for analysis_parser in [rebels, search]:
+        analysis_parser.add_argument("--out", help="output CSV file (default: standard output)")
+    vote_matrix.add_argument("--out", required=True, help="output directory")
+    text.add_argument("--out", help="directory where the document-term matrix is cached")
+
+    return parser
+
+def main(argv=None):
+    """Runs the `discordia` command. Returns the exit status: 1 if some pages could not be downloaded."""
+    args = build_parser().parse_args(argv)
+    return args.function(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
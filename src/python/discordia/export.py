@@ -0,0 +1,168 @@
+"""
+EXPORT: the DISCORDIA tables as a partitioned Parquet dataset
+
+`pd.read_sql` always reads whole rows, so loading the votes of one month out of `discordia.db`
+still goes through the entire table, and any query on `speeches` drags `speech_html` along with it.
+This module writes `debates`, `speeches`, `house_divisions` and `votes` as Parquet files instead,
+one directory per table, partitioned by the sitting date and house letter at the start of each
+`debate_id` (e.g. 2023-11-15b.633.6 is in `sitting_date=2023-11-15/house=b`):
+
+    ../data/parquet/votes/sitting_date=2023-11-15/house=b/part-0.parquet
+
+`read_parquet` then only opens the directories matching the date and house filters, and only
+reads the columns asked for.
+
+Requires `pyarrow` (`pip install discordia[parquet]`).
+
+Example:
+
+    conn = storage.connect('../data/discordia.db')
+    export_parquet(conn, '../data/parquet')
+
+    df_votes = read_parquet('../data/parquet', 'votes', columns=['mp_id', 'is_vote_aye'],
+                            start_date='2023-11-01', end_date='2023-11-30')
+
+"""
+
+import os
+import shutil
+
+import pandas as pd
+
+from .storage import TABLES
+
+DEFAULT_BATCH_SIZE = 50_000
+
+PARTITION_COLUMNS = ["sitting_date", "house"]
+
+# Every column is text, except for these
+_BOOLEAN_COLUMNS = {"is_teller", "is_vote_aye"}
+
+_DEBATE_ID_PATTERN = r"^(?P<sitting_date>\d{4}-\d{2}-\d{2})(?P<house>[a-z]?)"
+
+
+def __pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Exporting to Parquet requires pyarrow: pip install discordia[parquet]") from e
+    return pyarrow
+
+def __schema(pa, table, partitions=True):
+    columns = TABLES[table] + (PARTITION_COLUMNS if partitions else [])
+    return pa.schema([(column, pa.bool_() if column in _BOOLEAN_COLUMNS else pa.string()) for column in columns])
+
+def __partitioning(pa):
+    return pa.dataset.partitioning(pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS]), flavor="hive")
+
+def add_partition_columns(df):
+    """Adds the sitting_date and house columns, parsed from the debate_id column, to a data frame.
+
+    Args:
+        df (pd.DataFrame): Any data frame with a debate_id column, e.g. 2023-11-15b.633.6
+
+    Returns:
+        pd.DataFrame: A copy of df with sitting_date (e.g. '2023-11-15') and house (e.g. 'b').
+
+    """
+
+    parts = df["debate_id"].astype(str).str.extract(_DEBATE_ID_PATTERN)
+    return df.assign(sitting_date=parts["sitting_date"], house=parts["house"])
+
+def __record_batches(pa, conn, table, batch_size):
+    """Yields (sitting_date, house, record batch), one partition at a time."""
+    # The partition columns are in the directory names, not in the files
+    schema = __schema(pa, table, partitions=False)
+    query = f"SELECT {', '.join(TABLES[table])} FROM {table} ORDER BY debate_id"
+    for df in pd.read_sql(query, conn, chunksize=batch_size):
+        df = add_partition_columns(df)
+        for column in _BOOLEAN_COLUMNS & set(df.columns):
+            df[column] = df[column].astype(bool)
+        for (sitting_date, house), df_partition in df.groupby(PARTITION_COLUMNS, sort=False, dropna=False):
+            yield sitting_date, house, pa.RecordBatch.from_pandas(df_partition[TABLES[table]], schema=schema,
+                                                                  preserve_index=False)
+
+def export_parquet(conn, directory, tables=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Exports tables of the DISCORDIA database to a partitioned Parquet dataset.
+
+    Tables are streamed out of SQLite `batch_size` rows at a time, sorted by debate_id, so each
+    partition is written in one go to a single file. The partitions of a table that are written
+    replace the existing ones, other partitions are left alone.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the DISCORDIA database (see `storage.connect`).
+        directory (str): Where to write the dataset. Each table goes to its own subdirectory.
+        tables (list): Which of `storage.TABLES` to export. If None, all of them.
+        batch_size (int): Number of rows read from SQLite at a time.
+
+    Returns:
+        dict: The number of rows exported, keyed by table name.
+
+    """
+
+    pa = __pyarrow()
+    tables = list(TABLES) if tables is None else tables
+
+    num_rows = {}
+    for table in tables:
+        num_rows[table] = 0
+        os.makedirs(os.path.join(directory, table), exist_ok=True)
+        writer, current = None, None
+        try:
+            for sitting_date, house, batch in __record_batches(pa, conn, table, batch_size):
+                if (sitting_date, house) != current:
+                    if writer is not None:
+                        writer.close()
+                    current = (sitting_date, house)
+                    partition = os.path.join(directory, table, f"sitting_date={sitting_date}", f"house={house}")
+                    if os.path.isdir(partition):
+                        shutil.rmtree(partition)
+                    os.makedirs(partition)
+                    writer = pa.parquet.ParquetWriter(os.path.join(partition, "part-0.parquet"),
+                                                      __schema(pa, table, partitions=False))
+                writer.write_batch(batch)
+                num_rows[table] += batch.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+    return num_rows
+
+def read_parquet(directory, table, columns=None, start_date=None, end_date=None, house=None):
+    """Reads a table exported with `export_parquet`.
+
+    The date and house filters are applied to the partition directories, so files outside of them
+    are never opened, and only the requested columns are read from the files that are.
+
+    Args:
+        directory (str): The directory passed to `export_parquet`.
+        table (str): One of `storage.TABLES`.
+        columns (list): Columns to read. If None, all of them (including sitting_date and house).
+        start_date (str): First sitting date to read, e.g. '2023-11-01'. If None, from the start.
+        end_date (str): Last sitting date to read (inclusive). If None, up to the end.
+        house (str or list): House letter(s) to read, e.g. 'b'. If None, all of them.
+
+    Returns:
+        pd.DataFrame: The rows of the table, with the requested columns.
+
+    """
+
+    pa = __pyarrow()
+    dataset = pa.dataset.dataset(os.path.join(directory, table), schema=__schema(pa, table),
+                                 format="parquet", partitioning=__partitioning(pa))
+
+    field = pa.dataset.field
+    filters = []
+    if start_date is not None:
+        filters.append(field("sitting_date") >= str(pd.Timestamp(start_date).date()))
+    if end_date is not None:
+        filters.append(field("sitting_date") <= str(pd.Timestamp(end_date).date()))
+    if house is not None:
+        filters.append(field("house").isin([house] if isinstance(house, str) else list(house)))
+
+    expression = None
+    for f in filters:
+        expression = f if expression is None else expression & f
+
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
@@ -0,0 +1,111 @@
+"""
+SEARCH: full-text search over what was said in the House of Commons
+
+Searches `speeches_fts`, the FTS5 index over `speeches.speech_raw_text` that `discordia.storage`
+keeps up to date as debates are written, instead of loading `speeches` into pandas and running
+regular expressions over the whole text. Results are ranked with BM25.
+
+The query uses the FTS5 syntax, e.g.
+
+    'rural broadband'             both words, anywhere in the speech
+    '"rural broadband"'           the exact phrase
+    'broadband OR connectivity'   either word
+    'broadband NOT rural'         one but not the other
+    'connect*'                    words starting with connect
+
+Words are stemmed ('votes' also matches 'voting'). Use `phrase` to turn arbitrary text into a phrase query.
+
+Example:
+
+    conn = storage.connect('../data/discordia.db')
+    search_speeches(conn, phrase('cost of living'), start_date='2023-11-01', house='b', limit=10)
+
+"""
+
+import pandas as pd
+
+DEFAULT_LIMIT = 20
+
+_SEARCH_SPEECHES = """
+SELECT
+    speeches.debate_id,
+    speeches.speech_id,
+    speeches.speaker_id,
+    speeches.speaker_position,
+    snippet(speeches_fts, 0, ?, ?, '...', ?) AS snippet,
+    -bm25(speeches_fts) AS score
+FROM
+    speeches_fts
+INNER JOIN
+    speeches ON speeches.rowid = speeches_fts.rowid
+WHERE
+    speeches_fts MATCH ?
+    {filters}
+ORDER BY
+    bm25(speeches_fts)
+LIMIT ?
+"""
+
+
+def phrase(text):
+    """Quotes text so that it is searched for as an exact phrase, e.g. phrase('cost of living')."""
+    return '"' + text.replace('"', '""') + '"'
+
+def __filters(speaker_ids=None, start_date=None, end_date=None, house=None):
+    """Turns the filters of `search_speeches` into SQL conditions on `speeches` and their parameters.
+
+    Dates and houses are compared with the start of the debate_id (e.g. 2023-11-15b.633.6).
+    """
+
+    conditions, params = [], []
+    if speaker_ids is not None:
+        speaker_ids = [str(speaker_id) for speaker_id in speaker_ids]
+        conditions.append(f"speeches.speaker_id IN ({', '.join('?' for _ in speaker_ids)})")
+        params += speaker_ids
+    if start_date is not None:
+        conditions.append("speeches.debate_id >= ?")
+        params.append(str(pd.Timestamp(start_date).date()))
+    if end_date is not None:
+        # Any debate_id of that day sorts before the next day
+        conditions.append("speeches.debate_id < ?")
+        params.append(str((pd.Timestamp(end_date) + pd.Timedelta(days=1)).date()))
+    if house is not None:
+        houses = [house] if isinstance(house, str) else list(house)
+        conditions.append(f"substr(speeches.debate_id, 11, 1) IN ({', '.join('?' for _ in houses)})")
+        params += houses
+    return "".join(f"AND {condition}\n    " for condition in conditions), params
+
+def search_speeches(conn, query, speaker_ids=None, start_date=None, end_date=None, house=None,
+                    limit=DEFAULT_LIMIT, snippet_tokens=16, highlight=("[", "]")):
+    """Finds the speeches that best match a full-text query.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the DISCORDIA database (see `storage.connect`).
+        query (str): An FTS5 query (see the module docstring).
+        speaker_ids (list): If given, only speeches by these speakers are returned.
+        start_date (str): If given, only speeches from this day onwards, e.g. '2023-11-01'.
+        end_date (str): If given, only speeches up to this day (inclusive).
+        house (str or list): If given, only speeches whose debate_id has this house letter, e.g. 'b'.
+        limit (int): Maximum number of speeches to return. None returns all of them.
+        snippet_tokens (int): Maximum number of words in each snippet (at most 64).
+        highlight (tuple): Strings inserted before and after each matching word in the snippets.
+
+    Returns:
+        pd.DataFrame: One row per speech, best match first, with the columns debate_id, speech_id,
+            speaker_id, speaker_position, snippet (the part of the speech that matches best) and
+            score (BM25, the higher the better).
+
+    """
+
+    filters, filter_params = __filters(speaker_ids=speaker_ids, start_date=start_date, end_date=end_date, house=house)
+    params = [highlight[0], highlight[1], snippet_tokens, query] + filter_params + [-1 if limit is None else limit]
+    return pd.read_sql(_SEARCH_SPEECHES.format(filters=filters), conn, params=params)
+
+def count_speeches(conn, query, speaker_ids=None, start_date=None, end_date=None, house=None):
+    """Counts the speeches that match a full-text query. Takes the same filters as `search_speeches`."""
+    filters, filter_params = __filters(speaker_ids=speaker_ids, start_date=start_date, end_date=end_date, house=house)
+    statement = (
+        "SELECT COUNT(*) FROM speeches_fts INNER JOIN speeches ON speeches.rowid = speeches_fts.rowid "
+        f"WHERE speeches_fts MATCH ? {filters}"
+    )
+    return conn.execute(statement, [query] + filter_params).fetchone()[0]
@@ -0,0 +1,642 @@
+"""
+STORAGE: the DISCORDIA SQLite database
+
+The database used to be created by hand in NB01, with untyped VARCHAR columns, no keys and no indexes,
+and filled with `DataFrame.to_sql`. This module owns the schema instead:
+
+- every table has a primary key, so re-inserting a debate updates it rather than duplicating it;
+- the columns used to join the tables (`debate_id`, `house_division_id`, `mp_id`, `speaker_id`)
+  are indexed, and the indexes on `votes` cover the columns the EDA queries read;
+- writes are batched `executemany` upserts inside a single transaction, on a WAL-mode database;
+- `migrate` upgrades a `discordia.db` created by the notebooks to this schema, keeping its data.
+
+It also maintains `party_lines`, a table derived from `votes` and `mp` with the number of MPs of
+each party voting aye and no in each house division. It is refreshed for the affected debates
+whenever votes are written, and lets rebels be identified without joining `votes` with itself
+(see `discordia.analysis.rebels`).
+
+`speeches_fts` is a full-text index (SQLite FTS5) over `speeches.speech_raw_text`. It does
+not store the text a second time, and triggers on `speeches` keep it up to date on every write
+(see `discordia.search`).
+
+Finally, TWFY revises Hansard after publication, so debates get crawled again. Each speech carries
+a `content_hash` of its speaker and text, and each house division a `content_hash` of its title and
+list of votes. `write_batch` compares them with the hashes already stored and only writes the speeches and
+vote lists that are new or changed. Speeches and house divisions that are no longer in a debate
+crawled again are deleted. Every change or deletion is logged in `revisions`, with the previous
+content, and the lemmas of revised speeches are dropped so that `discordia.textmining` processes them again.
+
+Example:
+
+    conn = storage.connect('../data/discordia.db')
+    stream = twfy.iter_speeches_divisions_and_votes(list_urls, batch_size=50, max_workers=8)
+    write_stream(stream, storage.SQLiteSink(conn))
+
+"""
+
+import json
+import sqlite3
+import hashlib
+import warnings
+import itertools
+
+SCHEMA_VERSION = 4
+
+# Columns of each table, in order. The first ones are the primary key.
+TABLES = {
+    "debates": ["debate_id", "debate_excerpt", "url", "title", "section", "section_excerpt"],
+    "speeches": ["debate_id", "speech_id", "speaker_id", "speaker_position", "speech_html", "speech_raw_text"],
+    "house_divisions": ["debate_id", "house_division_id", "vote_title"],
+    "votes": ["debate_id", "house_division_id", "mp_id", "comment", "is_teller", "is_vote_aye"],
+}
+
+# Columns that go into the content_hash of a speech, and of each vote in the content_hash of a house division
+# (with its vote_title). speech_html is left out: it depends on the `speech_html` mode of the scraper
+HASHED_COLUMNS = {
+    "speeches": ["speaker_id", "speaker_position", "speech_raw_text"],
+    "votes": ["mp_id", "comment", "is_teller", "is_vote_aye"],
+}
+
+PRIMARY_KEYS = {
+    "debates": ["debate_id"],
+    "speeches": ["debate_id", "speech_id"],
+    "house_divisions": ["debate_id", "house_division_id"],
+    "votes": ["debate_id", "house_division_id", "mp_id"],
+}
+
+_CREATE_TABLES = {
+    "debates": """
+        CREATE TABLE IF NOT EXISTS debates (
+            debate_id TEXT NOT NULL PRIMARY KEY,
+            debate_excerpt TEXT,
+            url TEXT,
+            title TEXT,
+            section TEXT,
+            section_excerpt TEXT
+        )""",
+    "speeches": """
+        CREATE TABLE IF NOT EXISTS speeches (
+            debate_id TEXT NOT NULL,
+            speech_id TEXT NOT NULL,
+            speaker_id TEXT,
+            speaker_position TEXT,
+            speech_html TEXT,
+            speech_raw_text TEXT,
+            content_hash TEXT,
+            PRIMARY KEY (debate_id, speech_id)
+        )""",
+    "house_divisions": """
+        CREATE TABLE IF NOT EXISTS house_divisions (
+            debate_id TEXT NOT NULL,
+            house_division_id TEXT NOT NULL,
+            vote_title TEXT,
+            content_hash TEXT,
+            PRIMARY KEY (debate_id, house_division_id)
+        )""",
+    # mp_id and speaker_id are TEXT, like the `mp` table they are joined with:
+    # comparing an INTEGER column to a TEXT one stops SQLite from using the indexes for the join
+    "votes": """
+        CREATE TABLE IF NOT EXISTS votes (
+            debate_id TEXT NOT NULL,
+            house_division_id TEXT NOT NULL,
+            mp_id TEXT NOT NULL,
+            comment TEXT,
+            is_teller INTEGER NOT NULL,
+            is_vote_aye INTEGER NOT NULL,
+            PRIMARY KEY (debate_id, house_division_id, mp_id)
+        )""",
+    "party_lines": """
+        CREATE TABLE IF NOT EXISTS party_lines (
+            debate_id TEXT NOT NULL,
+            house_division_id TEXT NOT NULL,
+            term_start INTEGER NOT NULL,
+            party TEXT NOT NULL,
+            num_aye INTEGER NOT NULL,
+            num_no INTEGER NOT NULL,
+            PRIMARY KEY (debate_id, house_division_id, term_start, party)
+        )""",
+    # Filled in by `discordia.textmining`. AUTOINCREMENT: lemma_id never goes back, so it tells which rows are new
+    "speech_lemmas": """
+        CREATE TABLE IF NOT EXISTS speech_lemmas (
+            lemma_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            debate_id TEXT NOT NULL,
+            speech_id TEXT NOT NULL,
+            lemmas TEXT NOT NULL,
+            UNIQUE (debate_id, speech_id)
+        )""",
+    # One row per speech or vote list that changed (or, with a NULL new_hash, disappeared) when its
+    # debate was crawled again. old_content is a JSON object of what was hashed: see `HASHED_COLUMNS`
+    "revisions": """
+        CREATE TABLE IF NOT EXISTS revisions (
+            revision_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            revised_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            table_name TEXT NOT NULL,
+            debate_id TEXT NOT NULL,
+            item_id TEXT NOT NULL,
+            old_hash TEXT,
+            new_hash TEXT,
+            old_content TEXT
+        )""",
+}
+
+_CREATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS speeches_speaker_id_debate_id ON speeches(speaker_id, debate_id)",
+    "CREATE INDEX IF NOT EXISTS house_divisions_house_division_id ON house_divisions(house_division_id, debate_id)",
+    # Covering indexes: the queries in NB02 and vote_record.sql only ever read these columns of `votes`
+    "CREATE INDEX IF NOT EXISTS votes_house_division_id ON votes(house_division_id, mp_id, is_vote_aye, is_teller)",
+    "CREATE INDEX IF NOT EXISTS votes_mp_id ON votes(mp_id, house_division_id, is_vote_aye, is_teller)",
+    "CREATE INDEX IF NOT EXISTS revisions_debate_id ON revisions(debate_id, item_id)",
+]
+
+# External-content index: the text stays in `speeches`, and the triggers mirror every change to it
+_CREATE_SPEECH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS speeches_fts USING fts5(
+        speech_raw_text,
+        content='speeches',
+        content_rowid='rowid',
+        tokenize='porter unicode61'
+    )""",
+    """
+    CREATE TRIGGER IF NOT EXISTS speeches_fts_insert AFTER INSERT ON speeches BEGIN
+        INSERT INTO speeches_fts(rowid, speech_raw_text) VALUES (new.rowid, new.speech_raw_text);
+    END""",
+    """
+    CREATE TRIGGER IF NOT EXISTS speeches_fts_delete AFTER DELETE ON speeches BEGIN
+        INSERT INTO speeches_fts(speeches_fts, rowid, speech_raw_text) VALUES ('delete', old.rowid, old.speech_raw_text);
+    END""",
+    """
+    CREATE TRIGGER IF NOT EXISTS speeches_fts_update AFTER UPDATE OF speech_raw_text ON speeches BEGIN
+        INSERT INTO speeches_fts(speeches_fts, rowid, speech_raw_text) VALUES ('delete', old.rowid, old.speech_raw_text);
+        INSERT INTO speeches_fts(rowid, speech_raw_text) VALUES (new.rowid, new.speech_raw_text);
+    END""",
+]
+
+# The `mp` table is not created by the scrapers, but every query joins on it
+_CREATE_MP_INDEX = "CREATE INDEX IF NOT EXISTS mp_mp_id ON mp(mp_id, term_start, party)"
+
+# Tellers count towards the side they are telling for, as in the queries of NB02
+_INSERT_PARTY_LINES = """
+    INSERT INTO party_lines (debate_id, house_division_id, term_start, party, num_aye, num_no)
+    SELECT
+        votes.debate_id,
+        votes.house_division_id,
+        mp.term_start,
+        mp.party,
+        SUM(votes.is_vote_aye = 1),
+        SUM(votes.is_vote_aye = 0)
+    FROM
+        votes
+    INNER JOIN
+        mp USING(mp_id)
+    {where}
+    GROUP BY
+        votes.debate_id, votes.house_division_id, mp.term_start, mp.party
+"""
+
+
+#### CONNECTION AND SCHEMA ####
+
+def connect(path):
+    """Opens (or creates) the DISCORDIA database, making sure it is on the current schema.
+
+    Args:
+        path (str): Path to the SQLite file, e.g. '../data/discordia.db'
+
+    Returns:
+        sqlite3.Connection: The connection, in WAL mode.
+
+    """
+
+    conn = sqlite3.connect(path)
+    # WAL lets the notebooks read while a crawl is writing, and makes commits much cheaper
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    migrate(conn)
+    return conn
+
+def __table_exists(conn, table):
+    query = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+    return conn.execute(query, (table,)).fetchone() is not None
+
+def __table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def create_schema(conn):
+    """Creates the tables and indexes that do not exist yet."""
+    with conn:
+        for statement in _CREATE_TABLES.values():
+            conn.execute(statement)
+        for statement in _CREATE_INDEXES:
+            conn.execute(statement)
+        for statement in _CREATE_SPEECH_INDEX:
+            conn.execute(statement)
+        if __table_exists(conn, "mp"):
+            conn.execute(_CREATE_MP_INDEX)
+
+def __copy_legacy_table(conn, table, legacy_table):
+    legacy_columns = set(__table_columns(conn, legacy_table))
+    columns = TABLES[table]
+    select = ", ".join(column if column in legacy_columns else "NULL" for column in columns)
+
+    if table == "votes" and "debate_id" not in legacy_columns:
+        # Old votes tables did not record the debate: recover it from house_divisions, but only for the
+        # house_division_ids that belong to a single debate. The others cannot be told apart
+        ambiguous = conn.execute(
+            f"SELECT house_division_id, COUNT(*) FROM {legacy_table} WHERE mp_id IS NOT NULL AND house_division_id IN "
+            "(SELECT house_division_id FROM house_divisions GROUP BY house_division_id HAVING COUNT(*) > 1) "
+            "GROUP BY house_division_id ORDER BY house_division_id"
+        ).fetchall()
+        if ambiguous:
+            warnings.warn(f"Dropped {sum(num_votes for _, num_votes in ambiguous)} legacy votes whose house division "
+                          f"appears in more than one debate: {[house_division_id for house_division_id, _ in ambiguous]}")
+
+        select = ", ".join(f"house_divisions.{column}" if column == "debate_id" else f"{legacy_table}.{column}"
+                           for column in columns)
+        conn.execute(
+            f"INSERT OR IGNORE INTO votes ({', '.join(columns)}) SELECT {select} "
+            f"FROM {legacy_table} JOIN house_divisions USING(house_division_id) "
+            f"WHERE {legacy_table}.mp_id IS NOT NULL AND house_division_id IN "
+            "(SELECT house_division_id FROM house_divisions GROUP BY house_division_id HAVING COUNT(*) = 1)"
+        )
+        return
+
+    not_null = " AND ".join(f"{column} IS NOT NULL" for column in PRIMARY_KEYS[table])
+    conn.execute(
+        f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) SELECT {select} FROM {legacy_table} WHERE {not_null}"
+    )
+
+def __migrate_legacy_tables(conn):
+    legacy_tables = [table for table in TABLES if __table_exists(conn, table)]
+    for table in legacy_tables:
+        conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+    for statement in _CREATE_TABLES.values():
+        conn.execute(statement)
+    # house_divisions must be copied before votes, which may need it to recover debate IDs
+    for table in TABLES:
+        if table in legacy_tables:
+            __copy_legacy_table(conn, table, f"{table}_legacy")
+    for table in legacy_tables:
+        conn.execute(f"DROP TABLE {table}_legacy")
+    __refresh_party_lines(conn)
+
+def __create_speech_index(conn):
+    for statement in _CREATE_SPEECH_INDEX:
+        conn.execute(statement)
+    # Index the speeches that are already there
+    conn.execute("INSERT INTO speeches_fts(speeches_fts) VALUES ('rebuild')")
+
+def __add_content_hashes(conn):
+    for table in ["speeches", "house_divisions"]:
+        if "content_hash" not in __table_columns(conn, table):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN content_hash TEXT")
+    conn.execute(_CREATE_TABLES["revisions"])
+
+    # Hash the rows that are already there, so the next crawl of their debates can be compared with them
+    conn.create_function("content_hash", -1, lambda *values: __hash(values), deterministic=True)
+    conn.execute(
+        f"UPDATE speeches SET content_hash = content_hash({', '.join(HASHED_COLUMNS['speeches'])}) "
+        "WHERE content_hash IS NULL"
+    )
+    rows = conn.execute(f"SELECT debate_id, house_division_id, {', '.join(HASHED_COLUMNS['votes'])} FROM votes")
+    vote_lists = __vote_lists(rows)
+    house_divisions = conn.execute("SELECT debate_id, house_division_id, vote_title FROM house_divisions").fetchall()
+    conn.executemany(
+        "UPDATE house_divisions SET content_hash = ? WHERE debate_id = ? AND house_division_id = ?",
+        [(__house_division_hash(vote_title, vote_lists.get((debate_id, house_division_id), [])), debate_id, house_division_id)
+         for debate_id, house_division_id, vote_title in house_divisions]
+    )
+
+def __keep_revised_content(conn):
+    if "old_content" in __table_columns(conn, "revisions"):
+        return
+    # SQLite cannot drop the NOT NULL of new_hash in place: recreate the table
+    columns = "revision_id, revised_at, table_name, debate_id, item_id, old_hash, new_hash"
+    conn.execute("ALTER TABLE revisions RENAME TO revisions_v3")
+    conn.execute(_CREATE_TABLES["revisions"])
+    conn.execute(f"INSERT INTO revisions ({columns}) SELECT {columns} FROM revisions_v3")
+    conn.execute("DROP TABLE revisions_v3")
+
+def migrate(conn):
+    """Upgrades a database to the current schema.
+
+    - Databases created by the notebooks (user_version 0) have tables without primary keys.
+      Each of them is renamed, recreated with the new schema, and its rows copied over.
+      Duplicated rows (e.g. from re-running `to_sql(..., if_exists='append')`) are collapsed,
+      and rows missing part of their key (e.g. votes without an mp_id) are dropped. So are (with a
+      warning) votes without a debate_id whose house_division_id is found in more than one debate.
+    - Version 2 adds the full-text index of speeches, `speeches_fts`, built from the existing speeches.
+    - Version 3 adds the `content_hash` of speeches and house divisions (computed for the existing
+      rows) and the `revisions` table.
+    - Version 4 adds the `old_content` of `revisions`, and lets it log deletions (NULL `new_hash`).
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database.
+
+    """
+
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        create_schema(conn)
+        return
+
+    with conn:
+        # sqlite3 does not open a transaction before DDL statements by itself
+        conn.execute("BEGIN")
+        if version < 1:
+            __migrate_legacy_tables(conn)
+        if version < 2:
+            __create_speech_index(conn)
+        if version < 3:
+            __add_content_hashes(conn)
+        if version < 4:
+            __keep_revised_content(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    create_schema(conn)
+
+
+#### CONTENT HASHES ####
+
+def __canonical(value):
+    """The text a value is hashed as: the same whether it comes from the scrapers, a typed data frame or SQLite."""
+    if hasattr(value, "item"):
+        # numpy scalars
+        value = value.item()
+    if value is None or value != value:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def __digest(parts):
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+def __hash(values):
+    return __digest(__canonical(value) for value in values)
+
+def __vote_lists(rows):
+    """Groups (debate_id, house_division_id, *HASHED_COLUMNS['votes']) rows by house division."""
+    rows = sorted(rows, key=lambda row: (row[0], row[1]))
+    return {key: [row[2:] for row in group] for key, group in itertools.groupby(rows, key=lambda row: (row[0], row[1]))}
+
+def __house_division_hash(vote_title, votes):
+    """Hash of the title and votes of a house division. The order of the votes does not matter."""
+    return __digest([__canonical(vote_title)] + sorted(__hash(vote) for vote in votes))
+
+def speech_hashes(df_speeches):
+    """The content_hash of each speech: a SHA-1 of the columns in `HASHED_COLUMNS['speeches']`.
+
+    Returns:
+        list: One hash per row, in order.
+    """
+    return [__hash(row) for row in __rows(df_speeches, HASHED_COLUMNS["speeches"])]
+
+def house_division_hashes(df_house_division, df_votes):
+    """The content_hash of each house division: a SHA-1 of its vote_title and of its votes in `df_votes`.
+
+    Returns:
+        list: One hash per row of `df_house_division`, in order.
+    """
+    df_votes = df_votes.dropna(subset=PRIMARY_KEYS["votes"])
+    vote_lists = __vote_lists(__rows(df_votes, PRIMARY_KEYS["house_divisions"] + HASHED_COLUMNS["votes"]))
+    return [__house_division_hash(vote_title, vote_lists.get((debate_id, house_division_id), []))
+            for debate_id, house_division_id, vote_title in __rows(df_house_division, TABLES["house_divisions"])]
+
+
+#### WRITES ####
+
+def __chunks(values, size=500):
+    """Splits values into chunks for `IN (...)` clauses, staying well below SQLite's limit on the number of parameters."""
+    values = list(values)
+    for i in range(0, len(values), size):
+        chunk = values[i:i + size]
+        yield chunk, ", ".join("?" for _ in chunk)
+
+def __rows(df, columns):
+    # sqlite3 only understands Python scalars: cast to object and turn NaN/NA into None
+    df = df[columns].astype(object)
+    df = df.where(df.notna(), None)
+    return df.itertuples(index=False, name=None)
+
+def upsert(conn, table, df, columns=None):
+    """Inserts the rows of a data frame into a table, updating the rows whose primary key already exists.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database.
+        table (str): One of the tables in `TABLES`.
+        df (pd.DataFrame): The rows to write. It must have all the columns of the table.
+            Rows missing part of their primary key are skipped.
+        columns (list): The columns to write. Defaults to `TABLES[table]`.
+
+    Returns:
+        int: The number of rows written.
+
+    """
+
+    if len(df) == 0:
+        return 0
+
+    columns = TABLES[table] if columns is None else columns
+    df = df.dropna(subset=PRIMARY_KEYS[table])
+
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column not in PRIMARY_KEYS[table])
+    statement = (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+        f"ON CONFLICT({', '.join(PRIMARY_KEYS[table])}) DO UPDATE SET {updates}"
+    )
+    conn.executemany(statement, __rows(df, columns))
+    return len(df)
+
+def write_debates(conn, df_debates):
+    """Upserts debates (as returned by `twfy.scrape_debate_sections_static`) in a single transaction."""
+    with conn:
+        return upsert(conn, "debates", df_debates)
+
+def __stored_content(conn, table, key):
+    """What the content_hash of a stored speech or house division was computed from, as JSON."""
+    if table == "speeches":
+        row = conn.execute(f"SELECT {', '.join(HASHED_COLUMNS['speeches'])} FROM speeches "
+                           "WHERE debate_id = ? AND speech_id = ?", key).fetchone()
+        return json.dumps(dict(zip(HASHED_COLUMNS["speeches"], row)))
+
+    vote_title, = conn.execute("SELECT vote_title FROM house_divisions WHERE debate_id = ? AND house_division_id = ?",
+                               key).fetchone()
+    votes = conn.execute(f"SELECT {', '.join(HASHED_COLUMNS['votes'])} FROM votes "
+                         "WHERE debate_id = ? AND house_division_id = ? ORDER BY mp_id", key).fetchall()
+    return json.dumps({"vote_title": vote_title, "votes": [dict(zip(HASHED_COLUMNS["votes"], vote)) for vote in votes]})
+
+def __changed_rows(conn, table, df):
+    """Keeps the rows of `df` that are not in `table` yet or whose content_hash differs, and finds the rows
+    of the same debates that are no longer in `df`. Both the changed and the removed rows are logged in `revisions`.
+
+    Returns:
+        tuple: (the new and changed rows, the keys of the changed rows, the keys of the removed rows)
+    """
+
+    df = df.dropna(subset=PRIMARY_KEYS[table])
+    keys = list(__rows(df, PRIMARY_KEYS[table]))
+
+    existing = {}
+    for chunk, placeholders in __chunks({key[0] for key in keys}):
+        query = f"SELECT {', '.join(PRIMARY_KEYS[table])}, content_hash FROM {table} WHERE debate_id IN ({placeholders})"
+        existing.update((tuple(row[:-1]), row[-1]) for row in conn.execute(query, chunk))
+
+    is_changed = [existing.get(key) != content_hash for key, content_hash in zip(keys, df["content_hash"])]
+    new_hashes = {key: content_hash for key, content_hash, changed in zip(keys, df["content_hash"], is_changed)
+                  if changed and key in existing}
+    removed = sorted(set(existing) - set(keys))
+    new_hashes.update((key, None) for key in removed)
+
+    # Logged before the rows are written, while the previous content is still there
+    conn.executemany(
+        "INSERT INTO revisions (table_name, debate_id, item_id, old_hash, new_hash, old_content) VALUES (?, ?, ?, ?, ?, ?)",
+        [(table, key[0], key[1], existing[key], new_hash, __stored_content(conn, table, key))
+         for key, new_hash in new_hashes.items()]
+    )
+    revised = [key for key in new_hashes if new_hashes[key] is not None]
+    return df.loc[is_changed], revised, removed
+
+def write_batch(conn, df_speeches, df_house_division, df_votes, df_debates=None):
+    """Upserts a batch of speeches, house divisions and votes (and, optionally, their debates) in a single transaction.
+
+    Only what changed is written: speeches whose content_hash is already in the database are skipped,
+    and so are house divisions (with their votes) whose content_hash is. When a house division has
+    changed, its votes are replaced. Each batch must hold whole debates: the speeches and house divisions
+    of its debates that it does not contain are deleted (a debate with no speeches in the batch keeps
+    its speeches, and likewise for house divisions). Changes and deletions are logged in `revisions`,
+    and the `speech_lemmas` of revised and deleted speeches are deleted.
+
+    The `party_lines` of the debates whose votes were written or deleted are refreshed in the same transaction.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database.
+        df_speeches (pd.DataFrame): As returned by `twfy.get_speeches_divisions_and_votes`.
+        df_house_division (pd.DataFrame): As returned by `twfy.get_speeches_divisions_and_votes`.
+        df_votes (pd.DataFrame): As returned by `twfy.get_speeches_divisions_and_votes`. Votes of house
+            divisions that are not in `df_house_division` are upserted without any comparison.
+        df_debates (pd.DataFrame): Optional rows of the `debates` table for these debates.
+
+    Returns:
+        dict: The number of rows written, keyed by table name, including the number of `revisions`
+            and the number of speeches and house divisions `removed`.
+
+    """
+
+    df_speeches = df_speeches.assign(content_hash=speech_hashes(df_speeches))
+    df_house_division = df_house_division.assign(content_hash=house_division_hashes(df_house_division, df_votes))
+
+    num_rows = {}
+    with conn:
+        if df_debates is not None:
+            num_rows["debates"] = upsert(conn, "debates", df_debates)
+
+        df_speeches, revised_speeches, removed_speeches = __changed_rows(conn, "speeches", df_speeches)
+        num_rows["speeches"] = upsert(conn, "speeches", df_speeches, columns=TABLES["speeches"] + ["content_hash"])
+        # The triggers on `speeches` remove them from speeches_fts too
+        conn.executemany("DELETE FROM speeches WHERE debate_id = ? AND speech_id = ?", removed_speeches)
+        # Lemmatised again on the next run of `textmining.lemmatize_speeches`
+        conn.executemany("DELETE FROM speech_lemmas WHERE debate_id = ? AND speech_id = ?",
+                         revised_speeches + removed_speeches)
+
+        known_house_divisions = set(__rows(df_house_division, PRIMARY_KEYS["house_divisions"]))
+        df_house_division, revised_house_divisions, removed_house_divisions = __changed_rows(
+            conn, "house_divisions", df_house_division)
+        num_rows["house_divisions"] = upsert(conn, "house_divisions", df_house_division,
+                                             columns=TABLES["house_divisions"] + ["content_hash"])
+        conn.executemany("DELETE FROM house_divisions WHERE debate_id = ? AND house_division_id = ?",
+                         removed_house_divisions)
+
+        # Votes of changed house divisions replace the old ones, so that MPs who no longer appear are removed
+        changed_house_divisions = set(__rows(df_house_division, PRIMARY_KEYS["house_divisions"]))
+        conn.executemany("DELETE FROM votes WHERE debate_id = ? AND house_division_id = ?",
+                         revised_house_divisions + removed_house_divisions)
+        vote_keys = list(__rows(df_votes, PRIMARY_KEYS["house_divisions"]))
+        df_votes = df_votes.loc[[key in changed_house_divisions or key not in known_house_divisions for key in vote_keys]]
+        num_rows["votes"] = upsert(conn, "votes", df_votes)
+
+        num_rows["revisions"] = (len(revised_speeches) + len(removed_speeches)
+                                 + len(revised_house_divisions) + len(removed_house_divisions))
+        num_rows["removed"] = len(removed_speeches) + len(removed_house_divisions)
+        debate_ids = set(df_votes["debate_id"].dropna()) | {debate_id for debate_id, _ in removed_house_divisions}
+        if debate_ids:
+            __refresh_party_lines(conn, sorted(debate_ids))
+    return num_rows
+
+def existing_debate_ids(conn, debate_ids=None):
+    """Returns the set of debate IDs whose content is already in the database.
+
+    The `debates` table is not looked at: a debate can be listed there (e.g. by `write_debates`)
+    without ever having been crawled.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database.
+        debate_ids (list): If given, only these debate IDs are looked up.
+
+    Returns:
+        set: debate IDs found in the `speeches` or `house_divisions` tables.
+
+    """
+
+    existing = set()
+    for table in ["speeches", "house_divisions"]:
+        if debate_ids is None:
+            existing.update(row[0] for row in conn.execute(f"SELECT DISTINCT debate_id FROM {table}"))
+            continue
+        for chunk, placeholders in __chunks(debate_ids):
+            query = f"SELECT DISTINCT debate_id FROM {table} WHERE debate_id IN ({placeholders})"
+            existing.update(row[0] for row in conn.execute(query, chunk))
+    return existing
+
+
+#### DERIVED TABLES ####
+
+def __refresh_party_lines(conn, debate_ids=None):
+    if not __table_exists(conn, "mp"):
+        return
+
+    if debate_ids is None:
+        conn.execute("DELETE FROM party_lines")
+        conn.execute(_INSERT_PARTY_LINES.format(where=""))
+        return
+
+    for chunk, placeholders in __chunks(debate_ids):
+        conn.execute(f"DELETE FROM party_lines WHERE debate_id IN ({placeholders})", chunk)
+        conn.execute(_INSERT_PARTY_LINES.format(where=f"WHERE votes.debate_id IN ({placeholders})"), chunk)
+
+def refresh_party_lines(conn, debate_ids=None):
+    """Recomputes the `party_lines` table.
+
+    `write_batch` already does this for the debates it writes. Call it with no arguments after
+    (re)loading the `mp` table, or after migrating a database created by the notebooks.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database.
+        debate_ids (list): If given, only the house divisions of these debates are recomputed.
+
+    """
+
+    with conn:
+        __refresh_party_lines(conn, debate_ids)
+
+def rebuild_speech_index(conn):
+    """Rebuilds `speeches_fts` from scratch, e.g. if `speeches` was modified with the triggers disabled."""
+    with conn:
+        conn.execute("INSERT INTO speeches_fts(speeches_fts) VALUES ('rebuild')")
+
+
+class SQLiteSink:
+    """A sink (see `webscraping/sinks.py`) that upserts each batch into the DISCORDIA database.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database, e.g. from `connect`.
+
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __call__(self, df_speeches, df_house_division, df_votes):
+        write_batch(self.conn, df_speeches, df_house_division, df_votes)
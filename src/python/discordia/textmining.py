@@ -0,0 +1,288 @@
+"""
+TEXT MINING: lemmatised speeches and document-term matrices, computed once
+
+Running spaCy over every speech is by far the slowest step of any text analysis of the corpus, so
+it should only ever happen once per speech. This module splits the work in two cached stages:
+
+1. `lemmatize_speeches` runs spaCy (`nlp.pipe`, optionally over several processes) on the speeches
+   that have not been processed yet, and stores their lemmas in the `speech_lemmas` table of the
+   DISCORDIA database (see `discordia.storage`);
+2. `build_document_term_matrix` turns the lemmas into a sparse document-term matrix, with one row per
+   speech. The matrix is saved to a directory and, the next time, only the rows of new speeches are added.
+
+Speeches revised by a later crawl lose their lemmas (see `storage.write_batch`), so both stages
+process them again and their rows of the matrix are replaced. Speeches deleted by a later crawl lose
+their lemmas too, and their rows are dropped from the matrix the next time it is built.
+
+Requires spaCy and a model (`python -m spacy download en_core_web_sm`) for the first stage, and scipy
+for the second.
+
+Example:
+
+    conn = storage.connect('../data/discordia.db')
+    lemmatize_speeches(conn, n_process=4, tqdm=tqdm)
+    dtm = build_document_term_matrix(conn, '../data/document_term_matrix')
+    X = dtm.tf_idf()
+
+"""
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MODEL = "en_core_web_sm"
+DEFAULT_CHUNK_SIZE = 2000
+
+_PENDING_SPEECHES = """
+SELECT
+    speeches.debate_id,
+    speeches.speech_id,
+    speeches.speech_raw_text
+FROM
+    speeches
+LEFT JOIN
+    speech_lemmas USING(debate_id, speech_id)
+WHERE
+    speech_lemmas.lemma_id IS NULL
+"""
+
+_NEW_LEMMAS = """
+SELECT lemma_id, debate_id, speech_id, lemmas FROM speech_lemmas WHERE lemma_id > ? ORDER BY lemma_id
+"""
+
+_LEMMATISED_SPEECHES = "SELECT debate_id, speech_id FROM speech_lemmas"
+
+
+#### LEMMAS ####
+
+def load_nlp(model=DEFAULT_MODEL):
+    """Loads a spaCy model with only what lemmatisation needs (no parser, no named entities)."""
+    import spacy
+    return spacy.load(model, disable=["parser", "ner"])
+
+def __lemmas(doc):
+    return " ".join(token.lemma_.lower() for token in doc if token.is_alpha and not token.is_stop)
+
+def lemmatize_speeches(conn, nlp=None, n_process=1, batch_size=64, chunk_size=DEFAULT_CHUNK_SIZE, tqdm=None):
+    """Lemmatises the speeches that are not in `speech_lemmas` yet.
+
+    Each speech becomes a string of lower-case lemmas separated by spaces, without stop words,
+    punctuation or numbers. Speeches are processed and committed `chunk_size` at a time, so an
+    interrupted run keeps what it had done.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the DISCORDIA database (see `storage.connect`).
+        nlp (spacy.Language): The pipeline to use. If None, `load_nlp()` is called.
+        n_process (int): Number of processes spaCy spreads each chunk over.
+        batch_size (int): Number of speeches spaCy sends to a process at a time.
+        chunk_size (int): Number of speeches read from and written to the database at a time.
+        tqdm (callable): optional progress bar, e.g. `tqdm.notebook.tqdm`
+
+    Returns:
+        int: The number of speeches that were lemmatised.
+
+    """
+
+    if nlp is None:
+        nlp = load_nlp()
+
+    # Read everything pending up front: a cursor left open across the writes below would see them
+    df_pending = pd.read_sql(_PENDING_SPEECHES, conn)
+    df_pending["speech_raw_text"] = df_pending["speech_raw_text"].fillna("")
+
+    chunks = range(0, len(df_pending), chunk_size)
+    if tqdm is not None:
+        chunks = tqdm(chunks)
+
+    for start in chunks:
+        df_chunk = df_pending.iloc[start:start + chunk_size]
+        docs = nlp.pipe(df_chunk["speech_raw_text"], n_process=n_process, batch_size=batch_size)
+        rows = zip(df_chunk["debate_id"], df_chunk["speech_id"], (__lemmas(doc) for doc in docs))
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO speech_lemmas (debate_id, speech_id, lemmas) VALUES (?, ?, ?)", rows
+            )
+    return len(df_pending)
+
+
+#### DOCUMENT-TERM MATRICES ####
+
+class DocumentTermMatrix:
+    """A sparse matrix with the number of times each lemma appears in each speech.
+
+    Args:
+        counts (scipy.sparse.csr_matrix): Shape (number of speeches, number of terms).
+        debate_ids (list): The debate ID of each row.
+        speech_ids (list): The speech ID of each row.
+        vocabulary (list): The lemma of each column.
+        last_lemma_id (int): The last row of `speech_lemmas` included in the matrix.
+
+    """
+
+    def __init__(self, counts, debate_ids, speech_ids, vocabulary, last_lemma_id=0):
+        self.counts = counts
+        self.debate_ids = list(debate_ids)
+        self.speech_ids = list(speech_ids)
+        self.vocabulary = list(vocabulary)
+        self.last_lemma_id = last_lemma_id
+
+    @classmethod
+    def empty(cls):
+        from scipy import sparse
+        return cls(sparse.csr_matrix((0, 0), dtype=np.int32), [], [], [])
+
+    @property
+    def index(self):
+        """The (debate_id, speech_id) of each row, as a pd.MultiIndex."""
+        return pd.MultiIndex.from_arrays([self.debate_ids, self.speech_ids], names=["debate_id", "speech_id"])
+
+    def update(self, df_lemmas):
+        """Returns a new matrix with rows for the speeches in `df_lemmas`.
+
+        Speeches that already have a row (i.e. that were lemmatised again) have it replaced.
+        New lemmas are appended to the vocabulary, so existing columns keep their position.
+
+        Args:
+            df_lemmas (pd.DataFrame): Rows of `speech_lemmas`, with the columns lemma_id, debate_id, speech_id and lemmas.
+
+        Returns:
+            DocumentTermMatrix: The updated matrix.
+
+        """
+
+        from scipy import sparse
+
+        if len(df_lemmas) == 0:
+            return self
+
+        # A speech lemmatised twice since the last update only keeps its latest lemmas
+        df_lemmas = df_lemmas.drop_duplicates(["debate_id", "speech_id"], keep="last")
+
+        vocabulary = {term: column for column, term in enumerate(self.vocabulary)}
+        indptr, indices = [0], []
+        for lemmas in df_lemmas["lemmas"]:
+            for term in lemmas.split():
+                indices.append(vocabulary.setdefault(term, len(vocabulary)))
+            indptr.append(len(indices))
+
+        # Duplicated (row, column) entries are summed into counts
+        new_counts = sparse.csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr),
+                                       shape=(len(df_lemmas), len(vocabulary)))
+        new_counts.sum_duplicates()
+
+        old_counts = self.counts.copy()
+        old_counts.resize((old_counts.shape[0], len(vocabulary)))
+        keep = ~self.index.isin(pd.MultiIndex.from_frame(df_lemmas[["debate_id", "speech_id"]]))
+
+        return DocumentTermMatrix(
+            sparse.vstack([old_counts[keep], new_counts], format="csr"),
+            [debate_id for debate_id, k in zip(self.debate_ids, keep) if k] + list(df_lemmas["debate_id"]),
+            [speech_id for speech_id, k in zip(self.speech_ids, keep) if k] + list(df_lemmas["speech_id"]),
+            sorted(vocabulary, key=vocabulary.get),
+            last_lemma_id=max(self.last_lemma_id, int(df_lemmas["lemma_id"].max())),
+        )
+
+    def keep_speeches(self, index):
+        """Returns a new matrix with only the rows of the speeches in `index`.
+
+        Args:
+            index (pd.MultiIndex): (debate_id, speech_id) of the speeches to keep.
+
+        Returns:
+            DocumentTermMatrix: The matrix without the other rows. The vocabulary is unchanged.
+
+        """
+
+        keep = self.index.isin(index)
+        if keep.all():
+            return self
+        return DocumentTermMatrix(
+            self.counts[keep],
+            [debate_id for debate_id, k in zip(self.debate_ids, keep) if k],
+            [speech_id for speech_id, k in zip(self.speech_ids, keep) if k],
+            self.vocabulary,
+            last_lemma_id=self.last_lemma_id,
+        )
+
+    def tf_idf(self, sublinear_tf=False):
+        """TF-IDF weights of the matrix, computed like scikit-learn's `TfidfTransformer` defaults.
+
+        idf(t) = ln((1 + n) / (1 + df(t))) + 1, and each row is scaled to unit (L2) norm.
+
+        Args:
+            sublinear_tf (bool): If True, term frequencies are replaced with 1 + ln(tf).
+
+        Returns:
+            scipy.sparse.csr_matrix: Same shape and rows as `counts`.
+
+        """
+
+        from scipy import sparse
+
+        tf = self.counts.astype(np.float64)
+        if sublinear_tf:
+            tf.data = 1 + np.log(tf.data)
+
+        num_documents = tf.shape[0]
+        document_frequency = np.bincount(tf.indices, minlength=tf.shape[1])
+        idf = np.log((1 + num_documents) / (1 + document_frequency)) + 1
+
+        weights = tf @ sparse.diags(idf)
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.csr_matrix(sparse.diags(1 / norms) @ weights)
+
+    def save(self, directory):
+        """Saves the matrix to `directory/counts.npz` and its labels to `directory/labels.json`."""
+        from scipy import sparse
+        os.makedirs(directory, exist_ok=True)
+        sparse.save_npz(os.path.join(directory, "counts.npz"), self.counts)
+        labels = {
+            "debate_ids": self.debate_ids,
+            "speech_ids": self.speech_ids,
+            "vocabulary": self.vocabulary,
+            "last_lemma_id": self.last_lemma_id,
+        }
+        with open(os.path.join(directory, "labels.json"), "w") as f:
+            json.dump(labels, f)
+
+    @classmethod
+    def load(cls, directory):
+        """Loads a matrix saved with `save`."""
+        from scipy import sparse
+        counts = sparse.load_npz(os.path.join(directory, "counts.npz")).tocsr()
+        with open(os.path.join(directory, "labels.json"), "r") as f:
+            labels = json.load(f)
+        return cls(counts, **labels)
+
+def build_document_term_matrix(conn, directory=None):
+    """Builds the document-term matrix of the lemmatised speeches, reusing the one saved in `directory`.
+
+    Only the rows of `speech_lemmas` added since the saved matrix was built are read in full. The rows
+    of speeches whose lemmas have been deleted since (see `storage.write_batch`) are dropped.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the DISCORDIA database (see `storage.connect`).
+        directory (str): Where the matrix is cached. If None, it is built from scratch and not saved.
+
+    Returns:
+        DocumentTermMatrix: One row per lemmatised speech.
+
+    """
+
+    if directory is not None and os.path.exists(os.path.join(directory, "labels.json")):
+        dtm = DocumentTermMatrix.load(directory)
+    else:
+        dtm = DocumentTermMatrix.empty()
+
+    df_lemmas = pd.read_sql(_NEW_LEMMAS, conn, params=[dtm.last_lemma_id])
+    updated = dtm.update(df_lemmas)
+    updated = updated.keep_speeches(pd.MultiIndex.from_frame(pd.read_sql(_LEMMATISED_SPEECHES, conn)))
+    if updated is dtm:
+        return dtm
+
+    if directory is not None:
+        updated.save(directory)
+    return updated
@@ -0,0 +1,230 @@
+"""
+HTTP CACHE: a persistent, on-disk cache of They Work For You pages
+
+Re-running the scrapers after a parser fix should not mean re-downloading every debate.
+`ResponseCache` keeps the raw bytes of every page it sees on disk, so that `Fetcher` can serve
+them again without touching the network.
+
+How it is laid out on disk:
+
+    <directory>/
+        index.sqlite        # url -> content hash, validators (ETag/Last-Modified) and access times
+        objects/ab/abcd...  # page bodies, named after the SHA-256 of their content
+
+Pages are content-addressed, so two URLs serving the same page share a single file.
+When the objects grow beyond `max_size` bytes, the least recently used URLs are evicted.
+
+Debate pages rarely change, but a day listing can be empty one night and full the next, once
+that day's Hansard is published. Pages older than `max_age` (set per cache, or per call to
+`Fetcher.get`) are therefore revalidated with the server before being reused.
+
+"""
+
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+from collections import namedtuple
+
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3  # 2 GiB
+
+CacheEntry = namedtuple("CacheEntry", ["url", "content", "etag", "last_modified", "fetched_at"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS urls_accessed_at ON urls(accessed_at);
+CREATE INDEX IF NOT EXISTS urls_content_hash ON urls(content_hash);
+CREATE TABLE IF NOT EXISTS objects (
+    content_hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    is_compressed INTEGER NOT NULL
+);
+"""
+
+
+class ResponseCache:
+    """A content-addressed cache of downloaded pages, with LRU eviction.
+
+    Args:
+        directory (str): Where to keep the cache. It is created if it does not exist.
+        max_size (int): Maximum number of bytes the stored pages may take on disk.
+            None disables eviction.
+        compress (bool): Whether to zlib-compress pages before writing them to disk.
+        revalidate (bool): If True, cached pages are revalidated with the server
+            (If-None-Match/If-Modified-Since) before being reused.
+        offline (bool): If True, the network is never used: pages not in the cache are treated as unavailable.
+        max_age (float): Seconds after which a cached page is revalidated before being reused.
+            None (the default) means pages stay fresh forever, unless `revalidate` is set.
+
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE, compress=True, revalidate=False, offline=False,
+                 max_age=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.compress = compress
+        self.revalidate = revalidate
+        self.offline = offline
+        self.max_age = max_age
+
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def __object_path(self, content_hash):
+        return os.path.join(self.directory, "objects", content_hash[:2], content_hash)
+
+    def get(self, url):
+        """Looks up a URL in the cache.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            CacheEntry: The cached page, or None if the URL is not cached.
+
+        """
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT urls.content_hash, etag, last_modified, fetched_at, is_compressed "
+                "FROM urls JOIN objects USING(content_hash) WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            content_hash, etag, last_modified, fetched_at, is_compressed = row
+
+            try:
+                with open(self.__object_path(content_hash), "rb") as f:
+                    content = f.read()
+            except FileNotFoundError:
+                # Someone cleaned up the objects folder behind our back
+                self._conn.execute("DELETE FROM urls WHERE content_hash = ?", (content_hash,))
+                self._conn.execute("DELETE FROM objects WHERE content_hash = ?", (content_hash,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute("UPDATE urls SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+        if is_compressed:
+            content = zlib.decompress(content)
+        return CacheEntry(url, content, etag, last_modified, fetched_at)
+
+    def is_fresh(self, entry, max_age=None):
+        """Whether a cached page can be reused without asking the server.
+
+        Args:
+            entry (CacheEntry): The output of `get`.
+            max_age (float): Overrides the `max_age` of the cache, in seconds. 0 always revalidates.
+
+        """
+        if self.revalidate:
+            return False
+        max_age = max_age if max_age is not None else self.max_age
+        return max_age is None or time.time() - entry.fetched_at <= max_age
+
+    def put(self, url, content, etag=None, last_modified=None):
+        """Stores a page in the cache.
+
+        Args:
+            url (str): The URL of the page.
+            content (bytes): The raw content of the page.
+            etag (str): The ETag header sent by the server, if any.
+            last_modified (str): The Last-Modified header sent by the server, if any.
+
+        """
+
+        content_hash = hashlib.sha256(content).hexdigest()
+        path = self.__object_path(content_hash)
+        now = time.time()
+
+        with self._lock:
+            previous = self._conn.execute("SELECT content_hash FROM urls WHERE url = ?", (url,)).fetchone()
+
+            already_stored = self._conn.execute(
+                "SELECT 1 FROM objects WHERE content_hash = ?", (content_hash,)
+            ).fetchone() is not None
+
+            if not already_stored:
+                data = zlib.compress(content) if self.compress else content
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write to a temporary file first so that a crash never leaves a truncated page behind
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self._conn.execute(
+                    "INSERT INTO objects(content_hash, size, is_compressed) VALUES (?, ?, ?)",
+                    (content_hash, len(data), int(self.compress))
+                )
+
+            self._conn.execute(
+                "INSERT INTO urls(url, content_hash, etag, last_modified, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET content_hash = excluded.content_hash, etag = excluded.etag, "
+                "last_modified = excluded.last_modified, fetched_at = excluded.fetched_at, accessed_at = excluded.accessed_at",
+                (url, content_hash, etag, last_modified, now, now)
+            )
+            if previous is not None and previous[0] != content_hash:
+                self.__release(previous[0])
+            self.__evict()
+            self._conn.commit()
+
+    def touch(self, url):
+        """Marks a cached page as fresh, e.g. after the server replied 304 Not Modified."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE urls SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self._conn.commit()
+
+    def size(self):
+        """Returns the number of bytes the stored pages take on disk."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def __release(self, content_hash):
+        """Deletes a stored page if no URL points to it anymore. Returns the number of bytes freed."""
+        if self._conn.execute("SELECT 1 FROM urls WHERE content_hash = ?", (content_hash,)).fetchone() is not None:
+            return 0
+
+        row = self._conn.execute("SELECT size FROM objects WHERE content_hash = ?", (content_hash,)).fetchone()
+        self._conn.execute("DELETE FROM objects WHERE content_hash = ?", (content_hash,))
+        try:
+            os.remove(self.__object_path(content_hash))
+        except FileNotFoundError:
+            pass
+        return row[0] if row is not None else 0
+
+    def __evict(self):
+        if self.max_size is None:
+            return
+
+        total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        if total_size <= self.max_size:
+            return
+
+        # Least recently used first
+        lru_urls = self._conn.execute("SELECT url, content_hash FROM urls ORDER BY accessed_at ASC").fetchall()
+        for url, content_hash in lru_urls:
+            self._conn.execute("DELETE FROM urls WHERE url = ?", (url,))
+            total_size -= self.__release(content_hash)
+            if total_size <= self.max_size:
+                break
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
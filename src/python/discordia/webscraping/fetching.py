@@ -0,0 +1,220 @@
+"""
+HTTP FETCHING: pooled connections to the They Work For You website
+
+Every debate page used to be downloaded with a bare `requests.get`, which opens a brand new
+TCP/TLS connection per page. The `Fetcher` below wraps a single `requests.Session` whose
+connection pool is sized for the number of worker threads, so concurrent scrapers reuse
+keep-alive connections instead.
+
+A `Fetcher` can also be given a `ResponseCache` (see `cache.py`) to keep every page on disk
+and serve it from there on the next run.
+
+Requests go through a `FetchScheduler` (see `scheduler.py`), which rate-limits them, adapts the
+concurrency to how the site copes, retries transient errors and applies timeouts. Pages that
+still cannot be downloaded are recorded in `Fetcher.failures` instead of raising.
+
+"""
+
+import threading
+import requests
+
+import pandas as pd
+
+from collections import deque, namedtuple
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+
+from .scheduler import FetchScheduler
+
+DEFAULT_POOL_SIZE = 8
+
+# A page that could not be downloaded: its last status code (None if the server never replied),
+# the reason and the number of attempts
+FailedFetch = namedtuple("FailedFetch", ["url", "status_code", "error", "attempts"])
+
+
+class Fetcher:
+    """Downloads pages through a shared, thread-safe connection pool.
+
+    Args:
+        pool_size (int): Maximum number of keep-alive connections kept open per host.
+            Set it to (at least) the number of threads that will share this fetcher.
+        session (requests.Session): An existing session to use. If None, a new one is created.
+        cache (ResponseCache): Optional on-disk cache. Pages found there are not downloaded again,
+            unless they are older than its `max_age` or it asks for revalidation.
+        scheduler (FetchScheduler): Rate limits, retries and timeouts of the requests. If None, one
+            with the default settings and at most `pool_size` concurrent requests per host is created.
+
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, session=None, cache=None, scheduler=None):
+        self.pool_size = pool_size
+        self.session = session if session is not None else requests.Session()
+        self.cache = cache
+        self.scheduler = scheduler if scheduler is not None else FetchScheduler(max_concurrency=pool_size)
+
+        # Latest failure of each URL that could not be downloaded, removed if a later attempt succeeds
+        self.failures = {}
+        self._failures_lock = threading.Lock()
+
+        # pool_block=True makes extra threads wait for a free connection
+        # instead of opening (and then discarding) throwaway ones
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __request(self, url, headers=None):
+        result = self.scheduler.request(self.session, url, headers=headers)
+        with self._failures_lock:
+            if result.error is None:
+                self.failures.pop(url, None)
+            else:
+                status_code = result.response.status_code if result.response is not None else None
+                self.failures[url] = FailedFetch(url, status_code, result.error, result.attempts)
+        return result.response
+
+    def get(self, url, max_age=None):
+        """Downloads a page.
+
+        Args:
+            url (str): The URL of the page.
+            max_age (float): With a cache, revalidate the cached page if it is older than this many seconds.
+                Defaults to the `max_age` of the cache.
+
+        Returns:
+            bytes: The raw content of the page, or None if the server did not reply with 200 OK
+                after the retries of the scheduler or, in offline mode, if the page is not in the
+                cache. Either way, the URL is then in `failures`.
+
+        """
+
+        if self.cache is None:
+            response = self.__request(url)
+            if response is not None and response.status_code == 200:
+                return response.content
+            return None
+
+        entry = self.cache.get(url)
+        if entry is not None and self.cache.is_fresh(entry, max_age=max_age):
+            return entry.content
+        if self.cache.offline:
+            if entry is not None:
+                return entry.content
+            # Recorded like any other failure, so that crawl jobs do not take the page as done
+            with self._failures_lock:
+                self.failures[url] = FailedFetch(url, None, "offline: not cached", 0)
+            return None
+
+        headers = {}
+        if entry is not None and entry.etag is not None:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified is not None:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        response = self.__request(url, headers=headers)
+        if response is None:
+            return None
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(url)
+            return entry.content
+        if response.status_code == 200:
+            self.cache.put(url, response.content,
+                           etag=response.headers.get("ETag"),
+                           last_modified=response.headers.get("Last-Modified"))
+            return response.content
+        return None
+
+    def failed_urls(self):
+        """Returns the set of URLs whose last download failed."""
+        with self._failures_lock:
+            return set(self.failures)
+
+    def failure_report(self):
+        """Lists the pages that could not be downloaded.
+
+        Returns:
+            pd.DataFrame: One row per URL, with the columns url, status_code, error and attempts.
+        """
+        with self._failures_lock:
+            failures = list(self.failures.values())
+        return pd.DataFrame(failures, columns=FailedFetch._fields).astype({"status_code": "Int64"})
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+def get_default_fetcher():
+    """Returns the module-wide `Fetcher`, creating it on first use.
+
+    Returns:
+        Fetcher: The shared fetcher.
+
+    """
+
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = Fetcher()
+    return _default_fetcher
+
+
+def __bounded_submit(executor, function, iterable, max_in_flight):
+    futures = deque()
+    try:
+        for item in iterable:
+            futures.append(executor.submit(function, item))
+            if len(futures) >= max_in_flight:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        # If the consumer stopped early, the items that have not started yet are dropped
+        for future in futures:
+            future.cancel()
+
+def bounded_map(function, iterable, max_workers=1, max_in_flight=None, executor=None):
+    """Like `executor.map`, but lazy: at most `max_in_flight` items are being processed or waiting to be consumed.
+
+    `ThreadPoolExecutor.map` submits every item upfront and keeps every result until it is consumed,
+    so memory grows with the length of `iterable` whenever the consumer is slower than the workers.
+    This generator only submits a new item when a result has been handed over. `iterable` is itself
+    consumed lazily, so chaining two `bounded_map` makes the second stage hold back the first.
+
+    Args:
+        function (callable): The function to apply to each item.
+        iterable (iterable): The items.
+        max_workers (int): Number of threads. With 1 (the default), items are processed sequentially in this thread.
+        max_in_flight (int): Maximum number of submitted items whose result has not been consumed yet.
+            Defaults to twice `max_workers`.
+        executor (concurrent.futures.Executor): An existing executor to submit to, e.g. a `ProcessPoolExecutor`,
+            instead of a pool of `max_workers` threads. It is not shut down at the end, but the items still
+            waiting in it are cancelled when the generator is closed.
+
+    Yields:
+        The results of `function`, in the order of `iterable`.
+
+    """
+
+    if max_in_flight is None:
+        max_in_flight = 2 * max_workers
+
+    if executor is not None:
+        yield from __bounded_submit(executor, function, iterable, max_in_flight)
+        return
+
+    if max_workers <= 1:
+        for item in iterable:
+            yield function(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from __bounded_submit(executor, function, iterable, max_in_flight)
@@ -0,0 +1,226 @@
+"""
+INSTRUMENTATION: where the time of a crawl goes
+
+A `Metrics` object can be passed (as `metrics=`) to the scrapers in `twfy`, to `sinks.write_stream`
+and to `jobs.CrawlJob`. They then time each stage of the pipeline in a span:
+
+    fetch      downloading a page (or reading it from the cache)
+    parse      turning its HTML into a tree of speech blocks
+    speeches   extracting the speeches of a debate
+    divisions  extracting its house divisions and votes
+    dataframe  building the data frames of a batch
+    sink       writing a batch
+
+and count what went through them: bytes, pages, failed pages, debates, speeches, house divisions,
+votes and warnings (e.g. the unexpected tags of `twfy.get_debate_section`).
+
+Span durations go into histograms with fixed, logarithmic buckets, so memory stays constant however
+long the crawl is. Listeners can be attached to react to every span or counter as it happens.
+
+Example:
+
+    metrics = Metrics()
+    stream = twfy.iter_speeches_divisions_and_votes(list_urls, batch_size=50, max_workers=8, metrics=metrics)
+    write_stream(stream, storage.SQLiteSink(conn), metrics=metrics)
+
+    print(metrics.report())
+    metrics.to_json('../data/crawl_metrics.json')
+
+"""
+
+import json
+import time
+import bisect
+import threading
+
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+STAGES = ["fetch", "parse", "speeches", "divisions", "dataframe", "sink"]
+
+# Upper bounds of the histogram buckets, in seconds: 100µs to ~100s, four buckets per factor of 10
+DEFAULT_BUCKETS = [10 ** (exponent / 4) for exponent in range(-16, 9)]
+
+
+class Histogram:
+    """Counts of durations in fixed buckets, with their total, minimum and maximum.
+
+    Args:
+        buckets (list): Upper bounds of the buckets, in increasing order. Longer durations go to an overflow bucket.
+
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Estimates a quantile as the upper bound of the bucket it falls in (capped by the maximum)."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "buckets": [[bound, count] for bound, count in zip(self.buckets + [None], self.counts)],
+        }
+
+
+class Metrics:
+    """Thread-safe counters and latency histograms for a crawl.
+
+    Args:
+        buckets (list): Upper bounds of the histogram buckets, in seconds.
+
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """Registers a callable, called as `listener(kind, name, value)` after every event.
+
+        kind is 'span' (value in seconds) or 'count' (value is the increment). Listeners run in the
+        thread that recorded the event, so they should be quick.
+        """
+        self.listeners.append(listener)
+
+    def __notify(self, kind, name, value):
+        for listener in self.listeners:
+            listener(kind, name, value)
+
+    def count(self, name, value=1):
+        """Adds `value` to the counter `name`."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        self.__notify("count", name, value)
+
+    def observe(self, stage, seconds):
+        """Records a duration in the histogram of `stage`."""
+        with self._lock:
+            if stage not in self.histograms:
+                self.histograms[stage] = Histogram(self.buckets)
+            self.histograms[stage].observe(seconds)
+        self.__notify("span", stage, seconds)
+
+    @contextmanager
+    def span(self, stage):
+        """Times the code inside a `with` block as one occurrence of `stage`. Failed blocks are timed too."""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    #### REPORTING ####
+
+    def summary(self):
+        """Summarises the spans of each stage.
+
+        Returns:
+            pd.DataFrame: One row per stage, with the columns stage, count, total_seconds, share (of the total
+                time of all stages), mean_ms, p50_ms, p90_ms, p99_ms and max_ms. Percentiles are bucket upper bounds.
+        """
+        with self._lock:
+            histograms = dict(self.histograms)
+
+        stages = [stage for stage in STAGES if stage in histograms] + sorted(set(histograms) - set(STAGES))
+        grand_total = sum(histogram.total for histogram in histograms.values()) or 1.0
+
+        rows = []
+        for stage in stages:
+            histogram = histograms[stage]
+            rows.append({
+                "stage": stage,
+                "count": histogram.count,
+                "total_seconds": histogram.total,
+                "share": histogram.total / grand_total,
+                "mean_ms": 1000 * histogram.total / histogram.count,
+                "p50_ms": 1000 * histogram.quantile(0.5),
+                "p90_ms": 1000 * histogram.quantile(0.9),
+                "p99_ms": 1000 * histogram.quantile(0.99),
+                "max_ms": 1000 * histogram.max,
+            })
+        columns = ["stage", "count", "total_seconds", "share", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms"]
+        return pd.DataFrame(rows, columns=columns)
+
+    def report(self):
+        """Returns a human-readable summary of the counters and spans."""
+        with self._lock:
+            counters = dict(self.counters)
+
+        lines = ["Counters:"]
+        lines += [f"  {name:<20} {value:>12,}" for name, value in sorted(counters.items())] or ["  (none)"]
+        lines += ["", "Spans:"]
+        df = self.summary()
+        lines += [df.to_string(index=False, float_format=lambda x: f"{x:.3f}")] if len(df) > 0 else ["  (none)"]
+        return "\n".join(lines)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {stage: histogram.to_dict() for stage, histogram in self.histograms.items()},
+            }
+
+    def to_json(self, path=None):
+        """Exports the counters and histograms as JSON.
+
+        Args:
+            path (str): If given, the JSON is written to this file.
+
+        Returns:
+            str: The JSON.
+        """
+        output = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(output)
+        return output
+
+
+class NullMetrics:
+    """Does nothing. Used when no `Metrics` is given, so the scrapers never have to check."""
+
+    def count(self, name, value=1):
+        pass
+
+    def observe(self, stage, seconds):
+        pass
+
+    def span(self, stage):
+        return nullcontext(self)
+
+
+NULL_METRICS = NullMetrics()
@@ -0,0 +1,231 @@
+"""
+CRAWL JOBS: resumable, incremental crawls into the DISCORDIA database
+
+`CrawlJob` replaces the all-or-nothing crawl of NB01 (scrape everything, then `to_sql`):
+
+- every debate is upserted into the database (see `discordia.storage`), together with its speeches,
+  house divisions and votes, in its own transaction, so a crash loses at most the debate being processed;
+- debates whose speeches or house divisions are already in the database are never fetched again
+  (being listed in the `debates` table, e.g. by `discordia crawl index --db`, does not count);
+- a small JSON checkpoint file records which days have been fully crawled (and which debates of
+  the current day are done), so a re-run (e.g. the nightly job) only fetches the days it has not seen yet;
+- with a `SittingDayIndex` (see `sitting_days.py`), days on which the house did not sit are not visited at all.
+  Without one, a day with an empty list of debates is visited again on every run, as its Hansard may just
+  not be published yet. With a `ResponseCache`, the listings of such days are revalidated once they are
+  older than `listing_max_age`, so an empty listing cached on the first night does not hide the debates;
+- `run(..., refresh=True)` crawls debates already in the database again, to pick up corrections to Hansard:
+  only the speeches and vote lists that changed are written (see `storage.write_batch`).
+
+Example:
+
+    conn = storage.connect('../data/discordia.db')
+    job = CrawlJob(conn, '../data/crawl_checkpoint.json', max_workers=8)
+    job.run(datetime(2023, 11, 1), datetime(2023, 11, 29))
+
+"""
+
+import os
+import json
+import threading
+
+import pandas as pd
+
+from .. import storage
+from .fetching import Fetcher
+from .instrumentation import NULL_METRICS
+from .twfy import BASE_URL, build_url, scrape_debate_sections_static, iter_speeches_divisions_and_votes
+
+# Seconds after which a cached day listing is downloaded again when its day is not done yet
+DEFAULT_LISTING_MAX_AGE = 60 * 60
+
+
+class CrawlJob:
+    """A crawl of a range of days that can be interrupted and resumed.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the DISCORDIA database, from `storage.connect`.
+        checkpoint_path (str): Path to the JSON file where progress is saved.
+        base_url (str): A base URL passed on to `build_url`.
+        max_workers (int): number of debates to fetch concurrently.
+        fetcher (Fetcher): fetcher used to download the pages. If None, one is created with
+            a connection pool large enough for `max_workers` threads. Its `failure_report()` lists
+            the pages that could not be downloaded.
+        metrics (Metrics): Optional instrumentation, see `instrumentation.py`. Database writes are timed as 'sink' spans.
+        processes (int): number of processes that parse the debates. If None, the download threads parse them.
+            See `twfy.iter_debate_records`.
+        sitting_days (SittingDayIndex): If given, only the sitting days of the range are crawled. The index
+            learns from the database and from every listing crawled. Its `base_url` should be `base_url`.
+        listing_max_age (float): With a `ResponseCache`, cached day listings older than this many seconds
+            are revalidated. Debate pages keep the `max_age` of the cache.
+
+    """
+
+    def __init__(self, conn, checkpoint_path, base_url=BASE_URL, max_workers=8, fetcher=None, metrics=None,
+                 processes=None, sitting_days=None, listing_max_age=DEFAULT_LISTING_MAX_AGE):
+        self.conn = conn
+        self.checkpoint_path = checkpoint_path
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.fetcher = fetcher if fetcher is not None else Fetcher(pool_size=max(max_workers, 1))
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.processes = processes
+        self.sitting_days = sitting_days
+        self.listing_max_age = listing_max_age
+
+        self._lock = threading.Lock()
+        self.checkpoint = self.__load_checkpoint()
+
+    #### CHECKPOINTS ####
+
+    def __load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return {"days_done": [], "debates_done": []}
+        with open(self.checkpoint_path, "r") as f:
+            return json.load(f)
+
+    def __save_checkpoint(self):
+        # Write to a temporary file first so that a crash never leaves a corrupted checkpoint behind
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.checkpoint, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def __mark_done(self, key, value):
+        with self._lock:
+            if value not in self.checkpoint[key]:
+                self.checkpoint[key].append(value)
+                self.__save_checkpoint()
+
+    #### DATABASE ####
+
+    def existing_debate_ids(self, debate_ids=None):
+        """Returns the set of debate IDs already crawled into the database. See `storage.existing_debate_ids`."""
+        return storage.existing_debate_ids(self.conn, debate_ids)
+
+    def write_debate(self, df_debate, df_speeches, df_house_division, df_votes):
+        """Writes everything scraped from one debate in a single transaction.
+
+        Args:
+            df_debate (pd.DataFrame): The row of `df_debates` for this debate.
+            df_speeches (pd.DataFrame): The speeches of this debate.
+            df_house_division (pd.DataFrame): The house divisions of this debate.
+            df_votes (pd.DataFrame): The votes of the house divisions of this debate.
+
+        """
+
+        with self.metrics.span("sink"):
+            storage.write_batch(self.conn, df_speeches, df_house_division, df_votes, df_debates=df_debate)
+
+    #### CRAWLING ####
+
+    def pending_debates(self, df_debates, refresh=False):
+        """Filters out the debates that were already crawled.
+
+        Args:
+            df_debates (pd.DataFrame): Debates as returned by `scrape_debate_sections_static`.
+            refresh (bool): If True, debates already in the database are kept.
+
+        Returns:
+            pd.DataFrame: The debates that are neither in the database (unless `refresh`) nor in the checkpoint.
+
+        """
+
+        if len(df_debates) == 0:
+            return df_debates
+
+        done = set(self.checkpoint["debates_done"])
+        if not refresh:
+            done |= self.existing_debate_ids(df_debates["debate_id"].unique())
+        return df_debates[~df_debates["debate_id"].isin(done)].drop_duplicates("debate_id")
+
+    def run_day(self, date_object, refresh=False):
+        """Crawls all the debates of a single day that are not in the database yet.
+
+        Args:
+            date_object (datetime): The day to crawl.
+            refresh (bool): If True, the debates already in the database are crawled again too.
+
+        Returns:
+            int: The number of debates that were fetched. Debates (or a list of debates) that could
+                not be downloaded are not counted, and the day is not marked as done so that they are
+                tried again on the next run. Neither is a day whose list of debates is empty, unless
+                `sitting_days` knows the house did not sit that day: its Hansard may not be published yet.
+
+        """
+
+        day = date_object.strftime("%Y-%m-%d")
+        day_url = build_url(date_object, base_url=self.base_url)
+        df_debates = scrape_debate_sections_static(day_url, fetcher=self.fetcher, metrics=self.metrics,
+                                                   max_age=self.listing_max_age)
+        if day_url in self.fetcher.failed_urls():
+            # The list of debates could not be downloaded: try the whole day again on the next run
+            return 0
+        if len(df_debates) == 0:
+            if self.sitting_days is not None and self.sitting_days.is_sitting_day(date_object) is False:
+                self.__mark_done("days_done", day)
+            return 0
+        df_pending = self.pending_debates(df_debates, refresh=refresh)
+
+        # Batches of one debate come back in order, and are written one at a time from this thread
+        stream = iter_speeches_divisions_and_votes(list(df_pending["url"]), batch_size=1,
+                                                   max_workers=self.max_workers, fetcher=self.fetcher,
+                                                   metrics=self.metrics, processes=self.processes)
+        if self.sitting_days is not None:
+            self.sitting_days.add([date_object])
+            self.sitting_days.save()
+
+        num_failed = 0
+        for i, (df_speeches, df_house_division, df_votes) in enumerate(stream):
+            df_debate = df_pending.iloc[[i]]
+            if df_debate["url"].iloc[0] in self.fetcher.failed_urls():
+                # Not written, so it is still pending on the next run (see `self.fetcher.failure_report()`)
+                num_failed += 1
+                continue
+            self.write_debate(df_debate, df_speeches, df_house_division, df_votes)
+            self.__mark_done("debates_done", df_debate["debate_id"].iloc[0])
+
+        if num_failed > 0:
+            return len(df_pending) - num_failed
+
+        with self._lock:
+            # Once the day is complete the database is enough to know its debates are done,
+            # so the checkpoint only ever holds the debates of the day in progress
+            self.checkpoint["debates_done"] = [debate_id for debate_id in self.checkpoint["debates_done"]
+                                               if not debate_id.startswith(day)]
+        self.__mark_done("days_done", day)
+        return len(df_pending)
+
+    def run(self, start_date, end_date, force=False, tqdm=None, refresh=False):
+        """Crawls every day between `start_date` and `end_date` (inclusive), resuming from the checkpoint.
+
+        With `sitting_days`, the stale months of the index are refreshed first and only sitting days are crawled.
+
+        Args:
+            start_date (datetime): The first day to crawl.
+            end_date (datetime): The last day to crawl.
+            force (bool): If True, days already marked as done in the checkpoint are visited again.
+                Debates already in the database are still skipped.
+            tqdm (callable): optional progress bar, e.g. `tqdm.notebook.tqdm`
+            refresh (bool): If True, every day is visited again and its debates are crawled again even if
+                they are in the database, e.g. to pick up the corrections of the last few weeks. Only what
+                changed is written. With a `ResponseCache`, it should be in `revalidate` mode.
+
+        Returns:
+            int: The number of debates that were fetched.
+
+        """
+
+        if self.sitting_days is None:
+            candidates = pd.date_range(start_date, end_date)
+        else:
+            self.sitting_days.learn_from_database(self.conn)
+            candidates = self.sitting_days.sitting_days(start_date, end_date, fetcher=self.fetcher,
+                                                        max_workers=self.max_workers)
+
+        days_done = set(self.checkpoint["days_done"])
+        dates = [date_object for date_object in candidates
+                 if force or refresh or date_object.strftime("%Y-%m-%d") not in days_done]
+        if tqdm is not None:
+            dates = tqdm(dates)
+
+        return sum(self.run_day(date_object, refresh=refresh) for date_object in dates)
@@ -1,16 +1,14 @@
-import twfy
-import pandas as pd
+"""
+Kept for the old `python -m discordia.webscraping.main`: use the `discordia` command instead (see `discordia/cli.py`), e.g.
 
-from sqlalchemy import create_engine
+    discordia ingest --csv ../data/ingested https://www.theyworkforyou.com/debates/?id=2023-11-14b.534.3
 
+"""
 
-if __name__ == "__main__":
-    # engine = create_engine('sqlite:///C:/Users/Jon/Workspace/llm-quantitative-text-mining/data/discordia.db', echo=False)
+import sys
 
-    # df_debates = pd.read_sql_table('debates', engine)
+from discordia.cli import main
 
-    list_urls = ["https://www.theyworkforyou.com/debates/?id=2023-11-14b.534.3", "https://www.theyworkforyou.com/debates/?id=2023-11-15b.674.3"]
-    df_speeches, df_house_division, df_votes = twfy.get_speeches_divisions_and_votes(list_urls)
 
-    print(df_speeches.shape)
-    print(df_votes.shape)
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
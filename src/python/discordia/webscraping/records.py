@@ -0,0 +1,140 @@
+"""
+RECORDS: compact, typed versions of what `twfy` scrapes
+
+The scrapers produce strings everywhere: IDs are extracted with regular expressions, and columns
+such as speaker_position or comment repeat a handful of values over thousands of rows. This module
+holds the typed schema that those data frames can be converted to:
+
+- speaker_id and mp_id become (nullable) integers;
+- debate_id, e.g. 2023-11-15b.633.6, is split into its sitting_date (2023-11-15), house letter (b),
+  column (633) and section (6), so the day of a debate no longer has to be re-derived with `str[:10]`;
+- IDs repeated on many rows and low-cardinality text become categoricals.
+
+It also defines the small `__slots__` records the scrapers use for one speech and one vote
+before they are appended to the columnar records (see `twfy.scrape_one_debate_records`).
+
+"""
+
+import re
+
+import pandas as pd
+
+DEBATE_ID_PATTERN = re.compile(r"^(?P<sitting_date>\d{4}-\d{2}-\d{2})(?P<house>[a-z])\.(?P<column>\d+)\.(?P<section>\d+)$")
+
+DEBATE_ID_COMPONENTS = ["sitting_date", "house", "column", "section"]
+
+# Columns turned into nullable integers
+INTEGER_COLUMNS = ["speaker_id", "mp_id"]
+
+# Columns with few distinct values compared to their number of rows
+CATEGORICAL_COLUMNS = ["debate_id", "house_division_id", "speaker_position", "comment", "party", "house"]
+
+
+class SpeechRecord:
+    """One speech, as extracted by `twfy.scrape_one_speech`."""
+
+    __slots__ = ("speech_id", "speaker_id", "speaker_position", "speech_html", "speech_raw_text")
+
+    def __init__(self, speech_id, speaker_id, speaker_position, speech_html, speech_raw_text):
+        self.speech_id = speech_id
+        self.speaker_id = speaker_id
+        self.speaker_position = speaker_position
+        self.speech_html = speech_html
+        self.speech_raw_text = speech_raw_text
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class VoteRecord:
+    """The vote of one MP in a house division, as extracted from one <li> element."""
+
+    __slots__ = ("mp_id", "comment")
+
+    def __init__(self, mp_id, comment):
+        self.mp_id = mp_id
+        self.comment = comment
+
+
+def parse_debate_id(debate_id):
+    """Splits a debate ID into its components.
+
+    Args:
+        debate_id (str): The debate ID, e.g. 2023-11-15b.633.6
+
+    Returns:
+        dict: sitting_date (pd.Timestamp), house (str), column (int) and section (int).
+            None if the debate ID does not have the expected format.
+
+    """
+
+    match = DEBATE_ID_PATTERN.match(debate_id)
+    if match is None:
+        return None
+    return {
+        "sitting_date": pd.Timestamp(match.group("sitting_date")),
+        "house": match.group("house"),
+        "column": int(match.group("column")),
+        "section": int(match.group("section")),
+    }
+
+def debate_id_components(debate_ids):
+    """Vectorised version of `parse_debate_id`.
+
+    Args:
+        debate_ids (pd.Series): Debate IDs, e.g. 2023-11-15b.633.6
+
+    Returns:
+        pd.DataFrame: With the same index as `debate_ids` and the columns sitting_date (datetime64),
+            house (category), column (Int32) and section (Int32). Rows that do not match are missing.
+
+    """
+
+    # Parse each distinct debate ID once: a debate ID is repeated on every row of its speeches and votes
+    codes, uniques = pd.factorize(debate_ids.astype(str))
+    parts = pd.Series(uniques).str.extract(DEBATE_ID_PATTERN.pattern)
+
+    components = pd.DataFrame({
+        "sitting_date": pd.to_datetime(parts["sitting_date"]),
+        "house": parts["house"].astype("category"),
+        "column": pd.to_numeric(parts["column"]).astype("Int32"),
+        "section": pd.to_numeric(parts["section"]).astype("Int32"),
+    })
+    return components.take(codes).set_axis(debate_ids.index)
+
+def to_typed_schema(df):
+    """Converts a data frame produced by `twfy` (or read back from the database) to the typed schema.
+
+    Only the columns that are present are converted, so this works on speeches, house divisions,
+    votes or the output of `analysis.rebels` alike.
+
+    Args:
+        df (pd.DataFrame): A data frame with some of the columns above.
+
+    Returns:
+        pd.DataFrame: A copy of df with integer IDs and categorical columns and, if it has a
+            debate_id column, the `DEBATE_ID_COMPONENTS` columns right after it.
+
+    """
+
+    df = df.copy()
+
+    for column in INTEGER_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column]).astype("Int64")
+
+    if "debate_id" in df.columns:
+        components = debate_id_components(df["debate_id"])
+        position = df.columns.get_loc("debate_id") + 1
+        for offset, column in enumerate(DEBATE_ID_COMPONENTS):
+            df.insert(position + offset, column, components[column])
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+
+    for column in ["is_teller", "is_vote_aye"]:
+        if column in df.columns:
+            df[column] = df[column].astype(bool)
+
+    return df
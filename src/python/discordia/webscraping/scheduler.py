@@ -0,0 +1,200 @@
+"""
+FETCH SCHEDULER: polite, resilient requests to the They Work For You website
+
+`FetchScheduler` sits between a `Fetcher` and the network and decides when each request goes out:
+
+- a token bucket per host caps the request rate (with short bursts allowed);
+- the number of concurrent requests per host adapts: it is halved whenever the site answers
+  429 Too Many Requests or a 5xx error, and grows back by one slot per window of healthy responses;
+- requests that time out, fail to connect, are cut short or get a 429/5xx are retried a bounded number
+  of times, waiting an exponentially growing, jittered delay (or what the Retry-After header says);
+- every request has a timeout.
+
+A request that still fails after its retries, or that fails with any other `requests` error, is not
+raised: the `Fetcher` returns None for it and keeps a record of it (see `Fetcher.failure_report`).
+
+"""
+
+import time
+import random
+import threading
+
+from urllib.parse import urlsplit
+from collections import namedtuple
+
+import requests
+
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT = (10, 60)
+
+# Status codes worth retrying: the server is overloaded or throttling us
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Errors worth retrying: the connection failed, timed out or was cut in the middle of the response
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+# Outcome of a request: the last response (None if there was none) and, if it failed, why
+FetchResult = namedtuple("FetchResult", ["response", "error", "attempts"])
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, and up to `burst` at once.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (int): Maximum number of tokens in the bucket.
+
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token, waiting for one if the bucket is empty."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            # Sleep without the lock so other threads can keep refilling and checking
+            time.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """A semaphore whose size shrinks on errors and grows on success (additive increase, multiplicative decrease).
+
+    Args:
+        initial (int): Number of concurrent requests allowed at first.
+        minimum (int): Never go below this number.
+        maximum (int): Never go above this number.
+        cooldown (float): Seconds after a decrease during which further errors do not decrease it again,
+            so a burst of errors from requests already in flight only counts once.
+
+    """
+
+    def __init__(self, initial=DEFAULT_MAX_CONCURRENCY, minimum=1, maximum=DEFAULT_MAX_CONCURRENCY, cooldown=5.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.decreased_at = None
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, healthy=True):
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if healthy:
+                # One more slot after `limit` healthy responses in a row
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif self.decreased_at is None or now - self.decreased_at >= self.cooldown:
+                self.limit = max(self.minimum, self.limit / 2)
+                self.decreased_at = now
+            self._condition.notify_all()
+
+
+class FetchScheduler:
+    """Schedules and retries the requests of one or more fetchers.
+
+    Args:
+        rate (float): Maximum average number of requests per second, per host. None disables the rate limit.
+        burst (int): Number of requests per host that can go out at once before the rate limit kicks in.
+        max_concurrency (int): Maximum number of concurrent requests per host.
+        max_retries (int): How many times a failed request is retried.
+        backoff (float): Base delay in seconds: the nth retry waits a random time of up to backoff * 2^n.
+        max_backoff (float): Maximum delay between two attempts, in seconds.
+        timeout (float or tuple): Passed to `requests`: seconds to wait to connect and for the server to reply.
+
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_retries=3, backoff=0.5, max_backoff=30.0, timeout=DEFAULT_TIMEOUT):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.buckets = {}
+        self.concurrency = {}
+        self._lock = threading.Lock()
+
+    def __host_limits(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self.concurrency:
+                self.buckets[host] = TokenBucket(self.rate, self.burst) if self.rate is not None else None
+                self.concurrency[host] = AdaptiveConcurrency(initial=self.max_concurrency, maximum=self.max_concurrency)
+            return self.buckets[host], self.concurrency[host]
+
+    def delay(self, attempt, response=None):
+        """Seconds to wait before retrying after `attempt` failed attempts: Retry-After if the server sent one, else full jitter."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None and retry_after.strip().isdigit():
+            return min(self.max_backoff, float(retry_after))
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, session, url, headers=None):
+        """Sends a GET request, waiting for the rate limit and retrying on transient errors.
+
+        Args:
+            session (requests.Session): The session to send the request with.
+            url (str): The URL.
+            headers (dict): Extra request headers.
+
+        Returns:
+            FetchResult: The last response (None if no response was ever received), the reason
+                the request failed (None if it did not fail) and the number of attempts.
+
+        """
+
+        bucket, concurrency = self.__host_limits(url)
+
+        response, error = None, None
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                time.sleep(self.delay(attempt - 1, response))
+            if bucket is not None:
+                bucket.acquire()
+
+            concurrency.acquire()
+            healthy = False
+            try:
+                response = session.get(url, headers=headers, timeout=self.timeout)
+                healthy = response.status_code not in RETRY_STATUS_CODES
+                error = None if healthy else f"HTTP {response.status_code}"
+            except RETRY_EXCEPTIONS as e:
+                response, error = None, f"{type(e).__name__}: {e}"
+            except requests.RequestException as e:
+                # e.g. TooManyRedirects or ContentDecodingError: the site is not overloaded, and retrying will not help
+                healthy = True
+                return FetchResult(None, f"{type(e).__name__}: {e}", attempt + 1)
+            finally:
+                concurrency.release(healthy=healthy)
+
+            if healthy:
+                if response.status_code not in (200, 304):
+                    # e.g. 404: retrying will not help
+                    error = f"HTTP {response.status_code}"
+                return FetchResult(response, error, attempt + 1)
+
+        return FetchResult(response, error, self.max_retries + 1)
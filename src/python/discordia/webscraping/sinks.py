@@ -0,0 +1,84 @@
+"""
+SINKS: where the batches streamed by `twfy.iter_speeches_divisions_and_votes` end up
+
+A sink is any callable that takes one batch, i.e. `sink(df_speeches, df_house_division, df_votes)`.
+`write_stream` feeds every batch of a stream to a sink and then drops it, so that only one batch
+is held in memory at a time.
+
+"""
+
+import os
+
+from .instrumentation import NULL_METRICS
+
+# Names of the tables/files the three data frames of a batch are written to
+TABLE_NAMES = ["speeches", "house_divisions", "votes"]
+
+
+class SQLSink:
+    """Appends each batch to the `speeches`, `house_divisions` and `votes` tables of a database.
+
+    Each batch is written in a single transaction.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): Connection to the database.
+
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def __call__(self, df_speeches, df_house_division, df_votes):
+        with self.engine.begin() as conn:
+            for table, df in zip(TABLE_NAMES, [df_speeches, df_house_division, df_votes]):
+                if len(df) > 0:
+                    df.to_sql(table, conn, if_exists="append", index=False)
+
+
+class CSVSink:
+    """Appends each batch to `speeches.csv`, `house_divisions.csv` and `votes.csv` in a directory.
+
+    Args:
+        directory (str): Where to write the CSV files. It is created if it does not exist.
+            Existing files are appended to.
+
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, df_speeches, df_house_division, df_votes):
+        for table, df in zip(TABLE_NAMES, [df_speeches, df_house_division, df_votes]):
+            if len(df) == 0:
+                continue
+            path = os.path.join(self.directory, f"{table}.csv")
+            df.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+
+def write_stream(stream, sink, metrics=None):
+    """Writes every batch of a stream to a sink.
+
+    Args:
+        stream (iterable): Batches of (df_speeches, df_house_division, df_votes),
+            e.g. the output of `twfy.iter_speeches_divisions_and_votes`.
+        sink (callable): Called once per batch with the three data frames.
+        metrics (Metrics): Optional instrumentation, see `instrumentation.py`. Each write is timed
+            as a 'sink' span and the rows are counted as `rows_<table>`.
+
+    Returns:
+        dict: The number of rows written, keyed by table name.
+
+    """
+
+    if metrics is None:
+        metrics = NULL_METRICS
+
+    num_rows = dict.fromkeys(TABLE_NAMES, 0)
+    for batch in stream:
+        with metrics.span("sink"):
+            sink(*batch)
+        for table, df in zip(TABLE_NAMES, batch):
+            num_rows[table] += len(df)
+            metrics.count(f"rows_{table}", len(df))
+    return num_rows
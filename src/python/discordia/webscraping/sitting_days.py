@@ -0,0 +1,264 @@
+"""
+SITTING DAYS: which days each house actually sat
+
+Crawling every date of `pd.date_range(start_date, end_date)` wastes most of its requests on weekends,
+recesses and prorogations, whose listings are empty. A `SittingDayIndex` remembers, per house, the
+days with business, so that `twfy.build_urls` (and `jobs.CrawlJob`) only visit those.
+
+The index learns from two sources:
+
+- the listing pages themselves: each one links (`?d=YYYY-MM-DD`) to the previous and next sitting days
+  and, in its calendar, to every sitting day of its month. One page is therefore enough to know a
+  whole month, and `refresh` only downloads one page per month it does not know yet;
+- past crawls: the dates of the debates already in the DISCORDIA database (see `learn_from_database`).
+
+A month is stale until it has been read from a listing page downloaded after it ended (future
+sittings may still be added to the current month) and is then never downloaded again. Only days
+the index can rule out are skipped: days of months that were never read, and days after the last
+read of their month, are all candidates.
+
+The index is saved to a JSON file, which can hold the indexes of several houses.
+
+Example:
+
+    index = SittingDayIndex('../data/sitting_days.json', house='commons')
+    index.learn_from_database(conn)
+    urls = twfy.build_urls(datetime(2015, 1, 1), datetime(2023, 12, 31), sitting_days=index, fetcher=fetcher)
+
+"""
+
+import os
+import re
+import json
+import threading
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from .fetching import bounded_map, get_default_fetcher
+from .twfy import build_url
+
+HOUSE_URLS = {
+    "commons": "https://www.theyworkforyou.com/debates/?d=YYYY-MM-DD",
+    "westminster_hall": "https://www.theyworkforyou.com/whall/?d=YYYY-MM-DD",
+    "lords": "https://www.theyworkforyou.com/lords/?d=YYYY-MM-DD",
+}
+
+# Links to a day listing, e.g. href="/debates/?d=2023-11-14"
+DAY_LINK_PATTERN = re.compile(rb'[?&;]d=(\d{4}-\d{2}-\d{2})')
+
+# A month read less than this long after it ended may still be missing sitting days
+DEFAULT_MAX_AGE = timedelta(days=1)
+
+
+class SittingDayIndex:
+    """The known sitting days of one house, and the months for which they are complete.
+
+    Args:
+        path (str): JSON file where the index is kept. If None, the index only lives in memory.
+        house (str): One of `HOUSE_URLS`.
+        base_url (str): Base URL of the day listings of the house (see `twfy.build_url`).
+            Defaults to the one of `house` in `HOUSE_URLS`.
+        max_age (timedelta): How long a month that had not ended when it was read stays fresh.
+
+    """
+
+    def __init__(self, path=None, house="commons", base_url=None, max_age=DEFAULT_MAX_AGE):
+        if base_url is None and house not in HOUSE_URLS:
+            raise ValueError(f"Unknown house {house}. Expected one of: {list(HOUSE_URLS)}")
+
+        self.path = path
+        self.house = house
+        self.base_url = base_url if base_url is not None else HOUSE_URLS[house]
+        self.max_age = max_age
+
+        # Sitting days as 'YYYY-MM-DD', and when each month was last read from a listing page
+        self.days = set()
+        self.months = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def __month(date_object):
+        return pd.Timestamp(date_object).strftime("%Y-%m")
+
+    @staticmethod
+    def __month_end(month):
+        return pd.Period(month, freq="M").end_time.to_pydatetime()
+
+    #### PERSISTENCE ####
+
+    def __read_file(self):
+        if self.path is None or not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def load(self):
+        house_index = self.__read_file().get(self.house, {})
+        self.days = set(house_index.get("sitting_days", []))
+        self.months = {month: datetime.fromisoformat(read_at) for month, read_at in house_index.get("months", {}).items()}
+
+    def save(self):
+        """Writes the index of this house to `path`, keeping the indexes of the other houses in the file."""
+        if self.path is None:
+            return
+        with self._lock:
+            index = self.__read_file()
+            index[self.house] = {
+                "sitting_days": sorted(self.days),
+                "months": {month: read_at.isoformat() for month, read_at in sorted(self.months.items())},
+            }
+            # Same as the crawl checkpoints: never leave a half-written file behind
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    #### LEARNING ####
+
+    def add(self, dates):
+        """Records days on which the house sat.
+
+        Args:
+            dates (iterable): datetimes or 'YYYY-MM-DD' strings.
+        """
+        with self._lock:
+            self.days.update(pd.Timestamp(date_object).strftime("%Y-%m-%d") for date_object in dates)
+
+    def learn_from_page(self, url, content, read_at=None):
+        """Learns the sitting days linked from a day listing, and marks the month of the listing as read.
+
+        Args:
+            url (str): The URL of the listing, e.g. the output of `twfy.build_url`.
+            content (bytes): Its raw HTML.
+            read_at (datetime): When the page was downloaded. Defaults to now.
+
+        Returns:
+            set: The sitting days found on the page, as 'YYYY-MM-DD'. If none of them is in the month of the
+                listing, the month is not marked as read.
+        """
+
+        page_date = re.search(r"[?&]d=(\d{4}-\d{2}-\d{2})", url)
+        if content is None or page_date is None:
+            return set()
+
+        days = {match.decode("ascii") for match in DAY_LINK_PATTERN.findall(content)}
+        self.add(days)
+        month = self.__month(page_date.group(1))
+        if not any(day.startswith(month) for day in days):
+            # No calendar (e.g. an error page, or only the links to the previous and next sitting days):
+            # nothing can be said about the rest of the month
+            return days
+        with self._lock:
+            # The calendar of a listing covers the month of the listing
+            self.months[month] = read_at if read_at is not None else datetime.now()
+        return days
+
+    def learn_from_database(self, conn):
+        """Adds the days of the debates of this house already in the DISCORDIA database (see `storage`).
+
+        Returns:
+            int: The number of days that were not known yet.
+        """
+        debate_url_prefix = self.base_url.split("?")[0] + "?id="
+        rows = conn.execute(
+            "SELECT DISTINCT substr(debate_id, 1, 10) FROM debates WHERE url LIKE ? || '%'", (debate_url_prefix,)
+        ).fetchall()
+        num_known = len(self.days)
+        self.add(day for day, in rows)
+        return len(self.days) - num_known
+
+    #### REFRESHING ####
+
+    def is_stale(self, month, now=None):
+        """Whether the sitting days of `month` ('YYYY-MM') may be incomplete."""
+        read_at = self.months.get(month)
+        if read_at is None:
+            return True
+        if read_at > self.__month_end(month):
+            return False
+        now = now if now is not None else datetime.now()
+        return now - read_at > self.max_age
+
+    def stale_months(self, start_date, end_date, now=None):
+        """The months ('YYYY-MM') between two dates (inclusive) whose sitting days may be incomplete."""
+        months = pd.period_range(pd.Timestamp(start_date), pd.Timestamp(end_date), freq="M").strftime("%Y-%m")
+        return [month for month in months if self.is_stale(month, now=now)]
+
+    def refresh(self, start_date, end_date, fetcher=None, max_workers=1):
+        """Downloads one listing page for each stale month between two dates and learns from it.
+
+        Args:
+            start_date (datetime): The first day of the range.
+            end_date (datetime): The last day of the range.
+            fetcher (Fetcher): fetcher used to download the pages. If None, the shared module-wide fetcher is used.
+            max_workers (int): number of pages to fetch concurrently.
+
+        Returns:
+            int: The number of months that were refreshed. Months whose page could not be downloaded stay stale.
+        """
+
+        if fetcher is None:
+            fetcher = get_default_fetcher()
+
+        # Months that have not started yet have no listing
+        end_date = min(pd.Timestamp(end_date), pd.Timestamp(datetime.now()))
+        urls = [build_url(pd.Timestamp(month), base_url=self.base_url)
+                for month in self.stale_months(start_date, end_date)]
+
+        cache = getattr(fetcher, "cache", None)
+
+        def __learn(url):
+            # The month is stale, so a cached copy of its listing is too: always check it with the website
+            content = fetcher.get(url, max_age=0)
+            # A page served from the cache is only as recent as when it was downloaded
+            entry = cache.get(url) if cache is not None and content is not None else None
+            read_at = datetime.fromtimestamp(entry.fetched_at) if entry is not None else None
+            self.learn_from_page(url, content, read_at=read_at)
+            return content is not None
+
+        num_refreshed = sum(bounded_map(__learn, urls, max_workers=max_workers))
+        self.save()
+        return num_refreshed
+
+    #### QUERYING ####
+
+    def is_sitting_day(self, date_object):
+        """Whether the house sat on a day.
+
+        Returns:
+            bool: True if the day is a known sitting day, False if its month was read from a listing
+                downloaded after the day ended and the day is not in it, None if the index cannot tell.
+        """
+        day = pd.Timestamp(date_object)
+        with self._lock:
+            if day.strftime("%Y-%m-%d") in self.days:
+                return True
+            read_at = self.months.get(self.__month(day))
+        if read_at is None or read_at < day + timedelta(days=1):
+            return None
+        return False
+
+    def sitting_days(self, start_date, end_date, fetcher=None, max_workers=1):
+        """The days between two dates (inclusive) on which the house sat, or may have.
+
+        Args:
+            start_date (datetime): The first day of the range.
+            end_date (datetime): The last day of the range.
+            fetcher (Fetcher): If given, stale months are refreshed first (see `refresh`).
+                If None, the index is used as it is.
+            max_workers (int): number of pages to fetch concurrently when refreshing.
+
+        Returns:
+            pd.DatetimeIndex: The known sitting days, plus the days the index cannot rule out
+                (see `is_sitting_day`), e.g. those of months that were never read.
+        """
+
+        if fetcher is not None:
+            self.refresh(start_date, end_date, fetcher=fetcher, max_workers=max_workers)
+
+        dates = pd.date_range(start_date, end_date)
+        # Days after the last time their month was read may still turn out to be sitting days
+        return dates[[self.is_sitting_day(date_object) is not False for date_object in dates]]
@@ -15,22 +15,47 @@ DATE: 2023-11-29
 """
 
 import re
+import sys
 import bs4
-import requests
 import warnings
+import functools
 import itertools
 
 import pandas as pd
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.common.exceptions import NoSuchElementException
+from .fetching import Fetcher, bounded_map, get_default_fetcher
+from .records import SpeechRecord, VoteRecord, to_typed_schema
+from .instrumentation import NULL_METRICS
 
 BASE_URL = "https://www.theyworkforyou.com/debates/?d=YYYY-MM-DD"
 
+DEBATE_COLUMNS = ["debate_id", "debate_excerpt", "url", "title", "section", "section_excerpt"]
+
+# Tree builders BeautifulSoup can use to parse the debate pages.
+# 'html.parser' is pure Python and always available; 'lxml' is several times faster but requires the lxml package.
+PARSER_BACKENDS = ["html.parser", "lxml"]
+DEFAULT_PARSER = "html.parser"
+
+# Only <div class="debate-speech"> blocks are needed from a debate page
+SPEECH_BLOCKS_STRAINER = SoupStrainer("div", attrs={"class": "debate-speech"})
+
+# How the speech_html column is filled in:
+# 'prettify' re-indents every paragraph (the original output), 'raw' keeps the HTML as it is on the page,
+# and None skips it altogether for text-only pipelines.
+SPEECH_HTML_MODES = ["prettify", "raw", None]
+
+# Columns of the three data frames produced from the debate pages
+SPEECH_COLUMNS = ["debate_id", "speech_id", "speaker_id", "speaker_position", "speech_html", "speech_raw_text"]
+HOUSE_DIVISION_COLUMNS = ["debate_id", "house_division_id", "vote_title"]
+VOTE_COLUMNS = ["debate_id", "house_division_id", "mp_id", "comment", "is_teller", "is_vote_aye"]
+
+MP_ID_PATTERN = re.compile(r'\/mp\/\?p=(\d+)')
+COMMENT_PATTERN = re.compile(r'\((.*?)\)')
+
 def build_url(date_object, base_url=BASE_URL):
     """Builds a URL for a given date object.
     
@@ -51,9 +76,56 @@ def build_url(date_object, base_url=BASE_URL):
                 .replace("DD", f"{date_object.day:02d}")
     )
 
+def build_urls(start_date, end_date, base_url=BASE_URL, sitting_days=None, fetcher=None):
+    """Builds the URLs of the day listings between two dates (inclusive).
+
+    Args:
+        start_date (datetime): The first day.
+        end_date (datetime): The last day.
+        base_url (str): A base URL that will be used to build the URLs.
+        sitting_days (SittingDayIndex): If given, only the days on which the house sat (or may have) are
+            kept, see `sitting_days.py`. Its `base_url` should be the same as `base_url`.
+        fetcher (Fetcher): If given with `sitting_days`, used to refresh the stale months of the index first.
+
+    Returns:
+        list: One URL per day.
+
+    """
+
+    if sitting_days is None:
+        dates = pd.date_range(start_date, end_date)
+    else:
+        dates = sitting_days.sitting_days(start_date, end_date, fetcher=fetcher)
+    return [build_url(date_object, base_url=base_url) for date_object in dates]
+
 #### DEBATE SECTIONS ####
 
-def get_debate_item(a_element, section=None, section_excerpt=None):
+def __fetch(url, fetcher, metrics, max_age=None):
+    """Downloads a page with `fetcher`, timing it and counting pages and bytes in `metrics`."""
+    with metrics.span("fetch"):
+        content = fetcher.get(url, max_age=max_age)
+    if content is None:
+        metrics.count("pages_failed")
+    else:
+        metrics.count("pages")
+        metrics.count("bytes", len(content))
+    return content
+
+def __is_web_element(element):
+    """
+    Whether `element` is a Selenium WebElement. Selenium is only used to scrape with a browser
+    (see `scrape_debate_sections`), so it is not imported here: if it was never loaded, nothing can be a WebElement.
+    """
+    if "selenium.webdriver.remote.webelement" not in sys.modules:
+        return False
+    from selenium.webdriver.remote.webelement import WebElement
+    return isinstance(element, WebElement)
+
+def __get_text(tag):
+    """Mimics Selenium's `.text` on a BeautifulSoup tag: the rendered text, with whitespace collapsed."""
+    return " ".join(tag.get_text(" ").split())
+
+def get_debate_item(a_element, section=None, section_excerpt=None, page_url=BASE_URL):
     """
     Extracts the debate item from the <a> element. This element usually looks like:
 
@@ -77,9 +149,11 @@ def get_debate_item(a_element, section=None, section_excerpt=None):
     ./following-sibling::p
 
     Args:
-        a_element (Selenium WebElement): The <a> element containing the debate item.
+        a_element (Selenium WebElement or bs4.element.Tag): The <a> element containing the debate item.
         section (str): The section title, if any.
         section_excerpt (str): The section excerpt, if any.
+        page_url (str): URL of the listing page, used to resolve relative links. Only needed for bs4 tags,
+            as Selenium already returns absolute URLs.
 
     Returns:
         dict: A dictionary with the following keys:
@@ -91,25 +165,34 @@ def get_debate_item(a_element, section=None, section_excerpt=None):
             - section_excerpt (str): The section excerpt, if any.
     """
 
-    if not isinstance(a_element, WebElement):
-        raise ValueError(f"Expected a Selenium WebElement but got {type(a_element)}")
-
-    url = a_element.get_attribute('href')
-    try:
-        debate_excerpt = a_element.find_element(By.XPATH, "./following-sibling::p").text
-    except NoSuchElementException:
-        debate_excerpt = None
+    if __is_web_element(a_element):
+        from selenium.webdriver.common.by import By
+        from selenium.common.exceptions import NoSuchElementException
+
+        url = a_element.get_attribute('href')
+        try:
+            debate_excerpt = a_element.find_element(By.XPATH, "./following-sibling::p").text
+        except NoSuchElementException:
+            debate_excerpt = None
+        title = a_element.find_element(By.CSS_SELECTOR, "a > h3").text
+    elif isinstance(a_element, bs4.element.Tag):
+        url = urljoin(page_url, a_element.get("href"))
+        p_element = a_element.find_next_sibling("p")
+        debate_excerpt = __get_text(p_element) if p_element is not None else None
+        title = __get_text(a_element.find("h3"))
+    else:
+        raise ValueError(f"Expected a Selenium WebElement or a BeautifulSoup object but got {type(a_element)}")
 
     return {
         "debate_id": re.search(r".*id=(.*)", url).group(1),
         "debate_excerpt": debate_excerpt,
         "url": url,
-        "title": a_element.find_element(By.CSS_SELECTOR, "a > h3").text,
+        "title": title,
         "section": section,
         "section_excerpt": section_excerpt
     }
 
-def get_debate_section(debate_section):
+def get_debate_section(debate_section, page_url=BASE_URL, metrics=None):
     """Extracts the debate items from a debate section.
 
     A debate section usually looks like the following if it has debate blocks inside:
@@ -149,32 +232,51 @@ def get_debate_section(debate_section):
     The code in this function handles both standalone debate items and debate sections with multiple debate items.
 
     Args:
-        debate_section (Selenium WebElement): The debate section.
+        debate_section (Selenium WebElement or bs4.element.Tag): The debate section.
+        page_url (str): URL of the listing page, used to resolve relative links of bs4 tags.
+        metrics (Metrics): Optional instrumentation, see `instrumentation.py`. Unexpected tags are counted as warnings.
 
     Returns:
         list: A list of debate items.
 
     """
 
-    if not isinstance(debate_section, WebElement):
-        raise ValueError(f"Expected a Selenium WebElement but got {type(debate_section)}")
+    is_web_element = __is_web_element(debate_section)
+    if is_web_element:
+        from selenium.webdriver.common.by import By
+
+        first_child = debate_section.find_element(By.CSS_SELECTOR, ":first-child")
+        tag_name = first_child.tag_name
+    elif isinstance(debate_section, bs4.element.Tag):
+        first_child = debate_section.find(True, recursive=False)
+        tag_name = first_child.name if first_child is not None else None
+    else:
+        raise ValueError(f"Expected a Selenium WebElement or a BeautifulSoup object but got {type(debate_section)}")
 
-    first_child = debate_section.find_element(By.CSS_SELECTOR, ":first-child")
     debate_items = []
-    if first_child.tag_name == "a":
-        debate_items = [get_debate_item(first_child)]
-    elif first_child.tag_name == "div":
+    if tag_name == "a":
+        debate_items = [get_debate_item(first_child, page_url=page_url)]
+    elif tag_name == "div" and is_web_element:
         section_title = debate_section.find_element(By.CSS_SELECTOR, "div > h3").text
         section_title_excerpt = debate_section.find_element(By.CSS_SELECTOR, "p").text
         debate_items = [get_debate_item(a_element, section=section_title, section_excerpt=section_title_excerpt) 
                         for a_element in debate_section.find_elements(By.XPATH, "./ul//a")]
+    elif tag_name == "div":
+        section_title = __get_text(debate_section.select_one("div > h3"))
+        section_title_excerpt = __get_text(debate_section.find("p"))
+        a_elements = [a_element for ul in debate_section.find_all("ul", recursive=False) 
+                      for a_element in ul.find_all("a")]
+        debate_items = [get_debate_item(a_element, section=section_title, section_excerpt=section_title_excerpt, page_url=page_url) 
+                        for a_element in a_elements]
     else:
+        outer_html = debate_section.get_attribute('outerHTML') if is_web_element else str(debate_section)
         msg = (
             "Unexpected tag name. Expected one of: ['a', 'div'] "
-            f"but got {first_child.tag_name}. "
-            f"Context:{debate_section.get_attribute('outerHTML')}"
+            f"but got {tag_name}. "
+            f"Context:{outer_html}"
         )
         warnings.warn(msg)
+        (metrics or NULL_METRICS).count("warnings")
         
     return debate_items
 
@@ -189,6 +291,9 @@ def scrape_debate_sections(driver, url):
 
     """
 
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+
     if not isinstance(driver, webdriver.Firefox):
         raise ValueError(f"Expected a Selenium Firefox WebDriver but got {type(driver)}")
 
@@ -199,14 +304,93 @@ def scrape_debate_sections(driver, url):
     df = pd.DataFrame(itertools.chain.from_iterable(all_debate_sections))
     return df
 
+def scrape_debate_sections_static(url, fetcher=None, metrics=None, max_age=None):
+    """Scrapes the debate sections from the page without a browser.
+
+    The day listings are static HTML, so there is no need for Selenium here: the page is downloaded
+    once and parsed with BeautifulSoup. The output has the same columns as `scrape_debate_sections`.
+
+    Args:
+        url (str): The URL of the day listing, e.g. the output of `build_url`.
+        fetcher (Fetcher): fetcher used to download the page. If None, the shared module-wide fetcher is used.
+        metrics (Metrics): Optional instrumentation, see `instrumentation.py`.
+        max_age (float): If the page is cached, it is revalidated once older than this many seconds
+            (see `Fetcher.get`). A listing may be empty until the Hansard of its day is published.
+
+    Returns:
+        pd.DataFrame: One row per debate, with the columns in `DEBATE_COLUMNS`.
+            It is empty if the page could not be downloaded or had no business listed.
+
+    """
+
+    if fetcher is None:
+        fetcher = get_default_fetcher()
+    if metrics is None:
+        metrics = NULL_METRICS
+
+    content = __fetch(url, fetcher, metrics, max_age=max_age)
+    if content is None:
+        return pd.DataFrame(columns=DEBATE_COLUMNS)
+
+    with metrics.span("parse"):
+        soup = BeautifulSoup(content, "html.parser")
+        debate_sections = soup.select("ul.business-list > li")
+        all_debate_sections = [get_debate_section(debate_section, page_url=url, metrics=metrics) 
+                               for debate_section in debate_sections]
+    df = pd.DataFrame(itertools.chain.from_iterable(all_debate_sections), columns=DEBATE_COLUMNS)
+    return df
+
+def scrape_debate_days(dates, max_workers=8, fetcher=None, base_url=BASE_URL, tqdm=None, metrics=None, max_age=None):
+    """Scrapes the debate sections of several days in parallel, without a browser.
+
+    Args:
+        dates (iterable of datetime): The days to scrape, e.g. `pd.date_range(start_date, end_date)`.
+        max_workers (int): number of day listings to fetch concurrently.
+        fetcher (Fetcher): fetcher used to download the pages. If None, one is created with 
+            a connection pool large enough for `max_workers` threads.
+        base_url (str): A base URL passed on to `build_url`.
+        tqdm (callable): optional progress bar, e.g. `tqdm.notebook.tqdm`
+        metrics (Metrics): Optional instrumentation, see `instrumentation.py`.
+        max_age (float): Maximum age in seconds of the cached listings, see `scrape_debate_sections_static`.
+
+    Returns:
+        pd.DataFrame: The debates of all days, in the order of `dates`, with the columns in `DEBATE_COLUMNS`.
+
+    """
+
+    all_urls = [build_url(date_object, base_url=base_url) for date_object in dates]
+
+    owns_fetcher = fetcher is None
+    if owns_fetcher:
+        fetcher = Fetcher(pool_size=max(max_workers, 1))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            output = executor.map(lambda url: scrape_debate_sections_static(url, fetcher=fetcher, metrics=metrics,
+                                                                            max_age=max_age), all_urls)
+            if tqdm is not None:
+                output = tqdm(output, total=len(all_urls))
+            output = list(output)
+    finally:
+        if owns_fetcher:
+            fetcher.close()
+
+    output = [df for df in output if len(df) > 0]
+    if len(output) == 0:
+        return pd.DataFrame(columns=DEBATE_COLUMNS)
+    return pd.concat(output, ignore_index=True)
+
 #### DEBATE SPEECHES ####
 
-def scrape_one_speech(speech_block): 
+def scrape_one_speech(speech_block, speech_html="prettify"): 
     """
     Extracts information about speaker and speech content from one <div> block for speeches. 
     
     Args: 
         speech_block (bs4.element.Tag): <div> block for speech 
+        speech_html (str): How to fill in speech_html, one of `SPEECH_HTML_MODES`.
+            'prettify' (default) re-indents each paragraph, 'raw' keeps the original HTML (much cheaper),
+            None does not extract the HTML at all and returns None in its place.
     
     Returns: 
         dict: A dictionary with the following keys: 
@@ -218,8 +402,18 @@ def scrape_one_speech(speech_block):
             - speech_raw_text (str): speech content as raw text 
     """
 
+    record = __scrape_speech_record(speech_block, speech_html=speech_html)
+    return record.to_dict() if record is not None else None
+
+def __scrape_speech_record(speech_block, speech_html="prettify"):
+    """
+    Same as `scrape_one_speech`, but returns a `SpeechRecord` (or None) instead of a dictionary.
+    """
+
     if not isinstance(speech_block, bs4.element.Tag):
         raise ValueError(f"Expected a BeautifulSoup object but got {type(speech_block)}")
+    if speech_html not in SPEECH_HTML_MODES:
+        raise ValueError(f"Unknown speech_html mode {speech_html}. Expected one of: {SPEECH_HTML_MODES}")
 
     speaker_block = speech_block.find("h2", attrs={"class": "debate-speech__speaker"})
     if speaker_block: 
@@ -229,20 +423,43 @@ def scrape_one_speech(speech_block):
 
     content_block = speech_block.find("div", attrs={"debate-speech__content"})
     content = content_block.find_all("p")
-    speech_html, speech_raw_text = "", ""
-    for paragraph in content: 
-        speech_html += paragraph.prettify()
-        speech_raw_text += paragraph.text + "\n\n"
 
-    return {
-        "speech_id": speech_block.get("id"), 
-        "speaker_id": re.search(r".*p=(.*)", unparsed_speaker_id).group(1), 
-        "speaker_position": speaker_block.find("small").text,
-        "speech_html": speech_html, 
-        "speech_raw_text": speech_raw_text[:-2]
-    }
+    # Collect the fragments and join them once: repeated += on long speeches copies the string over and over
+    if speech_html == "prettify":
+        speech_html = "".join([paragraph.prettify() for paragraph in content])
+    elif speech_html == "raw":
+        speech_html = "".join([str(paragraph) for paragraph in content])
+
+    return SpeechRecord(
+        speech_id=speech_block.get("id"), 
+        speaker_id=re.search(r".*p=(.*)", unparsed_speaker_id).group(1), 
+        speaker_position=speaker_block.find("small").text,
+        speech_html=speech_html, 
+        speech_raw_text="\n\n".join([paragraph.text for paragraph in content])
+    )
 
-def get_all_speech_blocks(url): 
+def parse_speech_blocks(content, parser=DEFAULT_PARSER, only_speech_blocks=False):
+    """
+    Parses the raw HTML of a debate page and returns its <div> blocks for speeches (see `get_all_speech_blocks`).
+
+    Args:
+        content (bytes or str): The raw HTML of the debate page.
+        parser (str): The tree builder used by BeautifulSoup, one of `PARSER_BACKENDS`.
+        only_speech_blocks (bool): If True, only the <div class="debate-speech"> blocks (and what is inside them)
+            are turned into a tree; the rest of the page is skipped during parsing. This is much cheaper on large pages.
+
+    Returns:
+        speech_blocks (list of bs4.element.Tag): list of all <div> blocks for speeches
+    """
+
+    if parser not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser {parser}. Expected one of: {PARSER_BACKENDS}")
+
+    parse_only = SPEECH_BLOCKS_STRAINER if only_speech_blocks else None
+    soup = BeautifulSoup(content, parser, parse_only=parse_only)
+    return soup.find_all("div", attrs={"class": "debate-speech"})
+
+def get_all_speech_blocks(url, fetcher=None, parser=DEFAULT_PARSER, only_speech_blocks=False, metrics=None): 
     """
     Extracts all the <div> blocks for speeches within a debate containing information about the speakers and the speech content. Example: 
     
@@ -279,24 +496,358 @@ def get_all_speech_blocks(url):
     
     Args: 
         url (str): url of the debate webpage 
+        fetcher (Fetcher): fetcher used to download the page. If None, the shared module-wide fetcher is used.
+        parser (str): The tree builder used by BeautifulSoup, one of `PARSER_BACKENDS`.
+        only_speech_blocks (bool): If True, only the speech blocks are parsed. See `parse_speech_blocks`.
+        metrics (Metrics): Optional instrumentation, see `instrumentation.py`.
     
     Returns: 
         speech_blocks (list of bs4.element.Tag): list of all <div> blocks for speeches
     """
     
-    response = requests.get(url) 
-    if response.status_code == 200: 
-        soup = BeautifulSoup(response.content, "html.parser")
-        speech_blocks = soup.find_all("div", attrs={"class": "debate-speech"})
-        return speech_blocks
+    if fetcher is None:
+        fetcher = get_default_fetcher()
+    if metrics is None:
+        metrics = NULL_METRICS
+
+    content = __fetch(url, fetcher, metrics)
+    if content is not None: 
+        with metrics.span("parse"):
+            return parse_speech_blocks(content, parser=parser, only_speech_blocks=only_speech_blocks)
     return None 
 
-def get_speeches_divisions_and_votes(list_urls, tqdm=None): 
+def __new_columns(column_names):
+    return {name: [] for name in column_names}
+
+def new_debate_records():
+    """
+    Returns empty (speeches, house_divisions, votes) records, i.e. dictionaries of lists keyed by
+    `SPEECH_COLUMNS`, `HOUSE_DIVISION_COLUMNS` and `VOTE_COLUMNS`.
+    """
+    return __new_columns(SPEECH_COLUMNS), __new_columns(HOUSE_DIVISION_COLUMNS), __new_columns(VOTE_COLUMNS)
+
+def extend_debate_records(records, other_records):
+    """
+    Appends the rows of `other_records` to `records` (both as returned by `scrape_one_debate_records`).
+    """
+    for columns, other_columns in zip(records, other_records):
+        for name, values in other_columns.items():
+            columns[name].extend(values)
+    return records
+
+def debate_records_to_dataframes(records, typed=False):
+    """
+    Converts (speeches, house_divisions, votes) records into (df_speeches, df_house_division, df_votes).
+
+    If `typed` is True, the data frames are converted to the compact typed schema of `records.to_typed_schema`.
+    """
+    dataframes = tuple(pd.DataFrame(columns) for columns in records)
+    if typed:
+        dataframes = tuple(to_typed_schema(df) for df in dataframes)
+    return dataframes
+
+def scrape_one_debate_records(debate_id, speech_blocks, speech_html="prettify", records=None, metrics=None):
+    """
+    Extracts information about speeches, house divisions and votes from the speech blocks of one debate,
+    as flat columnar records rather than data frames.
+
+    Args:
+        debate_id (str): The debate ID, e.g. 2023-11-15b.633.6
+        speech_blocks (list of bs4.element.Tag): the output of `get_all_speech_blocks` for this debate.
+            None (a page that could not be downloaded) is treated as a debate without speech blocks.
+        speech_html (str): How to fill in speech_html, one of `SPEECH_HTML_MODES`. See `scrape_one_speech`.
+        records (tuple): Existing records to append to, e.g. those of previous debates in the same batch. 
+            If None, new records are created.
+        metrics (Metrics): Optional instrumentation, see `instrumentation.py`.
+
+    Returns:
+        tuple: (speeches, house_divisions, votes) dictionaries of lists, keyed by 
+            `SPEECH_COLUMNS`, `HOUSE_DIVISION_COLUMNS` and `VOTE_COLUMNS`.
+    """
+
+    if records is None:
+        records = new_debate_records()
+    if metrics is None:
+        metrics = NULL_METRICS
+    speech_columns, house_division_columns, vote_columns = records
+
+    # None when the page could not be downloaded (see `Fetcher.failures`)
+    if not speech_blocks:
+        return records
+
+    # When there is one or more house divisions in a debate, 
+    # the first speech block is an HTML list of links to the divisions.
+    # In this case, we want to collect this list of votes
+    all_house_division_ids = []
+    if __is_list_of_house_divisions(speech_blocks[0]):
+        # Collect list of all speech blocks that represent votes
+        all_house_division_ids = [vote.get("href")[1:] for vote in speech_blocks[0].find_all("a")]
+
+    """
+    HANDLE SPEECHES
+    """
+
+    with metrics.span("speeches"):
+        # Identify all speech blocks that are not votes
+        speeches = [block for block in speech_blocks 
+                    if not (block.get("id") is None or block.get("id") in all_house_division_ids)]
+        speeches = [__scrape_speech_record(speech, speech_html=speech_html) for speech in speeches]
+        # Remove None values
+        speeches = [speech for speech in speeches if speech is not None]
+
+        speech_columns["debate_id"].extend([debate_id] * len(speeches))
+        for name in SPEECH_COLUMNS[1:]:
+            speech_columns[name].extend([getattr(speech, name) for speech in speeches])
+    metrics.count("speeches", len(speeches))
+
+    """
+    HANDLE VOTES
+    """
+
+    if not all_house_division_ids:
+        return records
+
+    num_votes = len(vote_columns["mp_id"])
+    with metrics.span("divisions"):
+        # Identify all speech blocks that are votes
+        votes = {block.get("id"): block for block in speech_blocks 
+                if block.get("id") is not None and block.get("id") in all_house_division_ids}
+        for house_division_id, vote_block in votes.items():
+            vote_title = __collect_house_division(debate_id, house_division_id, vote_block, vote_columns)
+            house_division_columns["debate_id"].append(debate_id)
+            house_division_columns["house_division_id"].append(house_division_id)
+            house_division_columns["vote_title"].append(vote_title)
+    metrics.count("house_divisions", len(votes))
+    metrics.count("votes", len(vote_columns["mp_id"]) - num_votes)
+
+    return records
+
+def parse_debate_records(debate_id, content, parser=DEFAULT_PARSER, only_speech_blocks=False, speech_html="prettify"):
+    """
+    Parses the raw HTML of a debate page straight into columnar records (see `scrape_one_debate_records`).
+
+    Only plain lists of strings and booleans come out, not bs4 tags, so this is cheap to run in
+    another process and send back (see `iter_debate_records(processes=...)`).
+
+    Args:
+        debate_id (str): The debate ID, e.g. 2023-11-15b.633.6
+        content (bytes or str): The raw HTML of the debate page. None is treated as a page without speeches.
+        parser (str): The tree builder used by BeautifulSoup, one of `PARSER_BACKENDS`.
+        only_speech_blocks (bool): If True, only the speech blocks are parsed. See `parse_speech_blocks`.
+        speech_html (str): How to fill in speech_html, one of `SPEECH_HTML_MODES`. See `scrape_one_speech`.
+
+    Returns:
+        tuple: (speeches, house_divisions, votes) dictionaries of lists. See `scrape_one_debate_records`.
+    """
+
+    if content is None:
+        return new_debate_records()
+    speech_blocks = parse_speech_blocks(content, parser=parser, only_speech_blocks=only_speech_blocks)
+    return scrape_one_debate_records(debate_id, speech_blocks, speech_html=speech_html)
+
+def __parse_page(page, **kwargs):
+    """Unpacks a (debate_id, content) pair for `parse_debate_records`. Module-level so it can be pickled."""
+    return parse_debate_records(*page, **kwargs)
+
+def __count_records(records, metrics):
+    """Counts, in the parent process, what `scrape_one_debate_records` counts when it runs in this one."""
+    speech_columns, house_division_columns, vote_columns = records
+    metrics.count("speeches", len(speech_columns["speech_id"]))
+    if house_division_columns["house_division_id"]:
+        metrics.count("house_divisions", len(house_division_columns["house_division_id"]))
+        metrics.count("votes", len(vote_columns["mp_id"]))
+
+def scrape_one_debate(debate_id, speech_blocks, speech_html="prettify"):
+    """
+    Extracts information about speeches, house divisions and votes from the speech blocks of one debate.
+
+    Args:
+        debate_id (str): The debate ID, e.g. 2023-11-15b.633.6
+        speech_blocks (list of bs4.element.Tag): the output of `get_all_speech_blocks` for this debate.
+            None (a page that could not be downloaded) is treated as a debate without speech blocks.
+        speech_html (str): How to fill in speech_html, one of `SPEECH_HTML_MODES`. See `scrape_one_speech`.
+
+    Returns:
+        tuple: (df_speeches, df_house_division, df_votes) for this debate. 
+            See `get_speeches_divisions_and_votes` for the columns.
+    """
+
+    records = scrape_one_debate_records(debate_id, speech_blocks, speech_html=speech_html)
+    return debate_records_to_dataframes(records)
+
+def iter_debate_records(list_urls, tqdm=None, max_workers=1, fetcher=None, 
+                        parser=DEFAULT_PARSER, only_speech_blocks=False, speech_html="prettify", metrics=None,
+                        processes=None):
+    """
+    Streams the columnar records (see `scrape_one_debate_records`) of a list of debate webpages, one debate at a time.
+
+    Only a bounded number of debates (twice `max_workers`) are downloaded ahead of the consumer, 
+    so memory does not grow with the length of `list_urls`.
+
+    Parsing is CPU-bound, so threads alone cannot use more than one core for it. With `processes`,
+    the work is split in two stages: `max_workers` threads only download the raw pages, and a pool
+    of `processes` worker processes parses them with `parse_debate_records`. Each stage only runs
+    ahead of the next by a bounded number of pages (twice its number of workers), so a slow consumer
+    slows down the parsing, which in turn slows down the downloads.
+
+    Args: 
+        list_urls (list): list of urls of the debate webpages
+        tqdm (callable): optional progress bar, e.g. `tqdm.notebook.tqdm`
+        max_workers (int): number of debates to fetch concurrently. Defaults to 1 (sequential).
+        fetcher (Fetcher): fetcher used to download the pages. If None, one is created with 
+            a connection pool large enough for `max_workers` threads.
+        parser (str): The tree builder used by BeautifulSoup, one of `PARSER_BACKENDS`.
+        only_speech_blocks (bool): If True, only the speech blocks are parsed. See `parse_speech_blocks`.
+        speech_html (str): How to fill in speech_html, one of `SPEECH_HTML_MODES`. See `scrape_one_speech`.
+        metrics (Metrics): Optional instrumentation, see `instrumentation.py`. With `processes`, the
+            parse, speeches and divisions stages happen in other processes and are not timed.
+        processes (int): If given, the number of processes that parse the pages (see above).
+            If None (the default), pages are parsed by the threads that download them.
+
+    Yields:
+        tuple: (speeches, house_divisions, votes) records of each debate, in the order of `list_urls`.
+    """
+
+    if processes is not None and processes < 1:
+        raise ValueError(f"processes must be at least 1 but got {processes}")
+    if metrics is None:
+        metrics = NULL_METRICS
+
+    def __get_single_debate(url):
+        debate_id = re.search(r".*id=(.*)", url).group(1)
+        speech_blocks = get_all_speech_blocks(url, fetcher=fetcher, parser=parser, 
+                                              only_speech_blocks=only_speech_blocks, metrics=metrics) 
+        records = scrape_one_debate_records(debate_id, speech_blocks, speech_html=speech_html, metrics=metrics)
+        metrics.count("debates")
+        return records
+
+    def __fetch_page(url):
+        return re.search(r".*id=(.*)", url).group(1), __fetch(url, fetcher, metrics)
+
+    def __parse_in_processes(executor):
+        # Stage 1: threads download the raw pages, pulled only as fast as stage 2 takes them
+        pages = bounded_map(__fetch_page, list_urls, max_workers=max_workers)
+        # Stage 2: processes turn them into records
+        parse = functools.partial(__parse_page, parser=parser, only_speech_blocks=only_speech_blocks,
+                                  speech_html=speech_html)
+        parsed = bounded_map(parse, pages, max_in_flight=2 * processes, executor=executor)
+        try:
+            for records in parsed:
+                __count_records(records, metrics)
+                metrics.count("debates")
+                yield records
+        finally:
+            # Cancels the pages still waiting for a process, so that shutting the pool down does not wait for them
+            parsed.close()
+            pages.close()
+
+    owns_fetcher = fetcher is None
+    if owns_fetcher:
+        fetcher = Fetcher(pool_size=max(max_workers, 1))
+
+    executor = ProcessPoolExecutor(max_workers=processes) if processes is not None else None
+    output = None
+    try:
+        # Results come back in the order of list_urls, regardless of which download finishes first
+        if executor is None:
+            output = bounded_map(__get_single_debate, list_urls, max_workers=max_workers)
+        else:
+            output = __parse_in_processes(executor)
+        yield from (tqdm(output, total=len(list_urls)) if tqdm is not None else output)
+    finally:
+        if output is not None:
+            output.close()
+        if executor is not None:
+            executor.shutdown()
+        if owns_fetcher:
+            fetcher.close()
+
+def iter_speeches_divisions_and_votes(list_urls, batch_size=1, tqdm=None, max_workers=1, fetcher=None, 
+                                      parser=DEFAULT_PARSER, only_speech_blocks=False, speech_html="prettify",
+                                      typed=False, metrics=None, processes=None):
+    """
+    Streams information about speeches, house divisions and votes from a list of debate webpages, 
+    in batches of `batch_size` debates. 
+
+    Each batch can be handed to a sink (see `sinks.py`) and then discarded, so a crawl of any length
+    runs in constant memory:
+
+        stream = iter_speeches_divisions_and_votes(list_urls, batch_size=50, max_workers=8)
+        write_stream(stream, SQLSink(engine))
+
+    Args: 
+        list_urls (list): list of urls of the debate webpages
+        batch_size (int): number of debates per batch
+        tqdm (callable): optional progress bar, e.g. `tqdm.notebook.tqdm`
+        max_workers (int): number of debates to fetch concurrently. Defaults to 1 (sequential).
+        fetcher (Fetcher): fetcher used to download the pages. If None, one is created with 
+            a connection pool large enough for `max_workers` threads.
+        parser (str): The tree builder used by BeautifulSoup, one of `PARSER_BACKENDS`.
+        only_speech_blocks (bool): If True, only the speech blocks are parsed. See `parse_speech_blocks`.
+        speech_html (str): How to fill in speech_html, one of `SPEECH_HTML_MODES`. See `scrape_one_speech`.
+        typed (bool): If True, the data frames use the compact typed schema of `records.to_typed_schema`.
+        metrics (Metrics): Optional instrumentation, see `instrumentation.py`.
+        processes (int): number of processes that parse the pages. See `iter_debate_records`.
+
+    Yields:
+        tuple: (df_speeches, df_house_division, df_votes) of each batch, in the order of `list_urls`.
+            See `get_speeches_divisions_and_votes` for the columns.
+    """
+
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1 but got {batch_size}")
+
+    if metrics is None:
+        metrics = NULL_METRICS
+
+    stream = iter_debate_records(list_urls, tqdm=tqdm, max_workers=max_workers, fetcher=fetcher, parser=parser, 
+                                 only_speech_blocks=only_speech_blocks, speech_html=speech_html, metrics=metrics,
+                                 processes=processes)
+
+    records, num_debates = new_debate_records(), 0
+    for debate_records in stream:
+        extend_debate_records(records, debate_records)
+        num_debates += 1
+        if num_debates == batch_size:
+            with metrics.span("dataframe"):
+                batch = debate_records_to_dataframes(records, typed=typed)
+            yield batch
+            records, num_debates = new_debate_records(), 0
+
+    if num_debates > 0:
+        with metrics.span("dataframe"):
+            batch = debate_records_to_dataframes(records, typed=typed)
+        yield batch
+
+def get_speeches_divisions_and_votes(list_urls, tqdm=None, max_workers=1, fetcher=None, 
+                                     parser=DEFAULT_PARSER, only_speech_blocks=False, speech_html="prettify",
+                                     typed=False, metrics=None, processes=None): 
     """
     Extracts information about speeches, house divisions and votes from a list of debate webpages.
 
+    When `max_workers` is greater than 1, debates are downloaded and parsed by a pool of threads that
+    share the keep-alive connections of a single `Fetcher`. The output is always in the same order as `list_urls`.
+
+    This keeps everything in memory. For long crawls, use `iter_speeches_divisions_and_votes` instead.
+
     Args: 
         list_urls (list): list of urls of the debate webpages
+        tqdm (callable): optional progress bar, e.g. `tqdm.notebook.tqdm`
+        max_workers (int): number of debates to fetch concurrently. Defaults to 1 (sequential).
+        fetcher (Fetcher): fetcher used to download the pages. If None, one is created with 
+            a connection pool large enough for `max_workers` threads.
+        parser (str): The tree builder used by BeautifulSoup, one of `PARSER_BACKENDS`.
+        only_speech_blocks (bool): If True, only the speech blocks are parsed. See `parse_speech_blocks`.
+        speech_html (str): How to fill in speech_html, one of `SPEECH_HTML_MODES`. See `scrape_one_speech`.
+        typed (bool): If True, the data frames use the compact typed schema of `records.to_typed_schema`:
+            integer speaker_id and mp_id, the components of debate_id and categorical text columns.
+        metrics (Metrics): Optional instrumentation, see `instrumentation.py`. For example:
+
+            metrics = Metrics()
+            get_speeches_divisions_and_votes(list_urls, max_workers=8, metrics=metrics)
+            print(metrics.report())
+        processes (int): number of processes that parse the pages, so parsing uses several cores while
+            `max_workers` threads download. See `iter_debate_records`.
     
     Returns: 
         df_speeches (pd.DataFrame): Pandas df with the following columns: 
@@ -311,85 +862,28 @@ def get_speeches_divisions_and_votes(list_urls, tqdm=None):
             - house_division_id (str): The vote ID, e.g. g631.2
             - vote_title (str): The title of the vote, e.g. Rural Connectivity
         df_votes (pd.DataFrame): Pandas df with the following columns: 
-            - debate_id (str): The debate ID, e.g. b.633.6 
+            - debate_id (str): The debate ID, e.g. 2023-11-15b.633.6
             - house_division_id (str): The vote ID, e.g. g631.2
-            - vote_title (str): The title of the vote, e.g. Rural Connectivity
             - mp_id (str): The MP ID, e.g. 26020 
-            - mp_name (str): The MP name, e.g. Anum Qaisar 
-            - party (str): The MP's party, e.g. Scottish National Party
             - comment (str): The MP's comment, e.g. (proxy vote cast by...)
-            - vote (str): The MP's vote, e.g. aye
             - is_teller (bool): True if the MP is a teller, False otherwise
+            - is_vote_aye (bool): True if the MP voted aye, False otherwise
     """
 
-    def __get_single_debate(url):
-        """
+    if metrics is None:
+        metrics = NULL_METRICS
 
-        """
+    stream = iter_debate_records(list_urls, tqdm=tqdm, max_workers=max_workers, fetcher=fetcher, parser=parser, 
+                                 only_speech_blocks=only_speech_blocks, speech_html=speech_html, metrics=metrics,
+                                 processes=processes)
 
-        debate_id = re.search(r".*id=(.*)", url).group(1)
-        speech_blocks = get_all_speech_blocks(url) 
-        
-        if len(speech_blocks) == 0:
-            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-
-        # When there is one or more house divisions in a debate, 
-        # the first speech block is an HTML list of links to the divisions.
-        # In this case, we want to collect this list of votes
-        all_house_division_ids = []
-        if __is_list_of_house_divisions(speech_blocks[0]):
-            # Collect list of all speech blocks that represent votes
-            all_house_division_ids = [vote.get("href")[1:] for vote in speech_blocks[0].find_all("a")]
-            # No need to keep the first block
-            speeches = speech_blocks[1:]
-
-        """
-        HANDLE SPEECHES
-        """
+    # Merge the columnar records of all debates and build each data frame only once
+    records = new_debate_records()
+    for debate_records in stream:
+        extend_debate_records(records, debate_records)
 
-        # Identify all speech blocks that are not votes
-        speeches = [block for block in speech_blocks 
-                    if not (block.get("id") is None or block.get("id") in all_house_division_ids)]
-        speeches = [scrape_one_speech(speech) for speech in speeches]
-        # Remove None values
-        speeches = [speech for speech in speeches if speech is not None]
-        # Convert to Pandas df
-        df_speeches = pd.DataFrame(speeches)
-        df_speeches.insert(0, "debate_id", debate_id)
-
-        """
-        HANDLE VOTES
-        """
-
-        # Identify all speech blocks that are votes
-        votes = {block.get("id"): block for block in speech_blocks 
-                if block.get("id") is not None and block.get("id") in all_house_division_ids}
-        votes = [scrape_one_house_division(house_division_id, vote) 
-                for house_division_id, vote in votes.items()]
-        
-        if len(votes) > 0: 
-            df_votes = pd.concat(votes, ignore_index=True)
-            df_house_division = df_votes[['house_division_id', 'vote_title']].drop_duplicates().reset_index(drop=True)
-            df_house_division.insert(0, "debate_id", debate_id)
-            df_votes.drop(columns=['vote_title'], inplace=True)
-        else:
-            df_house_division = pd.DataFrame()
-            df_votes = pd.DataFrame()
-
-        return df_speeches, df_house_division, df_votes
-
-    # Get data frames for all debates
-    if tqdm is not None:
-        output = [__get_single_debate(url) for url in tqdm(list_urls)]
-    else:
-        output = [__get_single_debate(url) for url in list_urls]
-    df_speeches, df_house_division, df_votes = zip(*output)
-
-    df_speeches = pd.concat(df_speeches, ignore_index=True)
-    df_house_division = pd.concat(df_house_division, ignore_index=True)
-    df_votes = pd.concat(df_votes, ignore_index=True)
-
-    return df_speeches, df_house_division, df_votes
+    with metrics.span("dataframe"):
+        return debate_records_to_dataframes(records, typed=typed)
 
 #### HOUSE DIVISIONS (VOTES) ####
 
@@ -412,62 +906,57 @@ def __is_list_of_house_divisions(speech_block):
 
 def __get_mp_vote(li_element):
     """
-    TODO: Write docstring
+    Extracts the MP ID and the comment (if any) from one <li> element of a list of voters or tellers:
+
+    <li><a href="/mp/?p=25276">Lisa Cameron</a> <span>Conservative (proxy vote cast by ...)</span></li>
+
+    Note: this is a helper function for `__collect_mps_in_vote`.
 
     NOTE: I've commented out the mp_name and party because in principle, those can be extracted from the MP's table.
           I have not deleted those lines because I'm not sure if the info on the MP's table is always always trustworthy.
 
+    Args:
+        li_element (bs4.element.Tag): <li> element for one MP
+
+    Returns:
+        VoteRecord: with the mp_id and comment. Both are None if the <li> has no link to an MP.
+
     """
 
     a_element = li_element.find("a")
 
     if a_element is None:
-        return {}
-    else:
-        # mp_name = a_element.text.strip()
-        mp_id_match = re.search(r'\/mp\/\?p=(\d+)', a_element.get("href"))
-        mp_id = mp_id_match.group(1) if mp_id_match else None
+        return VoteRecord(None, None)
 
-        span_text = li_element.find('span').text.strip() if li_element.find('span') else None
-        comment_match = re.search(r'\((.*?)\)', span_text)
-        comment = comment_match.group(1) if comment_match else None
-        # party = span_text.replace(f"({comment})", '').strip() if comment else span_text.strip()
+    # mp_name = a_element.text.strip()
+    mp_id_match = MP_ID_PATTERN.search(a_element.get("href"))
+    mp_id = mp_id_match.group(1) if mp_id_match else None
 
-        return {
-            'mp_id': mp_id,
-            # 'mp_name': mp_name, # As it appears in the list
-            # 'party': party,
-            'comment': comment
-        }
+    span_element = li_element.find('span')
+    if span_element is None:
+        return VoteRecord(mp_id, None)
 
-def __get_votes_as_df(ul_element, is_teller=False):
-    """
-    TODO: Write docstring
-    """
-    # This is a list of voters
-    list_voters = [__get_mp_vote(li) for li in ul_element.find_all("li")]
-    df_voters_or_tellers = pd.DataFrame(list_voters)
-    df_voters_or_tellers['is_teller'] = is_teller
-    return df_voters_or_tellers
+    comment_match = COMMENT_PATTERN.search(span_element.text.strip())
+    comment = comment_match.group(1) if comment_match else None
+    # party = span_text.replace(f"({comment})", '').strip() if comment else span_text.strip()
+
+    return VoteRecord(mp_id, comment)
 
-def __get_mps_in_vote(div_votes):
+def __collect_mps_in_vote(debate_id, house_division_id, div_votes, columns):
     """
-    Extracts information about MPs who voted in a division.
+    Extracts information about MPs who voted in a division and appends it to `columns`.
+
+    Rows are appended to flat lists rather than turned into a DataFrame here: a division has 
+    hundreds of MPs spread over several <ul> elements, and a debate can have several divisions,
+    so the DataFrame is only built once all of them have been collected.
 
     Note: this is a helper function for `scrape_one_house_division`.
 
     Args:
+        debate_id (str): The debate ID, e.g. 2023-11-15b.633.6
+        house_division_id (str): The ID of the House Division block, e.g. g631.2
         div_votes (bs4.element.Tag): <div> block for votes (the ones right below the dots)
-    
-    Returns:
-        pd.DataFrame: A Pandas df with following columns: 
-            - mp_id (str): The MP ID, e.g. 26020 
-            - mp_name (str): The MP name, e.g. Anum Qaisar 
-            - party (str): The MP's party, e.g. Scottish National Party
-            - comment (str): The MP's comment, e.g. (proxy vote cast by...)
-            - is_vote_aye (str): True if the MP voted aye, False otherwise
-            - is_teller (bool): True if the MP is a teller, False otherwise
-
+        columns (dict): dictionary of lists, keyed by the names in `VOTE_COLUMNS`
     """
         
     is_vote_aye = div_votes.find("h3").text.split(":")[0].lower() == "aye"
@@ -476,15 +965,30 @@ def __get_mps_in_vote(div_votes):
     # What differentiates them is the class attribute
     # Voters have class=["division-names" "js-accordion"]
     # Tellers have class=["division-names"]
-    ul_elements = div_votes.find_all("ul", attrs={"class": "division-names"})
+    for ul_element in div_votes.find_all("ul", attrs={"class": "division-names"}):
+        is_teller = ul_element.get("class") == ["division-names"]
+        mp_votes = [__get_mp_vote(li) for li in ul_element.find_all("li")]
+        num_votes = len(mp_votes)
+
+        columns["debate_id"].extend([debate_id] * num_votes)
+        columns["house_division_id"].extend([house_division_id] * num_votes)
+        columns["mp_id"].extend([vote.mp_id for vote in mp_votes])
+        columns["comment"].extend([vote.comment for vote in mp_votes])
+        columns["is_teller"].extend([is_teller] * num_votes)
+        columns["is_vote_aye"].extend([is_vote_aye] * num_votes)
+
+def __collect_house_division(debate_id, house_division_id, vote_block, columns):
+    """
+    Appends the votes of a division to `columns` (see `__collect_mps_in_vote`) and returns its title.
+    """
+
+    vote_title = vote_block.find("h2").find("strong").text.strip()
 
-    # Get voters and tellers for this house division
-    voters  = [__get_votes_as_df(ul, ul.get("class") == ["division-names"]) 
-               for ul in ul_elements]
-    df_voters_and_tellers = pd.concat(voters)
-    df_voters_and_tellers['is_vote_aye'] = is_vote_aye
+    divs_with_votes_class = 'division-section__vote division-section__vote__names'
+    for div in vote_block.find_all('div', class_=divs_with_votes_class):
+        __collect_mps_in_vote(debate_id, house_division_id, div, columns)
 
-    return df_voters_and_tellers
+    return vote_title
 
 def scrape_one_house_division(house_division_id, vote_block):
     """
@@ -499,21 +1003,16 @@ def scrape_one_house_division(house_division_id, vote_block):
             - house_division_id (str): The vote ID, e.g. g631.2
             - vote_title (str): The title of the vote, e.g. Rural Connectivity
             - mp_id (str): The MP ID, e.g. 26020 
-            - mp_name (str): The MP name, e.g. Anum Qaisar 
-            - party (str): The MP's party, e.g. Scottish National Party
             - comment (str): The MP's comment, e.g. (proxy vote cast by...)
-            - vote (str): The MP's vote, e.g. aye
             - is_teller (bool): True if the MP is a teller, False otherwise
+            - is_vote_aye (bool): True if the MP voted aye, False otherwise
     """
 
-    vote_title = vote_block.find("h2").find("strong").text.strip()
-
-    divs_with_votes_class = 'division-section__vote division-section__vote__names'
-    divs_with_votes = vote_block.find_all('div', class_=divs_with_votes_class)
+    columns = __new_columns(VOTE_COLUMNS)
+    vote_title = __collect_house_division(None, house_division_id, vote_block, columns)
+    del columns["debate_id"]
 
-    df_votes = pd.concat([__get_mps_in_vote(div) for div in divs_with_votes], ignore_index=True)
-    df_votes.insert(0, 'vote_title', vote_title)
-    df_votes.insert(0, 'house_division_id', house_division_id)
+    df_votes = pd.DataFrame(columns)
+    df_votes.insert(1, 'vote_title', vote_title)
 
     return df_votes
-
@@ -1,8 +1,9 @@
 from bs4 import BeautifulSoup
 
-from IPython.display import display, HTML
-
 def show_HTML(web_element):
+    # Only available in notebooks: keep IPython out of the scripts that import this module
+    from IPython.display import display, HTML
+
     if isinstance(web_element, str):
         return display(HTML(web_element))
     else:
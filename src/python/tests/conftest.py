@@ -0,0 +1,55 @@
+import hashlib
+
+import pytest
+import requests
+
+from discordia.benchmarks.suite import load_fixtures
+from discordia.webscraping.fetching import Fetcher
+from discordia.webscraping.scheduler import FetchScheduler
+
+
+class FakeSession(requests.Session):
+    """A website in memory: serves `pages` (URL -> bytes) with an ETag, 304 when it still matches and 404 otherwise.
+
+    Every request is appended to `requests` as (url, headers).
+    """
+
+    def __init__(self, pages=None):
+        super().__init__()
+        self.pages = dict(pages or {})
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        headers = headers or {}
+        self.requests.append((url, headers))
+        response = requests.Response()
+        response.url = url
+        if url not in self.pages:
+            response.status_code = 404
+            response._content = b""
+            return response
+
+        etag = '"' + hashlib.sha1(self.pages[url]).hexdigest() + '"'
+        response.headers["ETag"] = etag
+        if headers.get("If-None-Match") == etag:
+            response.status_code = 304
+            response._content = b""
+        else:
+            response.status_code = 200
+            response._content = self.pages[url]
+        return response
+
+
+@pytest.fixture
+def fixtures():
+    """The checked-in pages, keyed by file name, e.g. 'day_listing'."""
+    return load_fixtures()
+
+
+@pytest.fixture
+def make_fetcher():
+    """Builds a `Fetcher` over a `FakeSession` of `pages`, without rate limits or retries."""
+    def make(pages=None, cache=None):
+        scheduler = FetchScheduler(rate=None, max_retries=0)
+        return Fetcher(session=FakeSession(pages), cache=cache, scheduler=scheduler)
+    return make
@@ -0,0 +1,60 @@
+import time
+
+from discordia.webscraping.cache import ResponseCache
+
+URL = "https://www.theyworkforyou.com/debates/?d=2023-11-14"
+
+
+def age(cache, seconds):
+    cache._conn.execute("UPDATE urls SET fetched_at = ?", (time.time() - seconds,))
+    cache._conn.commit()
+
+
+def test_cached_pages_are_reused_without_max_age(tmp_path, make_fetcher):
+    cache = ResponseCache(str(tmp_path))
+    fetcher = make_fetcher({URL: b"listing"}, cache=cache)
+    assert fetcher.get(URL) == b"listing"
+
+    fetcher.session.pages[URL] = b"new listing"
+    age(cache, 10 * 24 * 3600)
+    assert fetcher.get(URL) == b"listing"
+    assert len(fetcher.session.requests) == 1
+
+
+def test_pages_older_than_max_age_are_revalidated(tmp_path, make_fetcher):
+    cache = ResponseCache(str(tmp_path), max_age=3600)
+    fetcher = make_fetcher({URL: b"empty listing"}, cache=cache)
+    fetcher.get(URL)
+
+    # Fresh: served from the cache
+    fetcher.session.pages[URL] = b"published listing"
+    assert fetcher.get(URL) == b"empty listing"
+    assert len(fetcher.session.requests) == 1
+
+    # Stale: downloaded again, with the validator of the cached page
+    age(cache, 7200)
+    assert fetcher.get(URL) == b"published listing"
+    assert "If-None-Match" in fetcher.session.requests[-1][1]
+
+    # A per-call max_age overrides the one of the cache, and a 304 keeps the cached page
+    age(cache, 60)
+    assert fetcher.get(URL, max_age=0) == b"published listing"
+    assert len(fetcher.session.requests) == 3
+    assert time.time() - cache.get(URL).fetched_at < 30
+
+
+def test_offline_misses_are_failures(tmp_path, make_fetcher):
+    fetcher = make_fetcher(cache=ResponseCache(str(tmp_path), offline=True))
+    assert fetcher.get(URL) is None
+    assert fetcher.failed_urls() == {URL}
+    assert fetcher.failure_report()["error"].tolist() == ["offline: not cached"]
+    assert fetcher.session.requests == []
+
+
+def test_least_recently_used_pages_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_size=150, compress=False)
+    cache.put("a", b"a" * 100)
+    cache.put("b", b"b" * 100)
+    assert cache.get("a") is None
+    assert cache.get("b").content == b"b" * 100
+    assert cache.size() == 100
@@ -0,0 +1,38 @@
+import os
+
+import pandas as pd
+import pytest
+
+from discordia import storage
+from discordia.benchmarks.suite import FixtureFetcher, FIXTURE_URL, FIXTURE_DEBATES
+from discordia.cli import main
+from discordia.webscraping import twfy
+
+
+@pytest.fixture
+def database(tmp_path, fixtures):
+    pages = {FIXTURE_URL.format(debate_id=debate_id): fixtures[name] for name, debate_id in FIXTURE_DEBATES.items()}
+    path = str(tmp_path / "discordia.db")
+    conn = storage.connect(path)
+    storage.write_batch(conn, *twfy.get_speeches_divisions_and_votes(list(pages), fetcher=FixtureFetcher(pages)))
+    conn.close()
+    return path
+
+
+def test_search_closes_the_database(tmp_path, database):
+    out = str(tmp_path / "results.csv")
+    assert main(["analyze", "search", "minister", "--db", database, "--out", out]) == 0
+    assert len(pd.read_csv(out)) > 0
+    # The last connection to close checkpoints the WAL and removes it
+    assert not os.path.exists(database + "-wal")
+
+
+def test_failing_command_closes_the_database(database, monkeypatch):
+    def interrupted(conn, *args, **kwargs):
+        conn.execute("SELECT COUNT(*) FROM speeches").fetchone()
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr("discordia.search.search_speeches", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        main(["analyze", "search", "minister", "--db", database])
+    assert not os.path.exists(database + "-wal")
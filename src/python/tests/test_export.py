@@ -0,0 +1,29 @@
+import pytest
+
+from discordia import storage
+from discordia.benchmarks.suite import FixtureFetcher, FIXTURE_URL, FIXTURE_DEBATES
+from discordia.export import export_parquet, read_parquet
+from discordia.webscraping import twfy
+
+pytest.importorskip("pyarrow")
+
+
+def test_export_round_trip(tmp_path, fixtures):
+    pages = {FIXTURE_URL.format(debate_id=debate_id): fixtures[name] for name, debate_id in FIXTURE_DEBATES.items()}
+    df_speeches, df_house_division, df_votes = twfy.get_speeches_divisions_and_votes(list(pages), fetcher=FixtureFetcher(pages))
+    conn = storage.connect(":memory:")
+    storage.write_batch(conn, df_speeches, df_house_division, df_votes)
+    directory = str(tmp_path / "parquet")
+
+    counts = export_parquet(conn, directory)
+    assert counts["speeches"] == len(df_speeches)
+    assert counts["votes"] == conn.execute("SELECT COUNT(*) FROM votes").fetchone()[0]
+
+    df = read_parquet(directory, "votes", columns=["mp_id", "is_vote_aye", "sitting_date", "house"])
+    assert len(df) == counts["votes"]
+    assert df["is_vote_aye"].dtype == bool
+    assert set(df["sitting_date"]) == {debate_id[:10] for debate_id in df_votes["debate_id"]}
+
+    # Filters on the partitions
+    assert len(read_parquet(directory, "speeches", start_date="2030-01-01")) == 0
+    assert len(read_parquet(directory, "speeches", house="b")) == len(df_speeches)
@@ -0,0 +1,92 @@
+import time
+import warnings
+from datetime import datetime
+
+import pytest
+
+from discordia import storage
+from discordia.webscraping import twfy
+from discordia.webscraping.cache import ResponseCache
+from discordia.webscraping.jobs import CrawlJob
+
+DAY = datetime(2023, 11, 15)
+DAY_URL = twfy.build_url(DAY)
+EMPTY_LISTING = b"<html><body><ul class='business-list'></ul></body></html>"
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    # The day listing has sections without debates, which the scraper warns about
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+
+@pytest.fixture
+def website(fixtures, make_fetcher):
+    """The day listing and, for each of its debates, the speech-heavy fixture page."""
+    fetcher = make_fetcher({DAY_URL: fixtures["day_listing"]})
+    df_debates = twfy.scrape_debate_sections_static(DAY_URL, fetcher=fetcher)
+    return {DAY_URL: fixtures["day_listing"],
+            **{url: fixtures["speech_heavy_debate"] for url in df_debates["url"]}}, df_debates
+
+
+def new_job(tmp_path, fetcher):
+    return CrawlJob(storage.connect(str(tmp_path / "discordia.db")), str(tmp_path / "checkpoint.json"),
+                    max_workers=1, fetcher=fetcher)
+
+
+def test_crawls_a_day_once(tmp_path, website, make_fetcher):
+    pages, df_debates = website
+    job = new_job(tmp_path, make_fetcher(pages))
+    assert job.run(DAY, DAY) == len(df_debates)
+    assert job.checkpoint["days_done"] == ["2023-11-15"]
+    assert job.checkpoint["debates_done"] == []
+
+    # A new job over the same database and checkpoint does not fetch anything
+    job = new_job(tmp_path, make_fetcher(pages))
+    assert job.run(DAY, DAY) == 0
+    assert job.fetcher.session.requests == []
+
+
+def test_failed_debates_leave_the_day_pending(tmp_path, website, make_fetcher):
+    pages, df_debates = website
+    missing_url = df_debates["url"].iloc[0]
+    job = new_job(tmp_path, make_fetcher({url: page for url, page in pages.items() if url != missing_url}))
+
+    assert job.run(DAY, DAY) == len(df_debates) - 1
+    assert job.fetcher.failed_urls() == {missing_url}
+    assert job.checkpoint["days_done"] == []
+
+    # Only the missing debate is fetched on the next run
+    job = new_job(tmp_path, make_fetcher(pages))
+    assert job.run(DAY, DAY) == 1
+    assert {url for url, _ in job.fetcher.session.requests} == {DAY_URL, missing_url}
+    assert job.checkpoint["days_done"] == ["2023-11-15"]
+
+
+def test_listed_but_not_crawled_debates_are_crawled(tmp_path, website, make_fetcher):
+    pages, df_debates = website
+    job = new_job(tmp_path, make_fetcher(pages))
+    # As `discordia crawl index --db` does
+    storage.write_debates(job.conn, df_debates)
+
+    assert job.run(DAY, DAY) == len(df_debates)
+    assert job.conn.execute("SELECT COUNT(DISTINCT debate_id) FROM speeches").fetchone()[0] == len(df_debates)
+
+
+def test_empty_listing_is_checked_again_the_next_night(tmp_path, website, make_fetcher):
+    pages, df_debates = website
+    cache = ResponseCache(str(tmp_path / "cache"))
+
+    # Night 1: the Hansard of the day is not published yet
+    job = new_job(tmp_path, make_fetcher({DAY_URL: EMPTY_LISTING}, cache=cache))
+    assert job.run(DAY, DAY) == 0
+    assert job.checkpoint["days_done"] == []
+
+    # Night 2: the cached empty listing is too old to be trusted
+    cache._conn.execute("UPDATE urls SET fetched_at = ?", (time.time() - 24 * 3600,))
+    cache._conn.commit()
+    job = new_job(tmp_path, make_fetcher(pages, cache=cache))
+    assert job.run(DAY, DAY) == len(df_debates)
+    assert job.checkpoint["days_done"] == ["2023-11-15"]
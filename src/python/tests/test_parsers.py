@@ -0,0 +1,23 @@
+import pytest
+
+from discordia.benchmarks.parsers import check_parser_parity
+from discordia.benchmarks.suite import FIXTURE_DEBATES
+from discordia.benchmarks.synthetic import synthetic_debate_page
+
+
+@pytest.fixture
+def pages(fixtures):
+    """The checked-in debate pages and a synthetic one with speeches and divisions, keyed by debate ID."""
+    pages = {debate_id: fixtures[name] for name, debate_id in FIXTURE_DEBATES.items()}
+    pages["2023-11-15b.1.0"] = synthetic_debate_page(num_speeches=50, num_divisions=2, mps_per_division=50).encode("utf-8")
+    return pages
+
+
+def test_html_parser_with_only_speech_blocks_matches_the_default(pages):
+    # Compares html.parser, with and without only_speech_blocks, with the default parser
+    check_parser_parity(pages, parsers=["html.parser"])
+
+
+def test_lxml_matches_the_default(pages):
+    pytest.importorskip("lxml")
+    check_parser_parity(pages, parsers=["lxml"])
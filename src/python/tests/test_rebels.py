@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from discordia import storage
+from discordia.analysis.rebels import rebel_flags, rebels_per_house_division
+from discordia.analysis.vote_matrix import VoteMatrix
+
+DEBATE_ID = "2023-11-15b.100.0"
+
+# Party A splits 2-1 (one rebel), party B votes as a block, party C splits 1-1 (both count as rebels)
+VOTES = [
+    ("mp-1", "A", False, True),
+    ("mp-2", "A", True, True),  # teller, counted on their side
+    ("mp-3", "A", False, False),
+    ("mp-4", "B", False, False),
+    ("mp-5", "B", False, False),
+    ("mp-6", "C", False, True),
+    ("mp-7", "C", False, False),
+]
+
+
+@pytest.fixture
+def conn():
+    conn = storage.connect(":memory:")
+    df_speeches = pd.DataFrame(columns=storage.TABLES["speeches"])
+    df_house_division = pd.DataFrame([(DEBATE_ID, "division-1", "A division")], columns=storage.TABLES["house_divisions"])
+    df_votes = pd.DataFrame([(DEBATE_ID, "division-1", mp_id, None, is_teller, is_vote_aye)
+                             for mp_id, _, is_teller, is_vote_aye in VOTES], columns=storage.TABLES["votes"])
+    storage.write_batch(conn, df_speeches, df_house_division, df_votes)
+
+    # The mp table comes from the notebooks, so party lines are only computed once it is loaded
+    conn.execute("CREATE TABLE mp (mp_id TEXT, term_start INTEGER, party TEXT)")
+    conn.executemany("INSERT INTO mp VALUES (?, 2017, ?)", [(mp_id, party) for mp_id, party, _, _ in VOTES])
+    storage.refresh_party_lines(conn)
+    yield conn
+    conn.close()
+
+
+def test_rebel_flags(conn):
+    df = rebel_flags(conn).set_index("mp_id")
+    rebels = set(df.index[df["voted_against_party"].astype(bool)])
+    assert rebels == {"mp-3", "mp-6", "mp-7"}
+
+
+def test_rebels_per_house_division(conn):
+    df = rebels_per_house_division(conn).set_index("party")
+    assert df["num_MP_votes_against_majority"].to_dict() == {"A": 1, "B": 0, "C": 2}
+
+
+def test_vote_matrix_agrees_with_party_lines(conn):
+    keys = ["party", "debate_id", "house_division_id"]
+    expected = rebels_per_house_division(conn).sort_values(keys, ignore_index=True)
+    actual = VoteMatrix.from_database(conn).rebel_counts().sort_values(keys, ignore_index=True)
+    assert actual[keys].equals(expected[keys])
+    assert actual["num_MP_votes_against_majority"].tolist() == expected["num_MP_votes_against_majority"].tolist()
+
+
+def test_write_batch_refreshes_party_lines(conn):
+    # mp-1 and mp-2 switch to no, so party A votes as a block
+    df_votes = pd.DataFrame([(DEBATE_ID, "division-1", mp_id, None, is_teller, mp_id not in {"mp-1", "mp-2"} and is_vote_aye)
+                             for mp_id, _, is_teller, is_vote_aye in VOTES], columns=storage.TABLES["votes"])
+    df_house_division = pd.DataFrame([(DEBATE_ID, "division-1", "A division")], columns=storage.TABLES["house_divisions"])
+    storage.write_batch(conn, pd.DataFrame(columns=storage.TABLES["speeches"]), df_house_division, df_votes)
+
+    df = rebels_per_house_division(conn).set_index("party")
+    assert df["num_MP_votes_against_majority"].to_dict() == {"A": 0, "B": 0, "C": 2}
@@ -0,0 +1,93 @@
+import time
+
+import requests
+
+from discordia.webscraping.fetching import Fetcher
+from discordia.webscraping.scheduler import AdaptiveConcurrency, FetchScheduler, TokenBucket
+
+URL = "https://www.theyworkforyou.com/debates/?id=2023-11-15b.633.6"
+
+
+class ScriptedSession(requests.Session):
+    """Replies to each GET with the next item of `script`: a status code, or an exception to raise."""
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+        self.num_requests = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.num_requests += 1
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        status_code, headers = step if isinstance(step, tuple) else (step, {})
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers.update(headers)
+        response._content = b"page" if status_code == 200 else b""
+        return response
+
+
+def fetcher(script, max_retries=3):
+    scheduler = FetchScheduler(rate=None, max_retries=max_retries, backoff=0.001)
+    return Fetcher(session=ScriptedSession(script), scheduler=scheduler)
+
+
+def test_transient_errors_are_retried():
+    f = fetcher([503, requests.exceptions.ChunkedEncodingError("cut"), requests.Timeout("slow"), 200])
+    assert f.get(URL) == b"page"
+    assert f.session.num_requests == 4
+    assert f.failed_urls() == set()
+
+
+def test_failures_are_reported_after_the_retries():
+    f = fetcher([503] * 3, max_retries=2)
+    assert f.get(URL) is None
+    df = f.failure_report()
+    assert df.to_dict("records") == [{"url": URL, "status_code": 503, "error": "HTTP 503", "attempts": 3}]
+
+    # A later success clears the failure
+    f.session.script = [200]
+    assert f.get(URL) == b"page"
+    assert len(f.failure_report()) == 0
+
+
+def test_permanent_errors_are_not_retried():
+    f = fetcher([404, requests.TooManyRedirects("loop")])
+    assert f.get(URL) is None
+    assert f.get(URL + "0") is None
+    assert f.session.num_requests == 2
+    assert f.failure_report()["error"].tolist() == ["HTTP 404", "TooManyRedirects: loop"]
+
+
+def test_retry_after_is_honoured():
+    scheduler = FetchScheduler(rate=None, max_backoff=0.5)
+    response = requests.Response()
+    response.headers["Retry-After"] = "120"
+    assert scheduler.delay(0, response) == 0.5
+    response.headers["Retry-After"] = "0"
+    assert scheduler.delay(3, response) == 0
+
+
+def test_concurrency_halves_on_errors_and_grows_back():
+    concurrency = AdaptiveConcurrency(initial=8, maximum=8, cooldown=60)
+    for _ in range(2):
+        concurrency.acquire()
+    concurrency.release(healthy=False)
+    concurrency.release(healthy=False)
+    # Only halved once within the cooldown
+    assert concurrency.limit == 4
+
+    for _ in range(20):
+        concurrency.acquire()
+        concurrency.release(healthy=True)
+    assert 4 < concurrency.limit <= 8
+
+
+def test_token_bucket_limits_the_rate():
+    bucket = TokenBucket(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
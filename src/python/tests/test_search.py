@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from discordia import storage
+from discordia.search import count_speeches, phrase, search_speeches
+
+SPEECHES = [
+    ("2023-11-14b.100.0", "2023-11-14b.100.1", "10001", "Rural broadband is still far too slow."),
+    ("2023-11-14b.100.0", "2023-11-14b.100.2", "10002", "The cost of living is rising."),
+    ("2023-11-15a.200.0", "2023-11-15a.200.1", "10001", "Broadband in rural areas, broadband in towns."),
+    ("2023-11-15b.300.0", "2023-11-15b.300.1", "10003", "Members were voting on the living wage."),
+]
+
+
+def speeches(rows):
+    return pd.DataFrame([(debate_id, speech_id, speaker_id, None, f"<p>{text}</p>", text)
+                         for debate_id, speech_id, speaker_id, text in rows], columns=storage.TABLES["speeches"])
+
+
+def write(conn, rows):
+    empty = {table: pd.DataFrame(columns=storage.TABLES[table]) for table in ["house_divisions", "votes"]}
+    storage.write_batch(conn, speeches(rows), empty["house_divisions"], empty["votes"])
+
+
+@pytest.fixture
+def conn():
+    conn = storage.connect(":memory:")
+    write(conn, SPEECHES)
+    yield conn
+    conn.close()
+
+
+def test_search_ranks_and_highlights(conn):
+    df = search_speeches(conn, "broadband")
+    # The speech that mentions broadband twice ranks first
+    assert df["speech_id"].tolist() == ["2023-11-15a.200.1", "2023-11-14b.100.1"]
+    assert df["score"].is_monotonic_decreasing
+    assert "[Broadband]" in df["snippet"].iloc[0]
+
+
+def test_search_filters(conn):
+    assert search_speeches(conn, "broadband", house="b")["speech_id"].tolist() == ["2023-11-14b.100.1"]
+    assert search_speeches(conn, "broadband", start_date="2023-11-15")["speech_id"].tolist() == ["2023-11-15a.200.1"]
+    assert search_speeches(conn, "broadband", end_date="2023-11-14")["speech_id"].tolist() == ["2023-11-14b.100.1"]
+    assert search_speeches(conn, "living", speaker_ids=[10003])["speech_id"].tolist() == ["2023-11-15b.300.1"]
+    assert len(search_speeches(conn, "broadband", limit=1)) == 1
+    assert count_speeches(conn, "living") == 2
+
+
+def test_phrase_and_stemming(conn):
+    assert search_speeches(conn, phrase("cost of living"))["speech_id"].tolist() == ["2023-11-14b.100.2"]
+    assert search_speeches(conn, "votes")["speech_id"].tolist() == ["2023-11-15b.300.1"]
+
+
+def test_index_follows_revisions(conn):
+    # One speech of 2023-11-14b.100.0 is revised and the other one is no longer in the debate
+    revised = [row[:3] + ("Broadband has nothing to do with this speech any more.",) if row[1] == "2023-11-14b.100.2" else row
+               for row in SPEECHES if row[1] != "2023-11-14b.100.1"]
+    write(conn, revised)
+
+    assert set(search_speeches(conn, "broadband")["speech_id"]) == {"2023-11-14b.100.2", "2023-11-15a.200.1"}
+    assert count_speeches(conn, phrase("cost of living")) == 0
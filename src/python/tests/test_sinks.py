@@ -0,0 +1,41 @@
+import pandas as pd
+
+from discordia import storage
+from discordia.benchmarks.suite import FixtureFetcher, FIXTURE_URL, FIXTURE_DEBATES
+from discordia.webscraping import twfy
+from discordia.webscraping.instrumentation import Metrics
+from discordia.webscraping.sinks import CSVSink, write_stream
+
+
+def fixture_pages(fixtures):
+    return {FIXTURE_URL.format(debate_id=debate_id): fixtures[name] for name, debate_id in FIXTURE_DEBATES.items()}
+
+
+def test_csv_sink_matches_the_whole_crawl(tmp_path, fixtures):
+    pages = fixture_pages(fixtures)
+    fetcher = FixtureFetcher(pages)
+    expected = twfy.get_speeches_divisions_and_votes(list(pages), fetcher=fetcher)
+
+    metrics = Metrics()
+    stream = twfy.iter_speeches_divisions_and_votes(list(pages), batch_size=1, fetcher=fetcher)
+    num_rows = write_stream(stream, CSVSink(str(tmp_path)), metrics=metrics)
+
+    assert num_rows == {"speeches": len(expected[0]), "house_divisions": len(expected[1]), "votes": len(expected[2])}
+    assert metrics.counters["rows_votes"] == len(expected[2])
+    df_speeches = pd.read_csv(tmp_path / "speeches.csv", dtype=str)
+    assert list(df_speeches["speech_id"]) == list(expected[0]["speech_id"])
+
+
+def test_sqlite_sink_is_idempotent(fixtures):
+    pages = fixture_pages(fixtures)
+    fetcher = FixtureFetcher(pages)
+    conn = storage.connect(":memory:")
+
+    for _ in range(2):
+        stream = twfy.iter_speeches_divisions_and_votes(list(pages), batch_size=1, fetcher=fetcher)
+        write_stream(stream, storage.SQLiteSink(conn))
+
+    df_speeches, df_house_division, _ = twfy.get_speeches_divisions_and_votes(list(pages), fetcher=fetcher)
+    assert conn.execute("SELECT COUNT(*) FROM speeches").fetchone()[0] == len(df_speeches)
+    assert conn.execute("SELECT COUNT(*) FROM house_divisions").fetchone()[0] == len(df_house_division)
+    assert conn.execute("SELECT COUNT(*) FROM revisions").fetchone()[0] == 0
@@ -0,0 +1,67 @@
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from discordia.webscraping.cache import ResponseCache
+from discordia.webscraping.sitting_days import SittingDayIndex
+
+LISTING_URL = "https://www.theyworkforyou.com/debates/?d=2023-11-15"
+
+
+def listing(*days):
+    return "".join(f'<a href="/debates/?d={day}">{day}</a>' for day in days).encode("ascii")
+
+
+def test_learns_the_month_from_a_listing(fixtures):
+    index = SittingDayIndex()
+    days = index.learn_from_page(LISTING_URL, fixtures["day_listing"], read_at=datetime(2023, 12, 5))
+
+    assert "2023-11-15" in days
+    assert not index.is_stale("2023-11")
+    assert index.is_sitting_day(datetime(2023, 11, 15)) is True
+    assert index.is_sitting_day(datetime(2023, 11, 18)) is False
+    assert index.is_sitting_day(datetime(2023, 12, 1)) is None
+    assert set(index.sitting_days(datetime(2023, 11, 1), datetime(2023, 11, 30)).strftime("%Y-%m-%d")) <= days
+
+
+def test_navigation_links_alone_do_not_mark_the_month():
+    index = SittingDayIndex()
+    index.learn_from_page(LISTING_URL, listing("2023-10-26", "2023-12-04"), read_at=datetime(2023, 12, 5))
+
+    assert "2023-11" not in index.months
+    assert len(index.sitting_days(datetime(2023, 11, 1), datetime(2023, 11, 30))) == 30
+
+
+def test_days_after_the_last_read_are_kept():
+    index = SittingDayIndex()
+    index.learn_from_page("https://www.theyworkforyou.com/debates/?d=2026-10-06", listing("2026-10-05", "2026-10-06"),
+                          read_at=datetime(2026, 10, 7, 12))
+
+    days = index.sitting_days(datetime(2026, 10, 1), datetime(2026, 10, 17))
+    expected = pd.date_range("2026-10-05", "2026-10-17")
+    assert list(days) == list(expected)
+    assert index.is_sitting_day(datetime(2026, 10, 14)) is None
+
+
+def test_refresh_checks_stale_cached_listings(tmp_path, make_fetcher):
+    index = SittingDayIndex(str(tmp_path / "sitting_days.json"))
+    url = "https://www.theyworkforyou.com/debates/?d=2023-11-01"
+
+    # Cached while November was under way, with only its first sitting days
+    cache = ResponseCache(str(tmp_path / "cache"))
+    cache.put(url, listing("2023-11-06", "2023-11-07"))
+    cache._conn.execute("UPDATE urls SET fetched_at = ?", (datetime(2023, 11, 8).timestamp(),))
+    cache._conn.commit()
+
+    fetcher = make_fetcher({url: listing("2023-11-06", "2023-11-07", "2023-11-20")}, cache=cache)
+    assert index.refresh(datetime(2023, 11, 1), datetime(2023, 11, 30), fetcher=fetcher) == 1
+    assert [request_url for request_url, _ in fetcher.session.requests] == [url]
+    assert "2023-11-20" in index.days
+    assert time.time() - index.months["2023-11"].timestamp() < 60
+
+    # Saved, and fresh: nothing is downloaded again
+    index = SittingDayIndex(str(tmp_path / "sitting_days.json"))
+    assert index.stale_months(datetime(2023, 11, 1), datetime(2023, 11, 30)) == []
+    assert index.refresh(datetime(2023, 11, 1), datetime(2023, 11, 30), fetcher=fetcher) == 0
+    assert len(fetcher.session.requests) == 1
@@ -0,0 +1,91 @@
+import json
+import sqlite3
+
+import pytest
+
+from discordia import storage
+from discordia.benchmarks.suite import FixtureFetcher, FIXTURE_URL, FIXTURE_DEBATES
+from discordia.webscraping import twfy
+
+
+def legacy_database(path):
+    """A database as created by NB01: untyped tables without keys, and votes without a debate_id."""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE house_divisions (debate_id VARCHAR, house_division_id VARCHAR, vote_title VARCHAR)")
+    conn.execute("CREATE TABLE votes (house_division_id VARCHAR, mp_id VARCHAR, comment VARCHAR, "
+                 "is_teller VARCHAR, is_vote_aye VARCHAR)")
+    conn.executemany("INSERT INTO house_divisions VALUES (?, ?, ?)", [
+        ("2023-11-14a.100.0", "division-1", "Unique division"),
+        # The same house division ID in two debates
+        ("2023-11-14a.200.0", "division-2", "Repeated division"),
+        ("2023-11-15a.300.0", "division-2", "Repeated division"),
+    ])
+    conn.executemany("INSERT INTO votes VALUES (?, ?, ?, ?, ?)", [
+        ("division-1", "mp-1", None, 0, 1),
+        ("division-1", "mp-2", None, 0, 0),
+        ("division-2", "mp-1", None, 0, 1),
+        ("division-2", "mp-3", None, 0, 0),
+    ])
+    conn.commit()
+    conn.close()
+
+
+def test_migration_drops_votes_of_repeated_house_divisions(tmp_path):
+    path = str(tmp_path / "discordia.db")
+    legacy_database(path)
+
+    with pytest.warns(UserWarning, match="Dropped 2 legacy votes .*division-2"):
+        conn = storage.connect(path)
+
+    votes = conn.execute("SELECT debate_id, house_division_id, mp_id FROM votes ORDER BY mp_id").fetchall()
+    assert votes == [("2023-11-14a.100.0", "division-1", "mp-1"), ("2023-11-14a.100.0", "division-1", "mp-2")]
+    assert conn.execute("SELECT COUNT(*) FROM house_divisions").fetchone()[0] == 3
+
+
+@pytest.fixture
+def crawl(fixtures):
+    pages = {FIXTURE_URL.format(debate_id=debate_id): fixtures[name] for name, debate_id in FIXTURE_DEBATES.items()}
+    return twfy.get_speeches_divisions_and_votes(list(pages), fetcher=FixtureFetcher(pages))
+
+
+def test_write_batch_only_writes_what_changed(crawl):
+    df_speeches, df_house_division, df_votes = crawl
+    conn = storage.connect(":memory:")
+    first = storage.write_batch(conn, df_speeches, df_house_division, df_votes)
+    assert first["speeches"] == len(df_speeches)
+
+    again = storage.write_batch(conn, df_speeches, df_house_division, df_votes)
+    assert again == {"speeches": 0, "house_divisions": 0, "votes": 0, "revisions": 0, "removed": 0}
+
+
+def test_write_batch_logs_revisions_and_deletions(crawl):
+    df_speeches, df_house_division, df_votes = crawl
+    conn = storage.connect(":memory:")
+    storage.write_batch(conn, df_speeches, df_house_division, df_votes)
+
+    # One speech is corrected, another is gone, and one MP's vote is struck off the first division
+    df_revised = df_speeches.drop(index=df_speeches.index[-1])
+    df_revised.loc[0, "speech_raw_text"] += " (corrected)"
+    debate_id, house_division_id = df_house_division.iloc[0][["debate_id", "house_division_id"]]
+    # Votes without an mp_id (e.g. of a member TWFY could not identify) are never stored
+    in_division = ((df_votes["debate_id"] == debate_id) & (df_votes["house_division_id"] == house_division_id)
+                   & df_votes["mp_id"].notna())
+    df_votes_revised = df_votes.drop(index=df_votes.index[in_division][0])
+
+    num_rows = storage.write_batch(conn, df_revised, df_house_division, df_votes_revised)
+    assert num_rows["speeches"] == 1
+    assert num_rows["house_divisions"] == 1
+    assert num_rows["votes"] == in_division.sum() - 1
+    assert num_rows["removed"] == 1
+
+    assert conn.execute("SELECT COUNT(*) FROM speeches").fetchone()[0] == len(df_revised)
+    assert conn.execute("SELECT COUNT(*) FROM votes WHERE debate_id = ? AND house_division_id = ?",
+                        (debate_id, house_division_id)).fetchone()[0] == in_division.sum() - 1
+    assert conn.execute("SELECT COUNT(*) FROM speeches_fts WHERE speeches_fts MATCH 'corrected'").fetchone()[0] == 1
+
+    revisions = conn.execute("SELECT table_name, new_hash IS NULL, old_content FROM revisions ORDER BY revision_id").fetchall()
+    assert [(table, removed) for table, removed, _ in revisions] == [
+        ("speeches", 0), ("speeches", 1), ("house_divisions", 0)]
+    assert json.loads(revisions[0][2])["speech_raw_text"] == df_speeches.loc[0, "speech_raw_text"]
+    assert json.loads(revisions[1][2])["speech_raw_text"] == df_speeches["speech_raw_text"].iloc[-1]
+    assert len(json.loads(revisions[2][2])["votes"]) == in_division.sum()
@@ -0,0 +1,44 @@
+import pytest
+
+from discordia import storage
+from discordia.benchmarks.suite import FixtureFetcher, FIXTURE_URL, FIXTURE_DEBATES
+from discordia.textmining import build_document_term_matrix
+from discordia.webscraping import twfy
+
+pytest.importorskip("scipy")
+
+# What `lemmatize_speeches` does, without spaCy
+LEMMATIZE = """
+INSERT INTO speech_lemmas (debate_id, speech_id, lemmas)
+SELECT debate_id, speech_id, lower(speech_raw_text) FROM speeches LEFT JOIN speech_lemmas USING(debate_id, speech_id)
+WHERE speech_lemmas.lemma_id IS NULL
+"""
+
+
+def test_matrix_follows_revised_debates(tmp_path, fixtures):
+    pages = {FIXTURE_URL.format(debate_id=debate_id): fixtures[name] for name, debate_id in FIXTURE_DEBATES.items()}
+    df_speeches, df_house_division, df_votes = twfy.get_speeches_divisions_and_votes(list(pages), fetcher=FixtureFetcher(pages))
+    directory = str(tmp_path / "dtm")
+
+    conn = storage.connect(":memory:")
+    storage.write_batch(conn, df_speeches, df_house_division, df_votes)
+    with conn:
+        conn.execute(LEMMATIZE)
+    assert build_document_term_matrix(conn, directory).counts.shape[0] == len(df_speeches)
+
+    # The next version of the debates drops one speech and corrects another
+    removed = df_speeches.index[-1]
+    df_revised = df_speeches.drop(index=removed)
+    df_revised.loc[0, "speech_raw_text"] += " corrigendum"
+    storage.write_batch(conn, df_revised, df_house_division, df_votes)
+
+    # The removed speech is gone; the corrected one waits to be lemmatised again
+    dtm = build_document_term_matrix(conn, directory)
+    assert dtm.counts.shape[0] == len(df_speeches) - 2
+    assert (df_speeches.loc[removed, "debate_id"], df_speeches.loc[removed, "speech_id"]) not in set(dtm.index)
+
+    with conn:
+        conn.execute(LEMMATIZE)
+    dtm = build_document_term_matrix(conn, directory)
+    assert dtm.counts.shape[0] == len(df_speeches) - 1
+    assert dtm.counts[:, dtm.vocabulary.index("corrigendum")].sum() == 1